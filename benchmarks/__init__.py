@@ -0,0 +1,3 @@
+"""
+Benchmarks for the K1USN SST logger. Not shipped with the package.
+"""
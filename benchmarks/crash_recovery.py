@@ -0,0 +1,114 @@
+"""
+Crash recovery check for the group commit write path.
+
+A child process logs contacts as fast as it can and prints each callsign
+once log_contact() has returned, which is when the operator sees the QSO
+as logged. The parent kills it with SIGKILL at a random moment, reopens the
+log the way the logger does at startup, and checks every acknowledged
+contact is there exactly once.
+
+With --poison every other round also journals an entry that can't be
+applied, part way through, and checks it doesn't hold up the contacts
+logged after it. A power cut, as opposed to a killed process, isn't
+covered; that relies on the journal fsync and synchronous=FULL commits.
+
+    python -m benchmarks.crash_recovery --rounds 50
+"""
+
+import argparse
+import os
+import random
+import signal
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from k1usnsst.lib.database import DataBase
+
+CHILD = """
+import sys
+from k1usnsst.lib.database import DataBase
+database = DataBase(sys.argv[1], group_window=float(sys.argv[2]))
+database.create_db()
+number = 0
+while True:
+    if number == int(sys.argv[4]):
+        database._submit("update", ["not a contact"])
+    call = f"{sys.argv[3]}{number}"
+    database.log_contact((call, "BOB", "CT", "14030000", "20", "", ""))
+    print(call, flush=True)
+    number += 1
+"""
+
+
+def one_round(workdir: Path, round_number: int, args) -> tuple:
+    """Log, kill, recover, check. Returns (acknowledged, missing, duplicated)."""
+    database = workdir / "SST.db"
+    child = subprocess.Popen(  # pylint: disable=consider-using-with
+        [
+            sys.executable,
+            "-c",
+            CHILD,
+            str(database),
+            str(args.window),
+            f"R{round_number}X",
+            str(random.randint(0, 500) if args.poison and round_number % 2 else -1),
+        ],
+        stdout=subprocess.PIPE,
+        text=True,
+        env=dict(os.environ, PYTHONPATH=os.getcwd()),
+    )
+    time.sleep(random.uniform(args.min_delay, args.max_delay))
+    child.send_signal(signal.SIGKILL)
+    output, _ = child.communicate()
+    acknowledged = output.split()
+    if output and not output.endswith("\n"):
+        acknowledged = acknowledged[:-1]
+
+    DataBase(str(database)).create_db()
+    with sqlite3.connect(database) as conn:
+        cursor = conn.cursor()
+        cursor.execute(
+            "select callsign, count(*) from contacts where callsign like ? "
+            "group by callsign",
+            (f"R{round_number}X%",),
+        )
+        logged = dict(cursor.fetchall())
+    missing = [call for call in acknowledged if call not in logged]
+    duplicated = [call for call, count in logged.items() if count > 1]
+    return len(acknowledged), missing, duplicated
+
+
+def main():
+    """Run the check."""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--rounds", type=int, default=20)
+    parser.add_argument("--window", type=float, default=0.05, help="group window, s")
+    parser.add_argument("--min-delay", type=float, default=0.3)
+    parser.add_argument("--max-delay", type=float, default=1.5)
+    parser.add_argument(
+        "--poison", action="store_true", help="also journal a bad entry"
+    )
+    args = parser.parse_args()
+
+    failures = 0
+    total = 0
+    with tempfile.TemporaryDirectory(prefix="k1usnsst-crash-") as tmp:
+        for round_number in range(args.rounds):
+            acknowledged, missing, duplicated = one_round(Path(tmp), round_number, args)
+            total += acknowledged
+            if missing or duplicated:
+                failures += 1
+                print(
+                    f"round {round_number}: {acknowledged} acknowledged, "
+                    f"missing {missing[:5]}, duplicated {duplicated[:5]}"
+                )
+    print(f"{args.rounds} rounds, {total} contacts acknowledged, {failures} failed")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
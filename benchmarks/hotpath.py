@@ -0,0 +1,174 @@
+"""
+Hot path benchmark.
+
+Times the database work behind dup_check, log_contact, logwindow, rescore,
+generate_logs and the log filter, plus log_contact followed by an
+immediate group commit and importing an ADIF file of 10000 contacts, half of
+them already in the log, against synthetic logs of increasing size. Each run is
+appended as one json line to a history file so results can be compared
+across commits.
+
+    python -m benchmarks.hotpath --sizes 1000 10000 100000 1000000
+"""
+
+import argparse
+import itertools
+import random
+import shutil
+import tempfile
+import time
+from json import dumps
+from pathlib import Path
+
+from benchmarks.stats import print_table, run_info, summarize
+from benchmarks.synthetic import BANDS, STATES, cached, contacts
+from k1usnsst.lib.adif import AdifWriter, import_adif
+from k1usnsst.lib.cabrillo import CabrilloWriter
+from k1usnsst.lib.database import DataBase, contact_line
+from k1usnsst.lib.export import StatisticsWriter, export
+from k1usnsst.lib.multipliers import Multipliers
+
+
+def time_it(function, repeat: int) -> list:
+    """Calls function repeat times, returns the timings in milliseconds."""
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function()
+        samples.append((time.perf_counter() - started) * 1000)
+    return samples
+
+
+def bench_size(database: DataBase, workdir: Path, args) -> dict:
+    """Runs every operation against one database."""
+    rng = random.Random(args.seed)
+    calls = [row[0] for row in contacts(min(args.size, 5000), args.seed)]
+    new_rows = contacts(args.repeat * 2, args.seed + 1)
+
+    def dup_check():
+        database.dup_check(rng.choice(calls))
+
+    def log_contact():
+        row = next(new_rows)
+        database.log_contact(row[:3] + row[4:])
+
+    def group_commit():
+        log_contact()
+        database.flush()
+
+    def logwindow():
+        for contact in database.fetch_all_contacts_desc():
+            contact_line(contact)
+
+    # One of each kind of filter term, in turn, see parse_filter.
+    filters = itertools.cycle(
+        (
+            lambda: rng.choice(calls)[:3],
+            lambda: f"call:{rng.choice(calls)[:2]}",
+            lambda: rng.choice(STATES),
+            lambda: f"state:{rng.choice(STATES)}",
+            lambda: f"band:{rng.choice(BANDS)}",
+            lambda: f"{rng.choice(BANDS)}m",
+            lambda: f"date:{2020 + rng.randrange(args.size // 3000 + 1)}-05",
+            lambda: f"{rng.choice(calls)[:2]} band:20",
+        )
+    )
+
+    def search():
+        database.search(next(filters)())
+
+    def rescore():
+        database.sessions()
+        multipliers = Multipliers()
+        multipliers.load(database.get_worked())
+        multipliers.score()
+
+    def generate_logs():
+        export(
+            database.stream_contacts(),
+            [
+                AdifWriter(str(workdir / "SST.adi"), "MIKE CA"),
+                CabrilloWriter(str(workdir / "SST.log"), "K6GTE", "MIKE CA"),
+                StatisticsWriter(str(workdir / "SST_Statistics.txt")),
+            ],
+        )
+
+    # Each import is 5000 contacts already in the log and 5000 new ones.
+    logged = list(itertools.islice(contacts(args.size, args.seed), 5000))
+    imports = []
+    for number in range(args.scan_repeat):
+        path = workdir / f"import{number}.adi"
+        rows = logged + list(contacts(5000, args.seed + 2 + number))
+        export(((0,) + row for row in rows), [AdifWriter(str(path), "MIKE CA")])
+        imports.append(str(path))
+
+    def import_log():
+        import_adif(database, imports.pop())
+
+    results = {}
+    for name, function, repeat in (
+        ("dup_check", dup_check, args.repeat),
+        ("log_contact", log_contact, args.repeat),
+        ("group_commit", group_commit, args.repeat),
+        ("search", search, args.repeat),
+        ("rescore", rescore, args.scan_repeat),
+        ("logwindow", logwindow, args.scan_repeat),
+        ("generate_logs", generate_logs, args.scan_repeat),
+        ("import_adif", import_log, args.scan_repeat),
+    ):
+        if args.only and name not in args.only:
+            continue
+        results[name] = summarize(time_it(function, repeat))
+    database.close()
+    return results
+
+
+def main():
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument(
+        "--sizes",
+        type=int,
+        nargs="+",
+        default=[1000, 10000, 100000, 1000000],
+        help="number of contacts in each synthetic log",
+    )
+    parser.add_argument("--repeat", type=int, default=50, help="runs of point ops")
+    parser.add_argument(
+        "--scan-repeat", type=int, default=5, help="runs of whole table ops"
+    )
+    parser.add_argument("--only", nargs="+", help="operations to run")
+    parser.add_argument("--seed", type=int, default=73)
+    parser.add_argument(
+        "--cache", default=".bench-cache", help="where generated logs are kept"
+    )
+    parser.add_argument(
+        "--history",
+        default="benchmarks/results/hotpath.jsonl",
+        help="json lines file results are appended to",
+    )
+    parser.add_argument("--label", default="", help="free text saved with the run")
+    args = parser.parse_args()
+
+    run = {"info": run_info(), "label": args.label, "results": {}}
+    for size in args.sizes:
+        args.size = size
+        source = cached(Path(args.cache), size, args.seed)
+        with tempfile.TemporaryDirectory(prefix="k1usnsst-bench-") as tmp:
+            workdir = Path(tmp)
+            shutil.copyfile(source, workdir / "SST.db")
+            database = DataBase(str(workdir / "SST.db"))
+            database.create_db()
+            results = bench_size(database, workdir, args)
+        run["results"][str(size)] = results
+        print_table(f"{size} contacts, milliseconds", results)
+        print()
+
+    history = Path(args.history)
+    history.parent.mkdir(parents=True, exist_ok=True)
+    with open(history, "a", encoding="utf-8") as file_descriptor:
+        print(dumps(run), file=file_descriptor)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,193 @@
+"""
+Cross log checking benchmark.
+
+Makes up an SST between many stations, with known mistakes in it: busted
+calls, busted exchanges, QSOs missing from the other log and stations that
+didn't send a log. Each station's log is written by the logger's own ADIF or
+Cabrillo writer, then the log checker reads them all back, checks them with
+each number of processes asked for, and reports how long that took and how
+many of the mistakes it found.
+
+    python -m benchmarks.logcheck --stations 300 --qsos 60 --jobs 1 4
+"""
+
+import argparse
+import random
+import shutil
+import tempfile
+import time
+from datetime import datetime, timedelta
+from json import dumps
+from pathlib import Path
+
+from benchmarks.stats import run_info
+from benchmarks.synthetic import BAND_EDGE, BANDS, BAND_WEIGHTS, NAMES, STATES, callsign
+from k1usnsst.lib.adif import AdifWriter
+from k1usnsst.lib.cabrillo import CabrilloWriter
+from k1usnsst.lib.export import export
+from k1usnsst.lib.logcheck import (
+    BUSTED_CALL,
+    BUSTED_EXCHANGE,
+    NOT_IN_LOG,
+    OK,
+    UNVERIFIED,
+    check,
+    read_log,
+)
+
+
+def bust(rng: random.Random, call: str) -> str:
+    """call with one letter or digit changed."""
+    index = rng.randrange(len(call))
+    replacement = rng.choice(
+        [c for c in "ABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789" if c != call[index]]
+    )
+    return call[:index] + replacement + call[index + 1 :]
+
+
+def contest(args) -> tuple:
+    """
+    Returns (logs, expected, senders, sent). logs maps each station to its
+    contact rows, expected maps (station, row id) to the status the checker
+    should give that QSO, senders are the stations that send their logs in
+    and sent maps each station to its exchange.
+    """
+    rng = random.Random(args.seed)
+    stations = set()
+    while len(stations) < args.stations:
+        stations.add(callsign(rng))
+    stations = sorted(stations)
+    sent = {call: (rng.choice(NAMES), rng.choice(STATES)) for call in stations}
+    senders = {call for call in stations if rng.random() >= args.no_log}
+    clock = {call: rng.randint(-60, 60) for call in stations}
+    start = datetime(2024, 5, 13, 0, 0, 0)
+    logs = {call: [] for call in stations}
+    expected = {}
+
+    def log(station, call, exchange, when, frequency, band):
+        row_id = len(logs[station])
+        when = when + timedelta(seconds=clock[station])
+        logs[station].append(
+            (
+                row_id,
+                call,
+                exchange[0],
+                exchange[1],
+                when.strftime("%Y-%m-%d %H:%M:%S"),
+                str(frequency),
+                band,
+                "",
+                "",
+            )
+        )
+        return row_id
+
+    for _ in range(args.stations * args.qsos // 2):
+        first, second = rng.sample(stations, 2)
+        when = start + timedelta(seconds=rng.randint(0, 3599))
+        band = rng.choices(BANDS, BAND_WEIGHTS)[0]
+        frequency = BAND_EDGE[band] + rng.randint(20, 60) * 1000
+        roll = rng.random()
+        mistakes = args.mistakes
+        call, exchange, status = second, sent[second], OK
+        if roll < mistakes:
+            call, status = bust(rng, second), BUSTED_CALL
+        elif roll < 2 * mistakes:
+            exchange = (bust(rng, sent[second][0]), sent[second][1])
+            status = BUSTED_EXCHANGE
+        row_id = log(first, call, exchange, when, frequency, band)
+        if second not in senders:
+            status = UNVERIFIED
+        elif roll >= 2 * mistakes and roll < 3 * mistakes:
+            status = NOT_IN_LOG
+        else:
+            other = log(second, first, sent[first], when, frequency, band)
+            if first in senders:
+                expected[(second, other)] = OK
+        if first in senders:
+            expected[(first, row_id)] = status
+    return logs, expected, senders, sent
+
+
+def main():
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--stations", type=int, default=300)
+    parser.add_argument("--qsos", type=int, default=60, help="QSOs per station")
+    parser.add_argument("--mistakes", type=float, default=0.02, help="of each kind")
+    parser.add_argument("--no-log", type=float, default=0.1, help="share not sent in")
+    parser.add_argument("--jobs", type=int, nargs="+", default=[1, 0], help="0 for all")
+    parser.add_argument("--seed", type=int, default=73)
+    parser.add_argument(
+        "--history",
+        default="benchmarks/results/logcheck.jsonl",
+        help="json lines file results are appended to",
+    )
+    parser.add_argument("--label", default="", help="free text saved with the run")
+    args = parser.parse_args()
+
+    logs, expected, senders, sent = contest(args)
+    workdir = Path(tempfile.mkdtemp(prefix="k1usnsst-logcheck-"))
+    try:
+        paths = []
+        for number, station in enumerate(sorted(senders)):
+            rows = sorted(logs[station], key=lambda row: row[4])
+            exchange = " ".join(sent[station])
+            if number % 2:
+                path = workdir / f"{station}.adi"
+                writer = AdifWriter(str(path), exchange)
+            else:
+                path = workdir / f"{station}.log"
+                writer = CabrilloWriter(str(path), station, exchange)
+            export(rows, [writer])
+            paths.append((path, rows))
+        started = time.perf_counter()
+        checked_logs = [read_log(str(path))[:2] for path, _ in paths]
+        read_seconds = time.perf_counter() - started
+        timings = {}
+        for jobs in args.jobs:
+            started = time.perf_counter()
+            results = check(checked_logs, jobs=jobs or None)
+            timings[jobs or "all"] = time.perf_counter() - started
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    # Logs are written oldest first, so a QSO's number is its place in time order.
+    order = {
+        (station, number): row[0]
+        for (_, rows), (station, _) in zip(paths, checked_logs)
+        for number, row in enumerate(rows)
+    }
+    found = {}
+    for qso, status, _ in results:
+        want = expected.get((qso[0], order[(qso[0], qso[1])]))
+        if want is not None:
+            found.setdefault(want, [0, 0])
+            found[want][0] += 1
+            found[want][1] += status == want
+    qsos = len(results)
+    print(f"{len(paths)} logs, {qsos} QSOs, read in {read_seconds:.2f}s")
+    for jobs, seconds in timings.items():
+        print(f"jobs {jobs!s:<5} {seconds:8.2f}s {qsos / seconds:12.0f} QSOs/s")
+    for status, (total, right) in sorted(found.items()):
+        print(f"{status:<16} {right:>7} of {total:<7} found")
+    run = {
+        "info": run_info(),
+        "label": args.label,
+        "settings": {
+            key: getattr(args, key)
+            for key in ("stations", "qsos", "mistakes", "no_log")
+        },
+        "qsos": qsos,
+        "read": read_seconds,
+        "check": timings,
+        "found": found,
+    }
+    history = Path(args.history)
+    history.parent.mkdir(parents=True, exist_ok=True)
+    with open(history, "a", encoding="utf-8") as file_descriptor:
+        print(dumps(run), file=file_descriptor)
+
+
+if __name__ == "__main__":
+    main()
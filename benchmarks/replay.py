@@ -0,0 +1,367 @@
+"""
+Contest replay benchmark.
+
+Runs the logger's MainWindow in this process under the offscreen Qt platform,
+in a throwaway $HOME and working directory, with the rig, keyer and QRZ all
+pointed at the local simulators. It then plays a script of operator actions
+at it: typing into the focused field, F-key macros, Enter and band changes.
+It measures the latency an operator feels:
+
+    keystroke   key press to the field repainting
+    enter       Enter to an empty, focused, repainted callsign field
+    listed      Enter to the contact showing in the log window
+    fkey        F-key press until the window handles events again
+    keyer       F-key press to the keyer receiving the text
+    band        the VFO moving to another band to the logger following it
+
+A synthetic script is made from the same contacts the other benchmarks use.
+A recorded one is a json lines file of events, one per line:
+
+    {"op": "type", "text": "K6GTE "}
+    {"op": "type", "text": "MIKE CA", "unless_filled": true}
+    {"op": "key", "key": "F2"}
+    {"op": "enter"}
+    {"op": "band", "band": "40"}
+    {"op": "wait", "ms": 1500}
+
+    python -m benchmarks.replay --contacts 200 --speed 4 --log-size 10000
+
+It prints a table of median, p95, min and max milliseconds for each of the
+latencies above. Against the simulators with no --latency or --failures,
+expect keystroke, fkey and enter to be a few milliseconds, keyer a few more
+for the keyer's round trip and listed a little over the 250 ms group commit
+window. band is bounded by the rig poll interval, which backs off to 4 s
+while the VFO sits still, so anything up to about 4 s is normal there.
+
+A wait that doesn't finish in TIMEOUT seconds, BAND_TIMEOUT for band, gives
+up, isn't sampled, and is counted in a warning after the table. With
+--failures above 0 some keyer and band waits give up by design, since the
+simulators drop those requests. Without it, an occasional band timeout on a
+loaded machine is within tolerance, but anything else is worth a look.
+"""
+
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+from json import dumps, loads
+from pathlib import Path
+
+from PyQt5 import QtCore, QtWidgets
+from PyQt5.QtCore import Qt  # pylint: disable=no-name-in-module
+from PyQt5.QtTest import QTest
+
+from benchmarks.stats import print_table, run_info, summarize
+from benchmarks.synthetic import cached, contacts
+from simulator.__main__ import PORTS, start
+from simulator.faults import Faults
+
+BAND_FREQUENCY = {
+    "160": 1830000,
+    "80": 3530000,
+    "40": 7030000,
+    "20": 14030000,
+    "15": 21030000,
+    "10": 28030000,
+}
+CW_TYPES = {"cwdaemon": 1, "keyer": 2, "rigctld": 3}
+TIMEOUT = 5.0
+# Polls back off to 4 s while the VFO is still, see pollscheduler.py.
+BAND_TIMEOUT = 10.0
+
+
+def synthetic_script(count: int, seed: int, cpm: int, band_every: int):
+    """
+    Yields the events for count contacts worked search and pounce style:
+    listen, type the call, send ours, copy the exchange, log it.
+    """
+    gap = 60000 / cpm
+    bands = list(BAND_FREQUENCY)
+    for number, row in enumerate(contacts(count, seed)):
+        call, name, sandpdx = row[:3]
+        if band_every and number and not number % band_every:
+            yield {"op": "band", "band": bands[(number // band_every) % len(bands)]}
+        yield {"op": "wait", "ms": 1500}
+        yield {"op": "type", "text": f"{call} ", "gap": gap}
+        yield {"op": "key", "key": "F2"}
+        yield {"op": "wait", "ms": 2000}
+        yield {"op": "type", "text": f"{name} {sandpdx}", "gap": gap, "unless_filled": True}
+        yield {"op": "enter"}
+
+
+def make_home(home: Path, ports: dict, args) -> None:
+    """Preferences pointing everything at the simulators."""
+    settings = {
+        "mycallsign": "K6GTE",
+        "myexchange": "MIKE CA",
+        "qrzusername": "w1aw",
+        "qrzpassword": "secret",
+        "qrzurl": f"http://127.0.0.1:{ports['lookup']}/qrz/",
+        "useqrz": 0 if args.no_lookup else 1,
+        "userigcontrol": 1 if args.rig == "rigctld" else 2,
+        "rigcontrolip": "127.0.0.1",
+        "rigcontrolport": str(ports[args.rig]),
+        "usehamdb": 0,
+        "cwtype": CW_TYPES[args.cw],
+        "cwip": "127.0.0.1",
+        "cwport": ports["rigctld" if args.cw == "rigctld" else args.cw],
+    }
+    (home / ".k1usnsst.json").write_text(dumps(settings), encoding="utf-8")
+
+
+class PaintProbe(QtCore.QObject):
+    """Notes in painted when each widget it watches last painted."""
+
+    def __init__(self, painted: dict) -> None:
+        super().__init__()
+        self.painted = painted
+
+    def eventFilter(self, watched, event):  # pylint: disable=invalid-name
+        if event.type() == QtCore.QEvent.Paint:
+            self.painted[watched] = time.perf_counter()
+        return False
+
+
+class Replay:
+    """
+    Plays a script against the logger's window and collects latencies,
+    in milliseconds.
+    """
+
+    def __init__(self, logger, simulators, keyed: list, speed: float) -> None:
+        self.app = logger.app
+        self.window = logger.window
+        self.simulators = simulators
+        self.keyed = keyed
+        self.speed = speed
+        self.samples = {
+            name: [] for name in ("keystroke", "enter", "listed", "fkey", "keyer", "band")
+        }
+        self.timeouts = {name: 0 for name in self.samples}
+        self.painted = {}
+        self.probe = PaintProbe(self.painted)
+        for widget in (
+            self.window.callsign_entry,
+            self.window.exchange_entry,
+            self.window.listWidget.viewport(),
+        ):
+            widget.installEventFilter(self.probe)
+        QtWidgets.QApplication.setActiveWindow(self.window)
+        QTest.qWaitForWindowExposed(self.window)
+
+    def wait(self, milliseconds: float) -> None:
+        """Lets the event loop run, the way it would while the operator listens."""
+        if milliseconds > 0 and self.speed:
+            QTest.qWait(int(milliseconds / self.speed))
+
+    def until(self, condition, timeout: float = TIMEOUT) -> float:
+        """
+        Runs the event loop until condition() is true. Returns when that
+        happened, or None after timeout seconds.
+        """
+        deadline = time.perf_counter() + timeout
+        while not condition():
+            if time.perf_counter() > deadline:
+                return None
+            self.app.processEvents(QtCore.QEventLoop.AllEvents, 1)
+        return time.perf_counter()
+
+    def painted_since(self, widget, started: float) -> bool:
+        """True once widget has painted after started."""
+        return self.painted.get(widget, 0.0) >= started
+
+    def sample(self, name: str, started: float, finished: float) -> None:
+        """Keep one latency, or count it as timed out."""
+        if finished is None:
+            self.timeouts[name] += 1
+        else:
+            self.samples[name].append((finished - started) * 1000)
+
+    def focused(self):
+        """The field the operator is typing in."""
+        return self.window.focusWidget() or self.window.callsign_entry
+
+    def type_text(self, event: dict) -> None:
+        """Types text into the focused field, a key at a time."""
+        widget = self.focused()
+        if event.get("unless_filled") and widget.text():
+            return
+        for character in event["text"]:
+            widget = self.focused()
+            started = time.perf_counter()
+            QTest.keyClicks(widget, character)
+            self.sample(
+                "keystroke",
+                started,
+                self.until(lambda: self.painted_since(widget, started)),
+            )
+            self.wait(event.get("gap", 200))
+
+    def press_fkey(self, event: dict) -> None:
+        """Sends a macro."""
+        sent = len(self.keyed)
+        started = time.perf_counter()
+        QTest.keyClick(self.focused(), getattr(Qt, f"Key_{event['key']}"))
+        self.sample("fkey", started, time.perf_counter())
+        self.sample("keyer", started, self.until(lambda: len(self.keyed) > sent))
+
+    def press_enter(self, _event: dict) -> None:
+        """Logs the contact."""
+        window = self.window
+        listed = window.listWidget.count()
+        started = time.perf_counter()
+        QTest.keyClick(self.focused(), Qt.Key_Return)
+        self.sample(
+            "enter",
+            started,
+            self.until(
+                lambda: window.callsign_entry.hasFocus()
+                and not window.callsign_entry.text()
+                and self.painted_since(window.callsign_entry, started)
+            ),
+        )
+        self.sample(
+            "listed",
+            started,
+            self.until(
+                lambda: window.listWidget.count() > listed
+                and self.painted_since(window.listWidget.viewport(), started)
+            ),
+        )
+
+    def change_band(self, event: dict) -> None:
+        """Tunes the simulated rig to another band."""
+        started = time.perf_counter()
+        self.simulators.rig.tune(BAND_FREQUENCY[event["band"]])
+        self.sample(
+            "band",
+            started,
+            self.until(lambda: self.window.band == event["band"], BAND_TIMEOUT),
+        )
+
+    def play(self, events) -> dict:
+        """Plays every event, returns the latency summaries."""
+        actions = {
+            "type": self.type_text,
+            "key": self.press_fkey,
+            "enter": self.press_enter,
+            "band": self.change_band,
+            "wait": lambda event: self.wait(event["ms"]),
+        }
+        for event in events:
+            actions[event["op"]](event)
+        return {name: summarize(samples) for name, samples in self.samples.items()}
+
+
+def main():
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--script", help="json lines file of events to replay")
+    parser.add_argument("--save-script", help="write the synthetic script here")
+    parser.add_argument("--contacts", type=int, default=100, help="synthetic contacts")
+    parser.add_argument("--cpm", type=int, default=250, help="typing, characters/min")
+    parser.add_argument(
+        "--band-every", type=int, default=20, help="contacts between band changes"
+    )
+    parser.add_argument(
+        "--speed", type=float, default=1.0, help="pace multiplier, 0 for no waits"
+    )
+    parser.add_argument(
+        "--log-size", type=int, default=0, help="contacts already in the log"
+    )
+    parser.add_argument("--rig", choices=["rigctld", "flrig"], default="rigctld")
+    parser.add_argument("--cw", choices=list(CW_TYPES), default="keyer")
+    parser.add_argument("--no-lookup", action="store_true", help="leave QRZ off")
+    parser.add_argument("--latency", type=float, default=0.0, help="simulator ms")
+    parser.add_argument("--jitter", type=float, default=0.0, help="simulator ms")
+    parser.add_argument("--failures", type=float, default=0.0, help="0 to 1")
+    parser.add_argument("--seed", type=int, default=73)
+    parser.add_argument(
+        "--cache", default=".bench-cache", help="where generated logs are kept"
+    )
+    parser.add_argument(
+        "--history",
+        default="benchmarks/results/replay.jsonl",
+        help="json lines file results are appended to",
+    )
+    parser.add_argument("--label", default="", help="free text saved with the run")
+    args = parser.parse_args()
+
+    if args.script:
+        with open(args.script, "r", encoding="utf-8") as file_descriptor:
+            events = [loads(line) for line in file_descriptor if line.strip()]
+    else:
+        events = list(
+            synthetic_script(args.contacts, args.seed, args.cpm, args.band_every)
+        )
+    if args.save_script:
+        with open(args.save_script, "w", encoding="utf-8") as file_descriptor:
+            for event in events:
+                print(dumps(event), file=file_descriptor)
+    history = Path(args.history).resolve()
+    source = cached(Path(args.cache), args.log_size, args.seed) if args.log_size else None
+
+    simulators = start(
+        ports={name: 0 for name in PORTS},
+        faults={
+            name: Faults(args.latency / 1000, args.jitter / 1000, args.failures)
+            for name in PORTS
+        },
+    )
+    ports = {name: simulators.port(name) for name in PORTS}
+    keyed = {
+        "cwdaemon": simulators.servers["cwdaemon"].sent,
+        "keyer": simulators.servers["keyer"].sent,
+        "rigctld": simulators.rig.morse,
+    }[args.cw]
+    home = os.getcwd()
+    workdir = Path(tempfile.mkdtemp(prefix="k1usnsst-replay-"))
+    try:
+        make_home(workdir, ports, args)
+        if source:
+            shutil.copyfile(source, workdir / "SST.db")
+        os.environ.update({"QT_QPA_PLATFORM": "offscreen", "HOME": str(workdir)})
+        os.environ.pop("XDG_CURRENT_DESKTOP", None)
+        os.chdir(workdir)
+        sys.argv = sys.argv[:1]
+        started = time.perf_counter()
+        # Importing the logger builds its window and runs its startup.
+        import k1usnsst.__main__ as logger  # pylint: disable=import-outside-toplevel
+
+        logger.timer.start(1000)
+        replay = Replay(logger, simulators, keyed, args.speed)
+        results = replay.play(events)
+        elapsed = time.perf_counter() - started
+        logger.window.shutdown()
+        logger.window.close()
+    finally:
+        os.chdir(home)
+        simulators.stop()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    print_table(
+        f"replay, {len(events)} events in {elapsed:.1f}s, milliseconds", results
+    )
+    for name, timeouts in replay.timeouts.items():
+        if timeouts:
+            print(f"warning: {timeouts} {name} waits gave up")
+    run = {
+        "info": run_info(),
+        "label": args.label,
+        "settings": {
+            key: getattr(args, key)
+            for key in ("contacts", "speed", "log_size", "rig", "cw", "latency", "jitter")
+        },
+        "script": args.script or "synthetic",
+        "results": results,
+        "timeouts": replay.timeouts,
+    }
+    history.parent.mkdir(parents=True, exist_ok=True)
+    with open(history, "a", encoding="utf-8") as file_descriptor:
+        print(dumps(run), file=file_descriptor)
+
+
+if __name__ == "__main__":
+    main()
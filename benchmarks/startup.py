@@ -0,0 +1,138 @@
+"""
+Startup latency benchmark.
+
+Launches the logger over and over under the offscreen Qt platform, each time
+in a fresh temporary $HOME and working directory, and collects the phase
+timings the app writes when K1USNSST_STARTUP_TRACE is set. rigctld is
+stubbed with a local socket and lookups are switched off, so nothing leaves
+the machine.
+
+    python -m benchmarks.startup --runs 30 --json startup.json
+"""
+
+import argparse
+import importlib.util
+import os
+import socketserver
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from json import dumps, loads
+from pathlib import Path
+
+from benchmarks.stats import print_table, run_info, summarize
+
+
+class RigctldStub(socketserver.BaseRequestHandler):
+    """Answers rigctld's 'f' command with a fixed frequency."""
+
+    def handle(self):
+        while True:
+            data = self.request.recv(1024)
+            if not data:
+                return
+            if data.startswith(b"f"):
+                self.request.sendall(b"14030000\n")
+            else:
+                self.request.sendall(b"RPRT 0\n")
+
+
+def start_rig_stub() -> socketserver.ThreadingTCPServer:
+    """Start the rigctld stub on a free localhost port."""
+    socketserver.ThreadingTCPServer.daemon_threads = True
+    server = socketserver.ThreadingTCPServer(("127.0.0.1", 0), RigctldStub)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def make_home(home: Path, rigport: int) -> None:
+    """Preferences for a quiet run: stub rig, no lookups, desktop already set up."""
+    package_path = importlib.util.find_spec("k1usnsst").submodule_search_locations[0]
+    settings = {
+        "mycallsign": "K6GTE",
+        "myexchange": "MIKE CA",
+        "qrzusername": "w1aw",
+        "qrzpassword": "secret",
+        "qrzurl": "https://xmldata.qrz.com/xml/134",
+        "useqrz": 0,
+        "userigcontrol": 1,
+        "rigcontrolip": "127.0.0.1",
+        "rigcontrolport": str(rigport),
+        "usehamdb": 0,
+        "cwtype": 0,
+        "cwip": "localhost",
+        "cwport": 6789,
+    }
+    (home / ".k1usnsst.json").write_text(dumps(settings), encoding="utf-8")
+    (home / ".k1usnsst_desktop").write_text(package_path, encoding="utf-8")
+
+
+def launch(workdir: Path, rigport: int) -> dict:
+    """Run the logger once, return its trace plus the wall time to focus."""
+    make_home(workdir, rigport)
+    trace = workdir / "trace.json"
+    env = dict(os.environ)
+    env.update(
+        {
+            "QT_QPA_PLATFORM": "offscreen",
+            "HOME": str(workdir),
+            "K1USNSST_STARTUP_TRACE": str(trace),
+        }
+    )
+    env.pop("XDG_CURRENT_DESKTOP", None)
+    started = time.perf_counter()
+    subprocess.run(
+        [sys.executable, "-m", "k1usnsst"],
+        cwd=workdir,
+        env=env,
+        check=True,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+        timeout=60,
+    )
+    wall = (time.perf_counter() - started) * 1000
+    result = loads(trace.read_text(encoding="utf-8"))
+    result["wall"] = wall
+    return result
+
+
+def main():
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--runs", type=int, default=20, help="number of launches")
+    parser.add_argument("--json", help="write the summary here as json")
+    args = parser.parse_args()
+
+    rig = start_rig_stub()
+    phases = {}
+    totals = {"in-process total": [], "wall (exec to exit)": []}
+    unfocused = 0
+    try:
+        for _ in range(args.runs):
+            with tempfile.TemporaryDirectory(prefix="k1usnsst-bench-") as tmp:
+                result = launch(Path(tmp), rig.server_address[1])
+            for phase, elapsed in result["phases"].items():
+                phases.setdefault(phase, []).append(elapsed)
+            totals["in-process total"].append(result["total"])
+            totals["wall (exec to exit)"].append(result["wall"])
+            if not result.get("focus"):
+                unfocused += 1
+    finally:
+        rig.shutdown()
+
+    summary = {name: summarize(samples) for name, samples in phases.items()}
+    summary.update({name: summarize(samples) for name, samples in totals.items()})
+    print_table(f"startup, {args.runs} runs, milliseconds", summary)
+    if unfocused:
+        print(f"warning: callsign field never got focus in {unfocused} runs")
+    if args.json:
+        Path(args.json).write_text(
+            dumps({"info": run_info(), "runs": args.runs, "phases": summary}, indent=2),
+            encoding="utf-8",
+        )
+
+
+if __name__ == "__main__":
+    main()
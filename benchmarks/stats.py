@@ -0,0 +1,68 @@
+"""
+Small helpers shared by the benchmark scripts.
+"""
+
+import platform
+import subprocess
+from datetime import datetime, timezone
+from statistics import median
+
+
+def percentile(samples: list, percent: float) -> float:
+    """
+    Nearest rank percentile of samples.
+    """
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    rank = max(0, min(len(ordered) - 1, round(percent / 100 * len(ordered)) - 1))
+    return ordered[rank]
+
+
+def summarize(samples: list) -> dict:
+    """
+    Returns count, median, p95, min and max of a list of timings.
+    """
+    if not samples:
+        return {"count": 0, "median": 0.0, "p95": 0.0, "min": 0.0, "max": 0.0}
+    return {
+        "count": len(samples),
+        "median": median(samples),
+        "p95": percentile(samples, 95),
+        "min": min(samples),
+        "max": max(samples),
+    }
+
+
+def run_info() -> dict:
+    """
+    Where and when a benchmark ran, so results can be compared over time.
+    """
+    try:
+        revision = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=False,
+        ).stdout.strip()
+    except OSError:
+        revision = ""
+    return {
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "revision": revision,
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+    }
+
+
+def print_table(title: str, rows: dict) -> None:
+    """
+    Prints name -> summary rows in milliseconds.
+    """
+    print(title)
+    print(f"{'name':<24}{'median':>10}{'p95':>10}{'min':>10}{'max':>10}")
+    for name, summary in rows.items():
+        print(
+            f"{name:<24}{summary['median']:>10.2f}{summary['p95']:>10.2f}"
+            f"{summary['min']:>10.2f}{summary['max']:>10.2f}"
+        )
@@ -0,0 +1,124 @@
+"""
+Group sync convergence check.
+
+Station A logs contacts. Station B takes them in, edits, rebands and deletes
+some of A's and logs its own. Station C is then handed both stations'
+changes interleaved at random, each station's still in order but B's edits
+often ahead of A's inserts, the way they can arrive over the network. C must
+end up with the same log as B, which saw everything in order.
+
+    python -m benchmarks.sync_order --rounds 50
+"""
+
+import argparse
+import random
+import sqlite3
+import tempfile
+from pathlib import Path
+
+from k1usnsst.lib.database import FIELDS, DataBase
+
+
+def station(path: Path, name: str) -> DataBase:
+    """A fresh log for a station called name."""
+    database = DataBase(str(path))
+    database.create_db()
+    database.station = name
+    return database
+
+
+def contents(path: Path) -> list:
+    """The contacts a log holds, by the ids they're known by in the group."""
+    with sqlite3.connect(path) as conn:
+        cursor = conn.cursor()
+        cursor.execute(
+            f"select station, origin_id, {', '.join(FIELDS)}, session "
+            "from contacts order by station, origin_id"
+        )
+        return cursor.fetchall()
+
+
+def build(workdir: Path, args, rng: random.Random) -> tuple:
+    """Makes A's and B's changes. Returns (A's, B's, B's log)."""
+    alpha = station(workdir / "A.db", "A")
+    for number in range(args.contacts):
+        alpha.log_contact((f"K{number}A", "BOB", "CT", "14030000", "20", "", ""))
+    alpha.flush()
+    alpha_ops = [op for op in alpha.changes_since({}) if op["station"] == "A"]
+
+    bravo = station(workdir / "B.db", "B")
+    for op in alpha_ops:
+        bravo.apply_change(op)
+    with sqlite3.connect(workdir / "B.db") as conn:
+        ids = [row[0] for row in conn.execute("select id from contacts")]
+    for record_id in rng.sample(ids, len(ids) // 3):
+        contact = bravo.get_contacts([record_id])[0]
+        bravo.change_contact(
+            record_id,
+            contact[1],
+            "ALICE",
+            "ME",
+            contact[4],
+            "40",
+            "7030000",
+            "FN43",
+            "Alice",
+        )
+    bravo.change_band(rng.sample(ids, len(ids) // 5), "80")
+    bravo.delete_contacts(rng.sample(ids, len(ids) // 10))
+    for number in range(args.contacts // 4):
+        bravo.log_contact((f"W{number}B", "SUE", "MA", "7030000", "40", "", ""))
+    bravo.flush()
+    bravo_ops = [op for op in bravo.changes_since({}) if op["station"] == "B"]
+    return alpha_ops, bravo_ops, contents(workdir / "B.db")
+
+
+def interleave(streams: list, rng: random.Random) -> list:
+    """Merges lists at random, keeping each one's own order."""
+    streams = [list(reversed(stream)) for stream in streams if stream]
+    merged = []
+    while streams:
+        stream = rng.choice(streams)
+        merged.append(stream.pop())
+        if not stream:
+            streams.remove(stream)
+    return merged
+
+
+def main():
+    """Run the check."""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--rounds", type=int, default=20)
+    parser.add_argument("--contacts", type=int, default=60, help="logged by A")
+    parser.add_argument("--seed", type=int, default=73)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    failed = early = 0
+    with tempfile.TemporaryDirectory(prefix="k1usnsst-sync-") as tmp:
+        workdir = Path(tmp)
+        alpha_ops, bravo_ops, expected = build(workdir, args, rng)
+        for round_number in range(args.rounds):
+            path = workdir / f"C{round_number}.db"
+            charlie = station(path, "C")
+            arrived = set()
+            for op in interleave([alpha_ops, bravo_ops], rng):
+                target = (op["target_station"], op["target_id"])
+                if op["station"] == "B" and target[0] == "A" and target not in arrived:
+                    early += 1
+                arrived.add(target)
+                if not charlie.apply_change(op):
+                    print(f"round {round_number}: refused {op['station']} {op['seq']}")
+            got = contents(path)
+            if got != expected:
+                failed += 1
+                wrong = len(set(got) ^ set(expected))
+                print(f"round {round_number}: {wrong} contacts differ from B's log")
+    print(
+        f"{args.rounds} rounds, {len(alpha_ops)} + {len(bravo_ops)} changes, "
+        f"{early} edits ahead of their contact, {failed} failed"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""
+Builds synthetic SST.db files for benchmarking.
+
+Contacts are spread over bands, states, provinces and DX, one weekly session
+after another, so per-band and per-state queries see realistic distributions.
+"""
+
+import random
+import sqlite3
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from k1usnsst.lib.database import DataBase, session_for
+
+BANDS = ["160", "80", "40", "20", "15", "10"]
+BAND_WEIGHTS = [1, 6, 10, 8, 3, 2]
+BAND_EDGE = {
+    "160": 1800000,
+    "80": 3500000,
+    "40": 7000000,
+    "20": 14000000,
+    "15": 21000000,
+    "10": 28000000,
+}
+STATES = (
+    "AL AK AZ AR CA CO CT DE FL GA HI ID IL IN IA KS KY LA ME MD MA MI MN MS MO "
+    "MT NE NV NH NJ NM NY NC ND OH OK OR PA RI SC SD TN TX UT VT VA WA WV WI WY "
+    "DC AB BC MB NB NL NS ON PE QC SK"
+).split()
+NAMES = (
+    "BOB MIKE JIM JOHN BILL DAVE TOM STEVE JOE RICK MARY SUE ANN KEN PAUL ED "
+    "AL RON DON GARY LARRY JEFF MARK DAN CHUCK HANK WALT NORM ART KAREN"
+).split()
+PREFIXES = ["K", "W", "N", "AA", "AB", "KA", "KB", "KC", "KD", "KE", "WA", "WB"]
+QSOS_PER_SESSION = 60
+
+
+def callsign(rng: random.Random) -> str:
+    """A plausible US style callsign."""
+    suffix_length = rng.choice([1, 2, 3, 3, 3])
+    suffix = "".join(rng.choice("ABCDEFGHIJKLMNOPQRSTUVWXYZ") for _ in range(suffix_length))
+    return f"{rng.choice(PREFIXES)}{rng.randint(0, 9)}{suffix}"
+
+
+def contacts(count: int, seed: int = 73):
+    """
+    Yields rows for the contacts table, without the id column.
+    """
+    rng = random.Random(seed)
+    population = [callsign(rng) for _ in range(max(200, count // 20))]
+    exchange = {
+        call: (rng.choice(NAMES), "DX" if rng.random() < 0.05 else rng.choice(STATES))
+        for call in population
+    }
+    start = datetime(2020, 1, 5, 20, 0, 0)
+    for number in range(count):
+        session = start + timedelta(weeks=number // QSOS_PER_SESSION)
+        when = session + timedelta(seconds=rng.randint(0, 3599))
+        band = rng.choices(BANDS, BAND_WEIGHTS)[0]
+        call = rng.choice(population)
+        name, sandpdx = exchange[call]
+        yield (
+            call,
+            name,
+            sandpdx,
+            when.strftime("%Y-%m-%d %H:%M:%S"),
+            str(BAND_EDGE[band] + rng.randint(20, 60) * 1000),
+            band,
+            "",
+            "",
+        )
+
+
+def generate(path: Path, count: int, seed: int = 73) -> Path:
+    """
+    Writes a database of count contacts to path, replacing any file there.
+    """
+    path = Path(path)
+    if path.exists():
+        path.unlink()
+    database = DataBase(str(path))
+    database.create_db()
+    with sqlite3.connect(path) as conn:
+        conn.executemany(
+            "INSERT INTO contacts(callsign, name, sandpdx, date_time, "
+            "frequency, band, grid, opname, session) VALUES(?,?,?,?,?,?,?,?,?)",
+            (row + (session_for(row[3]),) for row in contacts(count, seed)),
+        )
+        conn.commit()
+        # Fold the WAL back in, so the file can be renamed and copied on its own.
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    return path
+
+
+def cached(directory: Path, count: int, seed: int = 73) -> Path:
+    """
+    Returns a database of count contacts from directory, generating it if needed.
+    """
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    path = directory / f"SST-{count}-{seed}.db"
+    if not path.exists():
+        partial = path.with_suffix(".partial")
+        generate(partial, count, seed)
+        partial.rename(path)
+        for suffix in ("-wal", "-shm"):
+            Path(f"{partial}{suffix}").unlink(missing_ok=True)
+    return path
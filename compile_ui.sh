@@ -0,0 +1,9 @@
+#!/bin/bash
+# Precompile the Qt Designer forms so the app doesn't parse XML at startup.
+# Each module records the hash of the .ui it came from, so ui_loader can
+# tell when a form was changed without compiling it again.
+for form in main dialog settings; do
+	pyuic5 k1usnsst/data/$form.ui -o k1usnsst/lib/${form}_ui.py
+	hash=$(python3 -c 'import hashlib, sys; print(hashlib.sha256(open(sys.argv[1], "rb").read()).hexdigest())' k1usnsst/data/$form.ui)
+	echo "UI_SHA256 = \"$hash\"" >> k1usnsst/lib/${form}_ui.py
+done
@@ -3,42 +3,110 @@
 Logger for K1USN SST
 """
 
+# pylint: disable=wrong-import-position
+from time import perf_counter, time
+
+STARTUP = perf_counter()
+
 import datetime as dt
+import importlib
 import logging
 import os
-import re
 import socket
 import sqlite3
 import sys
-import xmlrpc.client
+import threading
 from datetime import datetime
-from json import dumps, loads
+from functools import partial
 from pathlib import Path
 from shutil import copyfile
+from urllib.parse import urlsplit
 from xmlrpc.client import Error, ServerProxy  # pylint: disable=unused-import
 
-import psutil
-from PyQt5 import QtCore, QtGui, QtWidgets, uic
+from PyQt5 import QtCore, QtGui, QtWidgets
 from PyQt5.QtCore import QDir, Qt  # pylint: disable=no-name-in-module
 from PyQt5.QtGui import QFontDatabase  # pylint: disable=no-name-in-module
 
 try:
+    from k1usnsst.lib.adif import AdifWriter, import_adif
+    from k1usnsst.lib.alerts import DUPE, ERROR, INFO, LOOKUP_ERROR, NEW_MULT, Alerts
+    from k1usnsst.lib.cabrillo import CabrilloWriter
     from k1usnsst.lib.cwinterface import CW
-    from k1usnsst.lib.lookup import QRZlookup
-    from k1usnsst.lib.settings import Settings
+    from k1usnsst.lib.database import (
+        DataBase,
+        contact_line,
+        move_to_band,
+        parse_frequency,
+        session_for,
+    )
+    from k1usnsst.lib.export import StatisticsWriter, export
+    from k1usnsst.lib.flrig import FlrigClient
+    from k1usnsst.lib.history import CallHistory, import_json
+    from k1usnsst.lib.lookupbroker import INTERACTIVE, LookupBroker, QuotaExceeded
+    from k1usnsst.lib.lookupqueue import LookupQueue
+    from k1usnsst.lib.lookupsession import QRZ_LIFETIME, SessionKeeper
+    from k1usnsst.lib.metrics import metrics, timed
+    from k1usnsst.lib.multipliers import Multipliers
+    from k1usnsst.lib.pollscheduler import PollScheduler
+    from k1usnsst.lib.preferences import Preferences
+    from k1usnsst.lib.profiler import Profiler
+    from k1usnsst.lib.reachability import ReachabilityMonitor
+    from k1usnsst.lib.rate import LONG, RateMeter, timestamp
+    from k1usnsst.lib.rigctld import RigctldClient
+    from k1usnsst.lib.startuptrace import StartupTrace
+    from k1usnsst.lib.ui_loader import load_ui
 except ModuleNotFoundError:
+    from lib.adif import AdifWriter, import_adif
+    from lib.alerts import DUPE, ERROR, INFO, LOOKUP_ERROR, NEW_MULT, Alerts
+    from lib.cabrillo import CabrilloWriter
     from lib.cwinterface import CW
-    from lib.lookup import QRZlookup
-    from lib.settings import Settings
+    from lib.database import (
+        DataBase,
+        contact_line,
+        move_to_band,
+        parse_frequency,
+        session_for,
+    )
+    from lib.export import StatisticsWriter, export
+    from lib.flrig import FlrigClient
+    from lib.history import CallHistory, import_json
+    from lib.lookupbroker import INTERACTIVE, LookupBroker, QuotaExceeded
+    from lib.lookupqueue import LookupQueue
+    from lib.lookupsession import QRZ_LIFETIME, SessionKeeper
+    from lib.metrics import metrics, timed
+    from lib.multipliers import Multipliers
+    from lib.pollscheduler import PollScheduler
+    from lib.preferences import Preferences
+    from lib.profiler import Profiler
+    from lib.reachability import ReachabilityMonitor
+    from lib.rate import LONG, RateMeter, timestamp
+    from lib.rigctld import RigctldClient
+    from lib.startuptrace import StartupTrace
+    from lib.ui_loader import load_ui
 
 
 # pylint: disable=c-extension-no-member
 
+startup_trace = StartupTrace(STARTUP)
+startup_trace.mark("imports")
+
 if os.environ.get("XDG_CURRENT_DESKTOP", False) == "GNOME":
     os.environ["QT_QPA_PLATFORMTHEME"] = "gnome"
     os.environ["QT_STYLE_OVERRIDE"] = "Adwaita-Dark"
 
 
+def lazy_import(module: str, name: str):
+    """
+    Imports name from one of our lib modules the first time it's needed.
+    Keeps requests, xmltodict and the dialogs out of the startup path.
+    """
+    try:
+        lib = importlib.import_module(f"k1usnsst.lib.{module}")
+    except ModuleNotFoundError:
+        lib = importlib.import_module(f"lib.{module}")
+    return getattr(lib, name)
+
+
 def load_fonts_from_dir(directory: str) -> set:
     """
     Well it loads fonts from a directory...
@@ -52,10 +120,29 @@ def load_fonts_from_dir(directory: str) -> set:
 
 class QSOEdit(QtCore.QObject):
     """
-    Custom qt event signal used when qso edited or deleted.
+    Custom qt event signals used when qsos are logged, edited or deleted.
+    contactsChanged carries the journal entries committed.
     """
 
     lineChanged = QtCore.pyqtSignal()
+    contactsChanged = QtCore.pyqtSignal(list)
+
+
+class LookupState(QtCore.QObject):
+    """
+    Custom qt event signal used when the lookup session key changes.
+    """
+
+    changed = QtCore.pyqtSignal()
+
+
+class ImportDone(QtCore.QObject):
+    """
+    Custom qt event signal used when an ADIF import finishes on its worker
+    thread. finished carries import_adif's result or the exception it raised.
+    """
+
+    finished = QtCore.pyqtSignal(object)
 
 
 class MainWindow(QtWidgets.QMainWindow):
@@ -64,12 +151,11 @@ class MainWindow(QtWidgets.QMainWindow):
     """
 
     database = "SST.db"
-    server = False
+    rig = None
     mycall = ""
     myexchange = ""
     userigctl = True
     flrig = False
-    rigonline = False
     useqrz = False
     qrz = False
     oldfreq = None
@@ -87,33 +173,37 @@ class MainWindow(QtWidgets.QMainWindow):
         "222": "222030000",
         "432": "432030000",
     }
-    settings_dict = {
-        "mycallsign": "",
-        "myexchange": "",
-        "qrzusername": "w1aw",
-        "qrzpassword": "secret",
-        "qrzurl": "https://xmldata.qrz.com/xml/134",
-        "useqrz": 0,
-        "userigcontrol": 0,
-        "rigcontrolip": "localhost",
-        "rigcontrolport": "12345",
-        "usehamdb": 0,
-        "cwtype": 0,
-        "cwip": "localhost",
-        "cwport": 6789,
-    }
     fkeys = {}
     cw = None
     keyerserver = "http://localhost:8000"
     pastcontacts = {}
+    groupsync = None
+    session_keeper = None
+    reachability = None
+    lookup_queue = None
+    lookups = None
+    edit_dialog = None
+    session_counts = {}
 
     def __init__(self, *args, **kwargs):
         logging.info("MainWindow: __init__")
         super().__init__(*args, **kwargs)
         self.working_path = os.path.dirname(__loader__.get_filename())
-        data_path = self.working_path + "/data/main.ui"
-        uic.loadUi(data_path, self)
+        self.db = DataBase(self.database)
+        self.profiler = Profiler(os.path.dirname(os.path.abspath(self.database)))
+        if os.environ.get("K1USNSST_PROFILE"):
+            self.profiler.start()
+        startup_trace.mark("qmainwindow")
+        load_ui(self, "main")
+        startup_trace.mark("loadUi")
+        self.alerts = Alerts(self.dupe_indicator)
+        self.first_paint = True
+        self.log_items = {}
         self.listWidget.itemDoubleClicked.connect(self.qsoclicked)
+        edit_selected = QtWidgets.QAction("Edit selected contacts", self.listWidget)
+        edit_selected.triggered.connect(self.qsoclicked)
+        self.listWidget.addAction(edit_selected)
+        self.listWidget.setContextMenuPolicy(Qt.ActionsContextMenu)
         self.mycallEntry.textEdited.connect(self.changemycall)
         self.myexchangeEntry.textEdited.connect(self.changemyexchange)
         self.callsign_entry.textEdited.connect(self.calltest)
@@ -130,23 +220,49 @@ class MainWindow(QtWidgets.QMainWindow):
         self.QRZ_icon.setStyleSheet("color: rgb(136, 138, 133);")
         self.genLogButton.clicked.connect(self.generate_logs)
         self.band_selector.activated.connect(self.changeband)
+        self.session_selector.activated.connect(self.changesession)
+        self.archive_button.clicked.connect(self.archive_session)
+        self.import_button.clicked.connect(self.import_log)
         self.settings_gear.setIcon(self.gear_icon)
         self.settings_gear.clicked.connect(self.settingspressed)
-        self.rigctrlsocket = None
+        if metrics.enabled:
+            self.metrics_label = QtWidgets.QLabel("metrics")
+            self.statusBar().addPermanentWidget(self.metrics_label)
+        self.rate = RateMeter()
+        self.multipliers = Multipliers()
+        self.rate_label = QtWidgets.QLabel()
+        self.statusBar().addPermanentWidget(self.rate_label)
+        self.log_change = QSOEdit()
+        self.log_change.lineChanged.connect(self.qsoedited)
+        self.log_change.contactsChanged.connect(self.contacts_committed)
+        self.db.committed.append(self.log_change.contactsChanged.emit)
+        self.import_done = ImportDone()
+        self.import_done.finished.connect(self.import_finished)
+        self.lookup_state = LookupState()
+        self.lookup_state.changed.connect(self.show_lookup_state)
+        self.filter_timer = QtCore.QTimer()
+        self.filter_timer.setSingleShot(True)
+        self.filter_timer.timeout.connect(self.logwindow)
+        self.filter_entry.textChanged.connect(lambda _: self.filter_timer.start(150))
+        self.poll_scheduler = PollScheduler()
         self.radiochecktimer = QtCore.QTimer()
+        self.radiochecktimer.setSingleShot(True)
         self.radiochecktimer.timeout.connect(self.radio)
-        self.radiochecktimer.start(1000)
         self.changeband()
         self.cw = None
-        self.readpreferences()
-        if self.settings_dict["useqrz"]:
-            self.qrz = QRZlookup(
-                self.settings_dict["qrzusername"], self.settings_dict["qrzpassword"]
-            )
-            if not self.qrz.session:
-                self.QRZ_icon.setStyleSheet("color: rgb(136, 138, 133);")
-            else:
-                self.QRZ_icon.setStyleSheet("color: rgb(128, 128, 0);")
+        self.preferences = Preferences(os.path.expanduser("~") + "/.k1usnsst.json")
+        self.preferences.watch(
+            ("userigcontrol", "rigcontrolip", "rigcontrolport"), self.connect_rig
+        )
+        self.preferences.watch(("cwtype", "cwip", "cwport"), self.connect_cw)
+        self.preferences.watch(
+            ("useqrz", "qrzusername", "qrzpassword", "qrzurl", "qrzdailylimit"),
+            self.qrz_login,
+        )
+        self.preferences.watch(
+            ("usegroupsync", "syncstation", "syncgroup", "syncport", "syncinterface"),
+            self.restart_group_sync,
+        )
 
         self.F1.clicked.connect(self.sendf1)
         self.F2.clicked.connect(self.sendf2)
@@ -160,26 +276,210 @@ class MainWindow(QtWidgets.QMainWindow):
         self.F10.clicked.connect(self.sendf10)
         self.F11.clicked.connect(self.sendf11)
         self.F12.clicked.connect(self.sendf12)
+        self.profile_shortcut = QtWidgets.QShortcut(
+            QtGui.QKeySequence("Ctrl+Shift+P"), self
+        )
+        self.profile_shortcut.activated.connect(self.toggle_profiler)
+        startup_trace.mark("mainwindow")
+
+    def paintEvent(self, event) -> None:  # pylint: disable=invalid-name
+        """
+        Overrides the QtWidgets paintEvent.
+        Once the window has been painted the first time, kick off the slow stuff.
+        """
+        super().paintEvent(event)
+        if self.first_paint:
+            self.first_paint = False
+            QtCore.QTimer.singleShot(0, self.deferred_startup)
+
+    def deferred_startup(self) -> None:
+        """
+        Network setup that can wait until the window is up.
+        """
+        self.qrz_login()
+        self.start_group_sync()
+
+    def start_group_sync(self) -> None:
+        """
+        Starts sharing the log with other stations if it's switched on.
+        """
+        if not self.preferences["usegroupsync"] or self.groupsync:
+            return
+        groupsync = lazy_import("groupsync", "GroupSync")
+        station = self.preferences["syncstation"] or (
+            f"{self.preferences['mycallsign']}-{socket.gethostname()}"
+        )
+        self.groupsync = groupsync(
+            self.db,
+            station,
+            self.preferences["syncgroup"],
+            self.preferences["syncport"],
+            self.preferences["syncinterface"],
+            self.log_change.lineChanged.emit,
+        )
+        try:
+            self.groupsync.start()
+        except OSError as exception:
+            logging.critical("start_group_sync: %s", exception)
+            self.groupsync.stop()
+            self.groupsync = None
+            self.alerts.show(ERROR, "Group sync failed.")
+
+    def shutdown(self) -> None:
+        """
+        Commits anything still pending on the way out. Group sync stops
+        first so nothing is applied to the log once it's closed.
+        """
+        self.stop_group_sync()
+        self.stop_lookups()
+        self.db.close()
+        if isinstance(self.pastcontacts, CallHistory):
+            self.pastcontacts.close()
+
+    def stop_group_sync(self) -> None:
+        """
+        Stops sharing the log.
+        """
+        if self.groupsync:
+            self.groupsync.stop()
+            self.groupsync = None
+
+    def restart_group_sync(self) -> None:
+        """
+        Group sync settings changed.
+        """
+        self.stop_group_sync()
+        self.start_group_sync()
+
+    def qrz_login(self) -> None:
+        """
+        Sets up QRZ lookups if they're being used. The session key comes
+        from the cache or a login in the background, so this doesn't wait
+        on the network.
+        """
+        self.stop_lookups()
+        if not self.preferences["useqrz"]:
+            self.qrz = False
+            self.show_lookup_state()
+            return
+        qrzlookup = lazy_import("lookup", "QRZlookup")
+        url = self.preferences["qrzurl"].rstrip("/") + "/"
+        self.qrz = qrzlookup(
+            self.preferences["qrzusername"],
+            self.preferences["qrzpassword"],
+            url,
+            login=False,
+        )
+        self.session_keeper = SessionKeeper(
+            self.qrz,
+            f"qrz:{self.preferences['qrzusername']}@{url}",
+            QRZ_LIFETIME,
+            os.path.expanduser("~") + "/.k1usnsst_sessions.json",
+            self.lookup_changed,
+        )
+        address = urlsplit(url)
+        self.reachability = ReachabilityMonitor(
+            address.hostname,
+            address.port or (443 if address.scheme == "https" else 80),
+            on_change=lambda _: self.lookup_changed(),
+        )
+        self.lookups = LookupBroker(
+            self.qrz, daily_limit=self.preferences["qrzdailylimit"] or None
+        )
+        self.lookup_queue = LookupQueue(self.db, self.lookups, self.reachability)
+        self.session_keeper.start()
+        self.reachability.start()
+        self.lookups.start()
+        self.lookup_queue.start()
+        self.show_lookup_state()
+
+    def stop_lookups(self) -> None:
+        """
+        Stops the lookup threads.
+        """
+        for worker in (
+            self.lookup_queue,
+            self.lookups,
+            self.reachability,
+            self.session_keeper,
+        ):
+            if worker:
+                worker.stop()
+        self.lookup_queue = self.lookups = None
+        self.reachability = self.session_keeper = None
+
+    def lookup_changed(self) -> None:
+        """
+        Called from the lookup threads when the session key or whether the
+        service can be reached changes.
+        """
+        if self.lookup_queue:
+            self.lookup_queue.wake()
+        self.lookup_state.changed.emit()
+
+    def lookups_ready(self) -> bool:
+        """True if a lookup can go out now rather than be queued."""
+        return bool(self.lookups and self.qrz.session and self.reachability.online)
+
+    def lookup_result(self, future) -> tuple:
+        """
+        Unpacks a finished lookup. Returns (grid, opname, retry), retry being
+        True if the call should be queued and looked up again later.
+        """
+        grid, opname, _, error = future.result()
+        if error:
+            metrics.incr("lookup_errors")
+            logging.info("lookup error %s", error)
+        if isinstance(error, Exception) and not isinstance(error, QuotaExceeded):
+            if self.reachability:
+                self.reachability.failed()
+        retry = isinstance(error, Exception) or not self.qrz.session
+        return grid or "", opname or "", retry
+
+    def lookup_finished(self, call: str, future) -> None:
+        """
+        Called from the broker's thread when the lookup for a contact that
+        was logged without waiting for it comes back.
+        """
+        grid, opname, retry = self.lookup_result(future)
+        if not retry and (grid or opname):
+            try:
+                self.db.fill_lookup(call, grid, opname)
+            except IOError:
+                retry = True
+        if retry:
+            self.db.queue_lookup(call)
+            if self.lookup_queue:
+                self.lookup_queue.wake()
+
+    def show_lookup_state(self) -> None:
+        """
+        Colors the QRZ indicator by whether there's a session key and QRZ
+        can be reached.
+        """
+        if self.qrz and self.qrz.session and self.reachability.online:
+            self.QRZ_icon.setStyleSheet("color: rgb(128, 128, 0);")
+        else:
+            self.QRZ_icon.setStyleSheet("color: rgb(136, 138, 133);")
+
+    def toggle_profiler(self) -> None:
+        """
+        Starts or stops the profiler, Ctrl+Shift+P.
+        """
+        filename = self.profiler.toggle()
+        if self.profiler.running:
+            self.alerts.show(INFO, "Profiling...")
+        else:
+            self.alerts.show(INFO, f"{os.path.basename(filename)} saved.")
 
     def settingspressed(self):
         """
         When the gear icon is clicked, this is called
         """
         logging.info("MainWindow: settingspressed")
-        settingsdialog = Settings()
-        settingsdialog.setup()
+        settingsdialog = lazy_import("settings", "Settings")()
+        settingsdialog.setup(self.preferences)
         settingsdialog.exec()
-        self.readpreferences()
-
-    @staticmethod
-    def check_process(processname):
-        """checks to see if a process is running."""
-        for proc in psutil.process_iter():
-            if bool(re.match(processname, proc.name().lower())):
-                logging.info("%s running", processname)
-                return True
-        logging.info("%s not running", processname)
-        return False
 
     def read_cw_macros(self):
         """
@@ -238,50 +538,19 @@ class MainWindow(QtWidgets.QMainWindow):
 
     def readpastcontacts(self) -> None:
         """
-        Reads in past exchange info from contacts that you have made.
+        Opens the exchanges sent by calls worked before. An old
+        pastcontacts.json is converted the first time.
         """
         try:
             home = os.path.expanduser("~")
-            if os.path.exists(home + "/pastcontacts.json"):
-                with open(
-                    home + "/pastcontacts.json", "rt", encoding="utf-8"
-                ) as file_descriptor:
-                    self.pastcontacts = loads(file_descriptor.read())
-            else:
-                with open(
-                    home + "/pastcontacts.json", "wt", encoding="utf-8"
-                ) as file_descriptor:
-                    file_descriptor.write(dumps(self.pastcontacts))
-        except IOError as exception:
+            if not os.path.exists(home + "/pastcontacts.idx") and os.path.exists(
+                home + "/pastcontacts.json"
+            ):
+                import_json(home + "/pastcontacts.idx", home + "/pastcontacts.json")
+            self.pastcontacts = CallHistory(home + "/pastcontacts.idx")
+        except (IOError, ValueError) as exception:
             logging.critical("readpastcontacts: %s", exception)
 
-    def savepastcontacts(self) -> None:
-        """
-        Saves contact call, name and state to a json file.
-        """
-        try:
-            home = os.path.expanduser("~")
-            with open(
-                home + "/pastcontacts.json", "wt", encoding="utf-8"
-            ) as file_descriptor:
-                file_descriptor.write(dumps(self.pastcontacts))
-        except IOError as exception:
-            logging.critical("savepastcontacts: %s", exception)
-
-    @staticmethod
-    def has_internet() -> bool:
-        """
-        Connect to a main DNS server to check connectivity.
-        Returns True/False
-        """
-        try:
-            socket.create_connection(("1.1.1.1", 53))
-            logging.info("MainWindow: has_internet - True")
-            return True
-        except OSError as exception:
-            logging.info("MainWindow: has_internet: %s", exception)
-        return False
-
     def getband(self, freq: str) -> str:
         """
         Convert a (float) frequency into a (string) band.
@@ -323,7 +592,8 @@ class MainWindow(QtWidgets.QMainWindow):
         Sets the internal band used for logging to the onscreen dropdown value.
         """
         self.band = self.band_selector.currentText()
-        if not (self.rigonline or self.flrig):
+        self.check_mult()
+        if not (self.rig and self.rig.online):
             self.oldfreq = self.dfreq[self.band]
 
     def setband(self, theband: str) -> None:
@@ -335,75 +605,62 @@ class MainWindow(QtWidgets.QMainWindow):
 
     def poll_radio(self) -> None:
         """
-        Poll rigctld to get band.
+        Poll the rig for its frequency, to get band.
+        """
+        reading = self.rig.poll()
+        if reading is None:
+            self.poll_scheduler.offline()
+            return
+        newfreq = reading[0]
+        if newfreq != self.oldfreq:
+            self.oldfreq = newfreq
+            self.setband(str(self.getband(newfreq)))
+            self.poll_scheduler.changed()
+        else:
+            self.poll_scheduler.unchanged()
+
+    def show_rig_state(self, online: bool) -> None:
         """
+        Called by the rig client when the rig comes online or goes offline.
+        """
+        self.radio_icon.setPixmap(self.radio_green if online else self.radio_red)
+
+    def connect_rig(self) -> None:
+        """
+        Sets up the rig client picked in settings and starts polling it.
+        """
+        if self.rig:
+            self.rig.close()
+            self.rig = None
+        self.radiochecktimer.stop()
+        self.userigctl = self.preferences["userigcontrol"] == 1
+        self.flrig = self.preferences["userigcontrol"] == 2
+        if self.userigctl:
+            self.rig = RigctldClient(
+                self.preferences["rigcontrolip"],
+                self.preferences["rigcontrolport"],
+                on_state=self.show_rig_state,
+            )
         if self.flrig:
-            if self.check_process("flrig"):
-                try:
-                    newfreq = self.server.rig.get_vfo()
-                    self.radio_icon.setPixmap(self.radio_green)
-                    if newfreq != self.oldfreq:
-                        self.oldfreq = newfreq
-                        self.setband(str(self.getband(newfreq)))
-                except socket.error as exception:
-                    self.radio_icon.setPixmap(self.radio_red)
-                    logging.warning("poll_radio: flrig: %s", exception)
-                return
-            else:
-                self.radio_icon.setPixmap(self.radio_red)
-        if self.rigonline:
-            try:
-                self.rigctrlsocket.settimeout(0.5)
-                self.rigctrlsocket.send(b"f")
-                newfreq = self.rigctrlsocket.recv(1024).decode().strip()
-                self.radio_icon.setPixmap(self.radio_green)
-                self.rigctrlsocket.shutdown(socket.SHUT_RDWR)
-                self.rigctrlsocket.close()
-                if newfreq != self.oldfreq:
-                    self.oldfreq = newfreq
-                    self.setband(str(self.getband(newfreq)))
-            except TimeoutError:
-                ...
-
-    def check_radio(self) -> None:
-        """
-        Checks to see if rigctld daemon is running.
-        """
-        if not (self.flrig or self.userigctl):
+            self.rig = FlrigClient(
+                self.preferences["rigcontrolip"],
+                self.preferences["rigcontrolport"],
+                on_state=self.show_rig_state,
+            )
+        if self.rig is None:
             self.radio_icon.setPixmap(self.radio_grey)
-        if self.userigctl:
-            if self.check_process("rigctld"):
-                self.rigctrlsocket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-                self.rigctrlsocket.settimeout(0.1)
-                self.rigonline = True
-                try:
-                    logging.info(
-                        "check_radio: %s %s",
-                        self.settings_dict["rigcontrolip"],
-                        self.settings_dict["rigcontrolport"],
-                    )
-                    self.rigctrlsocket.connect(
-                        (
-                            self.settings_dict["rigcontrolip"],
-                            int(self.settings_dict["rigcontrolport"]),
-                        )
-                    )
-                except socket.error:
-                    self.rigonline = False
-                    logging.info("Rig Offline.")
-                    self.radio_icon.setPixmap(self.radio_red)
-            else:
-                self.rigonline = False
-                self.radio_icon.setPixmap(self.radio_red)
-        else:
-            self.rigonline = False
+            return
+        self.radiochecktimer.start(self.poll_scheduler.changed())
 
+    @timed("radio_poll")
     def radio(self) -> None:
         """
-        Check for connection to rigctld. if it's there, poll it for radio status.
+        Poll the rig, then schedule the next poll, sooner while it's being tuned.
         """
-        self.check_radio()
+        if self.rig is None:
+            return
         self.poll_radio()
+        self.radiochecktimer.start(self.poll_scheduler.interval)
 
     def process_macro(self, macro: str) -> str:
         """
@@ -484,30 +741,18 @@ class MainWindow(QtWidgets.QMainWindow):
         if event.key() == Qt.Key_F12:
             self.sendf12()
 
+    @timed("cw_send")
     def sendcw(self, texttosend: str) -> None:
         """
         Sends string to k1el keyer.
         """
         if (
             self.userigctl is True
-            and self.rigonline is True
-            and self.settings_dict.get("cwtype", 0) == 3
+            and self.rig
+            and self.rig.online
+            and self.preferences["cwtype"] == 3
         ):
-            try:
-                self.rigctrlsocket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-                self.rigctrlsocket.connect(
-                    (
-                        self.settings_dict["rigcontrolip"],
-                        int(self.settings_dict["rigcontrolport"]),
-                    )
-                )
-                self.rigctrlsocket.settimeout(0.5)
-                self.rigctrlsocket.send(bytes(f"b{texttosend}\n", "utf-8"))
-                _ = self.rigctrlsocket.recv(1024).decode().strip()
-                self.rigctrlsocket.shutdown(socket.SHUT_RDWR)
-                self.rigctrlsocket.close()
-            except (TimeoutError, BrokenPipeError, OSError) as err:
-                print(err)
+            self.rig.send_morse(texttosend)
 
         elif self.cw:
             self.cw.sendcw(texttosend)
@@ -600,10 +845,10 @@ class MainWindow(QtWidgets.QMainWindow):
         """
         Clears input fields and sets focus to callsign field
         """
-        self.dupe_indicator.setText("")
-        if self.settings_dict["useqrz"]:
+        self.alerts.clear()
+        if self.preferences["useqrz"] and self.qrz:
             if self.qrz.error:
-                self.dupe_indicator.setText(self.qrz.error)
+                self.alerts.show(LOOKUP_ERROR, str(self.qrz.error))
         self.callsign_entry.clear()
         self.exchange_entry.clear()
         self.callsign_entry.setFocus()
@@ -614,19 +859,29 @@ class MainWindow(QtWidgets.QMainWindow):
         """
         utcnow = datetime.now(dt.timezone.utc).isoformat(" ")[5:19].replace("-", "/")
         self.utctime.setText(utcnow)
-
-    def flash(self) -> None:
-        """
-        Flash the screen to give visual indication of a dupe.
-        """
-        self.setStyleSheet(
-            "background-color: rgb(245, 121, 0);\ncolor: rgb(211, 215, 207);"
+        self.show_rate()
+        if metrics.enabled:
+            self.metrics_label.setToolTip(metrics.summary())
+
+    def show_rate(self) -> None:
+        """
+        Shows the QSO rates, with the last hour by band in the tooltip.
+        """
+        now = time()
+        short_rate, long_rate, since = self.rate.rates(now)
+        last = "--:--"
+        if since is not None:
+            minutes, seconds = divmod(min(int(since), 5999), 60)
+            last = f"{minutes:02}:{seconds:02}"
+        self.rate_label.setText(
+            f"Rate 10m {short_rate}/h  60m {long_rate}/h  Last {last}"
         )
-        app.processEvents()
-        self.setStyleSheet(
-            "background-color: rgb(42, 42, 42);\ncolor: rgb(211, 215, 207);"
+        self.rate_label.setToolTip(
+            "\n".join(
+                f"{band}m: {count}/h"
+                for band, count in self.rate.band_rates(now).items()
+            )
         )
-        app.processEvents()
 
     def changemycall(self) -> None:
         """
@@ -641,12 +896,11 @@ class MainWindow(QtWidgets.QMainWindow):
                     ch for ch in text if ch.isalnum() or ch == "/"
                 ).upper()
                 self.mycallEntry.setText(cleaned)
-        self.settings_dict["mycallsign"] = self.mycallEntry.text()
-        if self.settings_dict["mycallsign"] != "":
+        self.preferences["mycallsign"] = self.mycallEntry.text()
+        if self.preferences["mycallsign"] != "":
             self.mycallEntry.setStyleSheet("border: 1px solid green;")
         else:
             self.mycallEntry.setStyleSheet("border: 1px solid red;")
-        self.writepreferences()
 
     def changemyexchange(self) -> None:
         """
@@ -656,12 +910,11 @@ class MainWindow(QtWidgets.QMainWindow):
         if len(text):
             cleaned = "".join(ch for ch in text if ch.isalpha() or ch == " ").upper()
             self.myexchangeEntry.setText(cleaned)
-        self.settings_dict["myexchange"] = self.myexchangeEntry.text()
-        if self.settings_dict["myexchange"] != "":
+        self.preferences["myexchange"] = self.myexchangeEntry.text()
+        if self.preferences["myexchange"] != "":
             self.myexchangeEntry.setStyleSheet("border: 1px solid green;")
         else:
             self.myexchangeEntry.setStyleSheet("border: 1px solid red;")
-        self.writepreferences()
 
     def calltest(self) -> None:
         """
@@ -680,6 +933,7 @@ class MainWindow(QtWidgets.QMainWindow):
                 ).upper()
                 self.callsign_entry.setText(cleaned)
                 self.callsign_entry.setCursorPosition(washere)
+        self.check_mult()
 
     def exchangetest(self) -> None:
         """
@@ -691,126 +945,102 @@ class MainWindow(QtWidgets.QMainWindow):
             cleaned = "".join(ch for ch in text if ch.isalpha() or ch == " ").upper()
             self.exchange_entry.setText(cleaned)
             self.exchange_entry.setCursorPosition(washere)
+        self.check_mult()
+
+    def check_mult(self) -> None:
+        """
+        Highlights a new multiplier on this band. Uses the state or province
+        typed in the exchange, or failing that the one this call sent last
+        time, from pastcontacts.
+        """
+        if self.alerts.kind == DUPE:
+            return
+        exchange = self.exchange_entry.text().split()
+        if len(exchange) > 1:
+            sandpdx, text = exchange[1], None
+        else:
+            past = self.pastcontacts.get(self.callsign_entry.text(), "").split()
+            sandpdx, text = (past[1], " NEW MULT?") if len(past) > 1 else ("", None)
+        if len(sandpdx) == 2 and self.multipliers.is_new(self.band, sandpdx):
+            self.alerts.show(NEW_MULT, text)
+        else:
+            self.alerts.clear(NEW_MULT)
 
+    @timed("dup_check")
     def dup_check(self) -> None:
         """
         Check for duplicate
         """
         acall = self.callsign_entry.text()
-        if len(self.exchange_entry.text()) == 0 and (acall in self.pastcontacts.keys()):
+        if acall and self.lookups_ready():
+            # Start the lookup now so it's usually back before Enter is pressed.
+            self.lookups.lookup(acall, INTERACTIVE)
+        if len(self.exchange_entry.text()) == 0 and (acall in self.pastcontacts):
             self.exchange_entry.setText(self.pastcontacts[acall])
-        dupetext = ""
-        try:
-            with sqlite3.connect(self.database) as conn:
-                cursor = conn.cursor()
-                cursor.execute(
-                    f"select callsign, name, sandpdx, band from contacts "
-                    f"where callsign like '{acall}' order by band"
-                )
-                log = cursor.fetchall()
-        except sqlite3.Error as exception:
-            logging.critical("%s", exception)
-            return
+        log = self.db.dup_check(acall)
         for item in log:
             _, hisname, sandpdx, hisband = item
             if len(self.exchange_entry.text()) == 0:
                 self.exchange_entry.setText(f"{hisname} {sandpdx}")
             if hisband == self.band:
-                self.flash()
-                dupetext = " DUP!!!"
-                self.dupe_indicator.setText(dupetext)
+                metrics.incr("dupes")
+                self.alerts.show(DUPE)
+        self.check_mult()
 
     def create_db(self) -> None:
         """create a database and table if it does not exist"""
-        try:
-            with sqlite3.connect(self.database) as conn:
-                cursor = conn.cursor()
-                sql_table = (
-                    " CREATE TABLE IF NOT EXISTS contacts (id INTEGER PRIMARY KEY, "
-                    "callsign text NOT NULL, name text NOT NULL, sandpdx text NOT NULL, "
-                    "date_time text NOT NULL, frequency text NOT NULL, band text NOT NULL, "
-                    "grid text NOT NULL, opname text NOT NULL); "
-                )
-                cursor.execute(sql_table)
-        except sqlite3.Error as exception:
-            logging.critical("%s", exception)
+        self.db.create_db()
+        since = datetime.now(dt.timezone.utc) - dt.timedelta(seconds=LONG)
+        for date_time, band in self.db.recent_contacts(
+            since.strftime("%Y-%m-%d %H:%M:%S")
+        ):
+            self.rate.add(timestamp(date_time), band)
 
     def readpreferences(self) -> None:
         """
         Reads preferences from json file.
         """
-        try:
-            home = os.path.expanduser("~")
-            if os.path.exists(home + "/.k1usnsst.json"):
-                with open(
-                    home + "/.k1usnsst.json", "rt", encoding="utf-8"
-                ) as file_descriptor:
-                    self.settings_dict = loads(file_descriptor.read())
-                    self.mycallEntry.setText(self.settings_dict["mycallsign"])
-                    self.myexchangeEntry.setText(self.settings_dict["myexchange"])
-                    self.flrig = False
-                    self.userigctl = False
-                    if self.settings_dict["userigcontrol"] == 1:
-                        self.flrig = False
-                        self.userigctl = True
-                    if self.settings_dict["userigcontrol"] == 2:
-                        self.flrig = True
-                        self.userigctl = False
-                        self.server = xmlrpc.client.ServerProxy(
-                            f"http://{self.settings_dict['rigcontrolip']}:"
-                            f"{self.settings_dict['rigcontrolport']}"
-                        )
-                    if "cwtype" not in self.settings_dict:  # if using old json file.
-                        self.settings_dict["cwtype"] = 0
-                        self.settings_dict["cwip"] = "localhost"
-                        self.settings_dict["cwport"] = 6789
-                        self.writepreferences()
-                    if self.settings_dict["cwtype"] == 0:
-                        self.cw = None
-                    else:
-                        self.cw = CW(
-                            self.settings_dict["cwtype"],
-                            self.settings_dict["cwip"],
-                            self.settings_dict["cwport"],
-                        )
-            else:
-                with open(
-                    home + "/.k1usnsst.json", "wt", encoding="utf-8"
-                ) as file_descriptor:
-                    file_descriptor.write(dumps(self.settings_dict))
-        except Error as exception:
-            logging.critical("%s", exception)
+        self.preferences.load()
+        self.mycallEntry.setText(self.preferences["mycallsign"])
+        self.myexchangeEntry.setText(self.preferences["myexchange"])
+        self.connect_cw()
+        self.connect_rig()
 
-    def writepreferences(self) -> None:
+    def connect_cw(self) -> None:
         """
-        Write preferences to json file.
+        Sets up the CW keyer picked in settings.
         """
-        home = os.path.expanduser("~")
-        with open(home + "/.k1usnsst.json", "wt", encoding="utf-8") as file_descriptor:
-            file_descriptor.write(dumps(self.settings_dict))
+        self.cw = None
+        if self.preferences["cwtype"]:
+            self.cw = CW(
+                self.preferences["cwtype"],
+                self.preferences["cwip"],
+                self.preferences["cwport"],
+            )
 
+    @timed("log_contact")
     def log_contact(self) -> None:
         """
         Log Contact
         """
-        grid = False
-        opname = False
-        error = False
+        grid = ""
+        opname = ""
         if (
             len(self.callsign_entry.text()) == 0
             or len(self.exchange_entry.text().split()) < 2
         ):
             return
         self.pastcontacts[self.callsign_entry.text()] = self.exchange_entry.text()
-        self.savepastcontacts()
-        if self.settings_dict["useqrz"]:
-            grid, opname, _, error = self.qrz.lookup(self.callsign_entry.text())
-        if error:
-            logging.info("lookup error %s", error)
-        if not grid:
-            grid = ""
-        if not opname:
-            opname = ""
+        queue = False
+        pending = None
+        if self.preferences["useqrz"] and self.qrz:
+            if self.lookups_ready():
+                pending = self.lookups.lookup(self.callsign_entry.text(), INTERACTIVE)
+                if pending.done():
+                    grid, opname, queue = self.lookup_result(pending)
+                    pending = None
+            else:
+                queue = True
         contact = (
             self.callsign_entry.text(),
             self.exchange_entry.text().split()[0],
@@ -821,315 +1051,465 @@ class MainWindow(QtWidgets.QMainWindow):
             opname,
         )
         try:
-            with sqlite3.connect(self.database) as conn:
-                sql = (
-                    "INSERT INTO contacts(callsign, name, sandpdx, date_time, "
-                    "frequency, band, grid, opname) VALUES(?,?,?,datetime('now'),?,?,?,?)"
-                )
-                logging.info("%s\n%s", sql, contact)
-                cur = conn.cursor()
-                cur.execute(sql, contact)
-                conn.commit()
-        except sqlite3.Error as exception:
-            logging.critical("%s", exception)
-        self.logwindow()
+            session = self.db.log_contact(contact)
+        except IOError:
+            # Not journaled, so not logged. Leave it on screen to try again.
+            self.alerts.show(ERROR, "Not logged!")
+            return
+        if queue:
+            self.db.queue_lookup(contact[0])
+        if pending:
+            # Still on its way, the name and grid are filled in when it's back.
+            pending.add_done_callback(partial(self.lookup_finished, contact[0]))
+        self.rate.add(time(), self.band)
+        if session != self.db.session:
+            # First contact of a new session, which starts its own tally.
+            # rescore flushes the journal, so this contact is in it.
+            self.db.session = session
+            self.rescore()
+        else:
+            self.multipliers.add(self.band, contact[2])
+            self.calcscore()
+        metrics.incr("contacts_logged")
         self.clearinputs()
 
     def logwindow(self) -> None:
         """
-        Populates the list of contacts stored in the database.
+        Populates the list of contacts stored in the database. That's the
+        active session, or what the filter matches in the whole log.
         """
         self.listWidget.clear()
-        try:
-            with sqlite3.connect(self.database) as conn:
-                cursor = conn.cursor()
-                cursor.execute("select * from contacts order by date_time desc")
-                log = cursor.fetchall()
-        except sqlite3.Error as exception:
-            logging.critical("%s", exception)
-        for contact in log:
-            logid, hiscall, hisname, sandpdx, the_date_and_time, _, band, _, _ = contact
-            logline = (
-                f"{str(logid).rjust(3,'0')} {hiscall.ljust(11)} "
-                f"{hisname.ljust(12)} {sandpdx} {the_date_and_time} {str(band).rjust(3)}"
-            )
-            self.listWidget.addItem(logline)
+        self.log_items = {}
+        log_filter = self.filter_entry.text().strip()
+        if log_filter:
+            contacts = self.db.search(log_filter)
+        else:
+            contacts = self.db.fetch_all_contacts_desc()
+        for contact in contacts:
+            item = QtWidgets.QListWidgetItem(contact_line(contact))
+            item.setData(Qt.UserRole, contact[0])
+            item.setData(Qt.UserRole + 1, contact[4])
+            item.setData(Qt.UserRole + 2, (contact[11], str(contact[6]), contact[3]))
+            self.listWidget.addItem(item)
+            self.log_items[contact[0]] = item
+
+    def show_session(self) -> None:
+        """
+        Shows the active session, its contacts and score, from scratch.
+        """
+        self.logwindow()
+        self.rescore()
+
+    def rescore(self) -> None:
+        """
+        Reloads the session counts, multipliers and score from the log.
+        Contacts still in the journal are committed first, so none is left
+        out of the reload, or counted again on top of it.
+        """
+        self.db.flush()
+        self.refresh_sessions()
+        self.multipliers.load(self.db.get_worked())
         self.calcscore()
 
-    def qsoclicked(self) -> None:
+    def contacts_committed(self, entries: list) -> None:
+        """
+        Updates the log window after the database commits. Edits and deletes
+        only touch their own lines and counts, new contacts redraw the list.
+        Contacts logged here were counted in the multipliers and score by
+        log_contact, so only the session counts need adding to.
+        """
+        record_ids = set()
+        sessions = []
+        for entry in entries:
+            operation, args = entry["op"], entry["args"]
+            if operation == "update":
+                record_ids.add(args[0])
+            elif operation == "reband":
+                record_ids.update(args[1:])
+            elif operation == "delete":
+                record_ids.update(args)
+            elif operation == "insert":
+                sessions.append(session_for(args[3]))
+        reloaded = bool(record_ids) and self.update_log_items(record_ids)
+        if sessions:
+            if not reloaded:
+                self.count_sessions(sessions)
+            self.logwindow()
+
+    def update_log_items(self, record_ids: set) -> bool:
+        """
+        Redraws the lines for these contacts, dropping any that were deleted
+        or moved to another session, and moves their counts in the session
+        picker and score from how they were to how they are. A contact the
+        filter hides can't be counted that way, so the score is reloaded.
+        A changed time moves a line, so the whole log is redrawn for that.
+        Returns True if the counts were reloaded.
+        """
+        contacts = {contact[0]: contact for contact in self.db.get_contacts(record_ids)}
+        filtered = bool(self.filter_entry.text().strip())
+        redraw = False
+        reload = False
+        for record_id in record_ids:
+            item = self.log_items.get(record_id)
+            if item is None:
+                reload = True
+                continue
+            contact = contacts.get(record_id)
+            self.recount(item.data(Qt.UserRole + 2), contact)
+            if contact is None or (contact[11] != self.db.session and not filtered):
+                self.listWidget.takeItem(self.listWidget.row(item))
+                del self.log_items[record_id]
+            elif contact[4] != item.data(Qt.UserRole + 1):
+                redraw = True
+            else:
+                item.setText(contact_line(contact))
+                item.setData(
+                    Qt.UserRole + 2, (contact[11], str(contact[6]), contact[3])
+                )
+        if redraw:
+            self.logwindow()
+        if reload:
+            self.rescore()
+            return True
+        self.show_sessions()
+        self.calcscore()
+        return False
+
+    def recount(self, counted: tuple, contact: tuple) -> None:
         """
-        Gets the line of the log clicked on, and passes that line to the edit dialog.
+        Moves a contact from counted, the (session, band, sandpdx) it was
+        counted under, to where it is now. contact is None once deleted.
         """
-        item = self.listWidget.currentItem()
-        linetopass = item.text()
-        dialog = EditQsoDialog(self)
-        dialog.setup(linetopass, self.database)
-        dialog.change.lineChanged.connect(self.qsoedited)
-        dialog.open()
+        session, band, sandpdx = counted
+        self.session_counts[session] = self.session_counts.get(session, 0) - 1
+        if self.session_counts[session] <= 0:
+            del self.session_counts[session]
+        if session == self.db.session:
+            self.multipliers.remove(band, sandpdx)
+        if contact is None:
+            return
+        session = contact[11]
+        self.session_counts[session] = self.session_counts.get(session, 0) + 1
+        if session == self.db.session:
+            self.multipliers.add(contact[6], contact[3])
 
-    def qsoedited(self) -> None:
+    def refresh_sessions(self) -> None:
         """
-        Perform functions after QSO edited or deleted.
+        Counts the contacts in each session in the log and lists them.
         """
-        self.logwindow()
+        self.session_counts = dict(self.db.sessions())
+        self.show_sessions()
+
+    def count_sessions(self, sessions: list) -> None:
+        """
+        Adds newly logged contacts, by their sessions, to the session picker.
+        """
+        for session in sessions:
+            self.session_counts[session] = self.session_counts.get(session, 0) + 1
+        self.show_sessions()
+
+    def show_sessions(self) -> None:
+        """
+        Lists the sessions, newest first, in the session picker,
+        with the active one selected.
+        """
+        counts = dict(self.session_counts)
+        counts.setdefault(self.db.session, 0)
+        self.session_selector.clear()
+        for session in sorted(counts, reverse=True):
+            self.session_selector.addItem(f"{session} ({counts[session]})", session)
+        self.session_selector.setCurrentIndex(
+            self.session_selector.findData(self.db.session)
+        )
+
+    def changesession(self) -> None:
+        """
+        Makes the session picked the one shown, scored and exported.
+        """
+        self.db.session = self.session_selector.currentData()
+        self.show_session()
+
+    def archive_session(self) -> None:
+        """
+        Moves the session shown to its own database file.
+        """
+        session = self.db.session
+        answer = QtWidgets.QMessageBox.question(
+            self,
+            "Archive session",
+            f"Move the {session} contacts out of the log into their own file?",
+        )
+        if answer != QtWidgets.QMessageBox.Yes:
+            return
+        filename, moved = self.db.archive_session(session)
+        self.db.session = self.db.detect_session()
+        self.show_session()
+        self.alerts.show(INFO, f"{moved} to {os.path.basename(filename)}")
+
+    def import_log(self) -> None:
+        """
+        Adds the contacts from an ADIF file, another station's SST.adi say,
+        skipping any already in the log. A big file takes a while, so it's
+        read on a worker thread and import_finished is signalled when done.
+        """
+        filename, _ = QtWidgets.QFileDialog.getOpenFileName(
+            self, "Import ADIF", "", "ADIF (*.adi *.adif);;All files (*)"
+        )
+        if not filename:
+            return
+        self.import_button.setEnabled(False)
+        self.alerts.show(INFO, "Importing...")
+        threading.Thread(target=self.run_import, args=(filename,), daemon=True).start()
 
-    def adif(self) -> None:
+    def run_import(self, filename: str) -> None:
         """
-        Generates adif log for importing.
+        Worker thread for import_log.
         """
-        logname = "SST.adi"
-        logging.info("Saving ADIF to: %s\n", logname)
         try:
-            with sqlite3.connect(self.database) as conn:
-                cursor = conn.cursor()
-                cursor.execute("select * from contacts order by date_time ASC")
-                log = cursor.fetchall()
-        except sqlite3.Error as exception:
-            logging.critical("%s", exception)
-            self.dupe_indicator.setText("Error!")
+            result = import_adif(self.db, filename)
+        except (IOError, sqlite3.Error) as exception:
+            result = exception
+        self.import_done.finished.emit(result)
+
+    def import_finished(self, result) -> None:
+        """
+        Shows the log and the import's numbers, result being what
+        import_adif returned or the exception it raised.
+        """
+        self.import_button.setEnabled(True)
+        if isinstance(result, Exception):
+            logging.critical("import_log: %s", result)
+            self.alerts.show(ERROR)
             return
-        grid = False
-        opname = False
-        with open(logname, "w", encoding="ascii") as file_descriptor:
-            print("<ADIF_VER:5>2.2.0", end="\r\n", file=file_descriptor)
-            print("<EOH>", end="\r\n", file=file_descriptor)
-            mode = "CW"
-            for contact in log:
-                (
-                    _,
-                    hiscall,
-                    hisname,
-                    sandpdx,
-                    the_date_and_time,
-                    frequency,
-                    band,
-                    grid,
-                    opname,
-                ) = contact
-                loggeddate = the_date_and_time[:10]
-                loggedtime = the_date_and_time[11:13] + the_date_and_time[14:16]
-                print(
-                    f"<QSO_DATE:{len(''.join(loggeddate.split('-')))}:d>"
-                    f"{''.join(loggeddate.split('-'))}",
-                    end="\r\n",
-                    file=file_descriptor,
-                )
-                print(
-                    f"<TIME_ON:{len(loggedtime)}>{loggedtime}",
-                    end="\r\n",
-                    file=file_descriptor,
-                )
-                print(
-                    f"<CALL:{len(hiscall)}>{hiscall}", end="\r\n", file=file_descriptor
-                )
-                print(f"<MODE:{len(mode)}>{mode}", end="\r\n", file=file_descriptor)
-                print(
-                    f"<BAND:{len(band + 'M')}>{band + 'M'}",
-                    end="\r\n",
-                    file=file_descriptor,
-                )
-                freq = str(int(frequency) / 1000000)
-                print(f"<FREQ:{len(freq)}>{freq}", end="\r\n", file=file_descriptor)
-                print("<RST_SENT:3>599", end="\r\n", file=file_descriptor)
-                print("<RST_RCVD:3>599", end="\r\n", file=file_descriptor)
-                print(
-                    f"<STX_STRING:{len(self.myexchangeEntry.text())}>{self.myexchangeEntry.text()}",
-                    end="\r\n",
-                    file=file_descriptor,
-                )
-                hisexchange = f"{hisname} {sandpdx}"
-                print(
-                    f"<SRX_STRING:{len(hisexchange)}>{hisexchange}",
-                    end="\r\n",
-                    file=file_descriptor,
-                )
-                state = sandpdx
-                if state:
-                    print(
-                        f"<STATE:{len(state)}>{state}", end="\r\n", file=file_descriptor
-                    )
-                if len(grid) > 1:
-                    print(
-                        f"<GRIDSQUARE:{len(grid)}>{grid}",
-                        end="\r\n",
-                        file=file_descriptor,
-                    )
-                if len(opname) > 1:
-                    print(
-                        f"<NAME:{len(opname)}>{opname}",
-                        end="\r\n",
-                        file=file_descriptor,
-                    )
-                comment = "K1USN SST"
-                print(
-                    f"<COMMENT:{len(comment)}>{comment}",
-                    end="\r\n",
-                    file=file_descriptor,
-                )
-                contest = "K1USN-SST"
-                print(
-                    f"<CONTEST_ID:{len(contest)}>{contest}",
-                    end="\r\n",
-                    file=file_descriptor,
-                )
-                print("<EOR>", end="\r\n", file=file_descriptor)
-        self.dupe_indicator.setText(f"{logname} saved.")
+        read, added, skipped, seconds = result
+        rate = read / max(seconds, 0.001)
+        logging.info(
+            "imported %s of %s records, %s skipped, %.0f records/s",
+            added,
+            read,
+            skipped,
+            rate,
+        )
+        self.show_session()
+        self.alerts.show(
+            INFO, f"{added} of {read} imported, {skipped} skipped, {rate:.0f}/s"
+        )
+
+    def qsoclicked(self) -> None:
+        """
+        Opens the edit dialog on the contacts selected in the log, or the
+        one clicked on. The dialog is built once and reused.
+        """
+        items = self.listWidget.selectedItems() or [self.listWidget.currentItem()]
+        record_ids = [item.data(Qt.UserRole) for item in items if item]
+        if not record_ids:
+            return
+        if self.edit_dialog is None:
+            self.edit_dialog = EditQsoDialog(self)
+        self.edit_dialog.setup(record_ids, self.db)
+        self.edit_dialog.open()
+
+    def qsoedited(self) -> None:
+        """
+        Redraws the log after a group sync peer changes it.
+        """
+        self.show_session()
 
     def calcscore(self) -> None:
         """
-        determine the amount od QSO's, S/P per band, DX per band.
+        Shows the QSOs, multipliers and score, kept in self.multipliers.
         """
-        total_qso = 0
-        total_mults = 0
-        total_score = 0
-        with open("SST_Statistics.txt", "w", encoding="ascii") as file_descriptor:
-            print("", file=file_descriptor)
-        bandsworked = self.getbands()
-        for band in bandsworked:
-            try:
-                with sqlite3.connect(self.database) as conn:
-                    cursor = conn.cursor()
-                    query = f"select count(*) from contacts where band='{band}'"
-                    cursor.execute(query)
-                    qso = cursor.fetchone()
-                    query = (
-                        "select count(distinct sandpdx) from contacts "
-                        f"where band='{band}' and sandpdx <> 'DX'"
-                    )
-                    cursor.execute(query)
-                    sandp = cursor.fetchone()
-                    query = (
-                        "select count(*) from contacts "
-                        f"where band='{band}' and sandpdx = 'DX'"
-                    )
-                    cursor.execute(query)
-                    d_x = cursor.fetchone()
-                    with open(
-                        "SST_Statistics.txt", "a", encoding="ascii"
-                    ) as file_descriptor:
-                        print(
-                            f"band:{band} QSOs:{qso[0]} state and "
-                            f"province:{sandp[0]} dx:{d_x[0]} mult:{sandp[0]+d_x[0]}",
-                            end="\r\n",
-                            file=file_descriptor,
-                        )
-                    logging.info(
-                        "score: band:%s q:%s s&p:%s dx:%s", band, qso, sandp, d_x
-                    )
-            except sqlite3.Error as exception:
-                logging.critical("%s", exception)
-            total_qso += qso[0]
-            total_mults += sandp[0] + d_x[0]
-            total_score = total_qso * total_mults
+        total_qso, total_mults, total_score = self.multipliers.score()
+        logging.info("score: q:%s mults:%s", total_qso, total_mults)
         self.Total_CW.setText(str(total_qso))
         self.Total_Mults.setText(str(total_mults))
         self.Total_Score.setText(str(total_score))
-        with open("SST_Statistics.txt", "a", encoding="ascii") as file_descriptor:
-            print(f"Total QSO: {total_qso}", end="\r\n", file=file_descriptor)
-            print(f"Total Mults: {total_mults}", end="\r\n", file=file_descriptor)
-            print(f"Total Score: {total_score}", end="\r\n", file=file_descriptor)
-
-    def getbands(self) -> list:
-        """
-        Returns a list of bands worked, and an empty list if none worked.
-        """
-        bandlist = []
-        try:
-            with sqlite3.connect(self.database) as conn:
-                cursor = conn.cursor()
-                cursor.execute("select DISTINCT band from contacts")
-                returned_query = cursor.fetchall()
-        except sqlite3.Error as exception:
-            logging.critical("%s", exception)
-            return []
-        if returned_query:
-            for count in returned_query:
-                bandlist.append(count[0])
-            return bandlist
-        return []
 
     def generate_logs(self) -> None:
         """
-        When called, calculates the score and generates an adif file.
-        """
-        self.calcscore()
-        self.adif()
+        Writes the ADIF, Cabrillo and statistics files for the active session,
+        in one pass over the log.
+        """
+        self.db.flush()
+        writers = [
+            AdifWriter("SST.adi", self.myexchangeEntry.text()),
+            CabrilloWriter(
+                "SST.log", self.mycallEntry.text(), self.myexchangeEntry.text()
+            ),
+            StatisticsWriter("SST_Statistics.txt"),
+        ]
+        try:
+            count = export(self.db.stream_contacts(), writers)
+        except (sqlite3.Error, IOError, ValueError) as exception:
+            logging.critical("generate_logs: %s", exception)
+            self.alerts.show(ERROR)
+            return
+        logging.info("exported %s contacts", count)
+        self.alerts.show(INFO, "SST.adi, SST.log saved.")
 
 
 class EditQsoDialog(QtWidgets.QDialog):
     """
-    Edits the selected contact from the logwindow.
+    Edits the contacts selected in the logwindow. One contact can be edited
+    field by field, several can be moved to another band or deleted at once.
+    The log window updates itself once the change is committed.
     """
 
-    theitem = ""
-    database = ""
+    # The band picked for several contacts until another is chosen.
+    UNCHANGED = "(unchanged)"
+
+    record_ids = []
+    database = None
 
     def __init__(self, parent=None):
         super().__init__(parent)
         self.working_path = os.path.dirname(__loader__.get_filename())
-        data_path = self.working_path + "/data/dialog.ui"
-        uic.loadUi(data_path, self)
+        load_ui(self, "dialog")
         self.deleteButton.clicked.connect(self.delete_contact)
-        self.buttonBox.accepted.connect(self.save_changes)
-        self.change = QSOEdit()
+        self.editBand.activated.connect(self.band_picked)
+        self.single_fields = (
+            self.editCallsign,
+            self.editExchange,
+            self.editDateTime,
+            self.editFrequency,
+            self.editName,
+            self.editGrid,
+        )
 
-    def setup(self, linetopass: str, thedatabase: str) -> None:
+    def setup(self, record_ids: list, thedatabase: DataBase) -> None:
         """
-        This, well.. sets up the variables
+        Loads the contacts to edit by their record ids.
         """
-        logging.info("%s : %s", linetopass, linetopass.split())
         self.database = thedatabase
-        (
-            self.theitem,
-            thecall,
-            thename,
-            thestate,
-            thedate,
-            thetime,
-            theband,
-        ) = linetopass.split()
-        theexchange = f"{thename} {thestate}"
-        self.editCallsign.setText(thecall)
-        self.editExchange.setText(theexchange)
-        self.editBand.setCurrentIndex(self.editBand.findText(theband))
-        date_time = thedate + " " + thetime
-        now = QtCore.QDateTime.fromString(date_time, "yyyy-MM-dd hh:mm:ss")
-        self.editDateTime.setDateTime(now)
+        contacts = thedatabase.get_contacts(record_ids)
+        self.record_ids = [contact[0] for contact in contacts]
+        if not contacts:
+            return
+        bulk = len(contacts) > 1
+        for field in self.single_fields:
+            field.setEnabled(not bulk)
+        unchanged = self.editBand.findText(self.UNCHANGED)
+        if bulk and unchanged == -1:
+            self.editBand.insertItem(0, self.UNCHANGED)
+        elif not bulk and unchanged != -1:
+            self.editBand.removeItem(unchanged)
+        if bulk:
+            self.setWindowTitle(f"Edit {len(contacts)} QSOs")
+            self.deleteButton.setText(f"Delete {len(contacts)}")
+            for field in self.single_fields:
+                if isinstance(field, QtWidgets.QLineEdit):
+                    field.clear()
+        else:
+            self.setWindowTitle("Edit QSO")
+            self.deleteButton.setText("Delete QSO")
+            (
+                _,
+                thecall,
+                thename,
+                thestate,
+                date_time,
+                frequency,
+                _,
+                grid,
+                opname,
+            ) = contacts[0][:9]
+            self.editCallsign.setText(thecall)
+            self.editExchange.setText(f"{thename} {thestate}")
+            self.editDateTime.setDateTime(
+                QtCore.QDateTime.fromString(date_time, "yyyy-MM-dd hh:mm:ss")
+            )
+            self.editFrequency.setText(str(frequency))
+            self.editName.setText(opname)
+            self.editGrid.setText(grid)
+        band = self.UNCHANGED if bulk else str(contacts[0][6])
+        self.editBand.setCurrentIndex(self.editBand.findText(band))
 
-    def save_changes(self) -> None:
+    def band_picked(self) -> None:
         """
-        Saves changes to contact back to the db.
+        Moves a single contact's frequency into the band picked.
         """
+        if len(self.record_ids) != 1:
+            return
         try:
-            with sqlite3.connect(self.database) as conn:
-                sql = (
-                    f"update contacts set callsign = '{self.editCallsign.text().upper()}', "
-                    f"name = '{self.editExchange.text().upper().split()[0]}', "
-                    f"sandpdx = '{self.editExchange.text().upper().split()[1]}', "
-                    f"date_time = '{self.editDateTime.text()}', "
-                    f"band = '{self.editBand.currentText()}' "
-                    f"where id={self.theitem}"
+            frequency = parse_frequency(self.editFrequency.text())
+        except ValueError:
+            return
+        band = self.editBand.currentText()
+        self.editFrequency.setText(str(move_to_band(frequency, band)))
+
+    def accept(self) -> None:
+        """
+        Saves the changes and closes, unless the exchange or frequency
+        can't be read.
+        """
+        if len(self.record_ids) == 1:
+            if len(self.editExchange.text().split()) < 2:
+                QtWidgets.QMessageBox.warning(
+                    self, "Exchange", "Enter the name and state, for example BOB CA."
                 )
-                cur = conn.cursor()
-                cur.execute(sql)
-                conn.commit()
-        except sqlite3.Error as exception:
-            logging.critical("%s", exception)
-        self.change.lineChanged.emit()
+                self.editExchange.setFocus()
+                return
+            try:
+                parse_frequency(self.editFrequency.text())
+            except ValueError:
+                QtWidgets.QMessageBox.warning(
+                    self,
+                    "Frequency",
+                    "Enter the frequency in Hz, kHz or MHz, for example 14030.",
+                )
+                self.editFrequency.setFocus()
+                return
+        self.save_changes()
+        super().accept()
 
-    def delete_contact(self):
+    def save_changes(self) -> None:
+        """
+        Saves changes to the contacts back to the db.
+        """
+        if len(self.record_ids) > 1:
+            band = self.editBand.currentText()
+            if band != self.UNCHANGED:
+                self.write(self.database.change_band, self.record_ids, band)
+            return
+        if not self.record_ids:
+            return
+        exchange = self.editExchange.text().upper().split()
+        self.write(
+            self.database.change_contact,
+            self.record_ids[0],
+            self.editCallsign.text().upper(),
+            exchange[0],
+            exchange[1],
+            self.editDateTime.text(),
+            self.editBand.currentText(),
+            str(parse_frequency(self.editFrequency.text())),
+            self.editGrid.text().strip().upper(),
+            self.editName.text().strip(),
+        )
+
+    def write(self, change, *args) -> None:
         """
-        Deletes the contact currently being edited.
+        Makes a change to the log, saying so if it couldn't be saved.
         """
         try:
-            with sqlite3.connect(self.database) as conn:
-                sql = f"delete from contacts where id={self.theitem}"
-                cur = conn.cursor()
-                cur.execute(sql)
-                conn.commit()
-        except sqlite3.Error as exception:
-            logging.critical("%s", exception)
-        self.change.lineChanged.emit()
+            change(*args)
+        except IOError as exception:
+            QtWidgets.QMessageBox.critical(
+                self, "Not saved", f"The change couldn't be saved: {exception}"
+            )
+
+    def delete_contact(self):
+        """
+        Deletes the contacts being edited, asking first if there are several.
+        """
+        if len(self.record_ids) > 1:
+            answer = QtWidgets.QMessageBox.question(
+                self, "Delete QSOs", f"Delete these {len(self.record_ids)} contacts?"
+            )
+            if answer != QtWidgets.QMessageBox.Yes:
+                return
+        if self.record_ids:
+            self.write(self.database.delete_contacts, self.record_ids)
         self.close()
 
 
@@ -1154,33 +1534,79 @@ else:
 
 app = QtWidgets.QApplication(sys.argv)
 app.setStyle("Fusion")
+startup_trace.mark("qapplication")
 working_path = os.path.dirname(__loader__.get_filename())
 font_path = working_path + "/data"
 families = load_fonts_from_dir(os.fspath(font_path))
 logging.info(families)
+startup_trace.mark("fonts")
 window = MainWindow()
 window.show()
+startup_trace.mark("show")
 window.create_db()
+startup_trace.mark("create_db")
 window.readpreferences()
+startup_trace.mark("readpreferences")
 window.readpastcontacts()
+startup_trace.mark("readpastcontacts")
 window.read_cw_macros()
-window.logwindow()
+startup_trace.mark("read_cw_macros")
+window.show_session()
+startup_trace.mark("logwindow")
 window.callsign_entry.setFocus()
 timer = QtCore.QTimer()
 timer.timeout.connect(window.update_time)
+app.aboutToQuit.connect(lambda: metrics.dump("SST_metrics.json"))
+app.aboutToQuit.connect(window.profiler.stop)
+app.aboutToQuit.connect(window.shutdown)
 
 
-def run():
+def startup_ready(tries: int = 2000) -> None:
     """
-    Main Entry
+    When tracing startup, wait for the callsign field to actually get focus,
+    then record the timings and quit.
+    """
+    if not window.callsign_entry.hasFocus() and tries:
+        QtCore.QTimer.singleShot(1, lambda: startup_ready(tries - 1))
+        return
+    startup_trace.mark("focus")
+    startup_trace.dump(focus=window.callsign_entry.hasFocus())
+    app.quit()
+
+
+def install_desktop_integration() -> None:
+    """
+    Installs the icon and menu entry. This only needs doing once per install
+    location, so a stamp file holding the package path records that it's done.
     """
     PATH = os.path.dirname(__loader__.get_filename())
-    os.system(
+    stamp = Path.home() / ".k1usnsst_desktop"
+    try:
+        if stamp.exists() and stamp.read_text(encoding="utf-8") == PATH:
+            return
+    except IOError as exception:
+        logging.warning("install_desktop_integration: %s", exception)
+    icon = os.system(
         "xdg-icon-resource install --size 64 --context apps --mode user "
         f"{PATH}/data/k6gte-k1usnsst.png k6gte-k1usnsst"
     )
-    os.system(f"xdg-desktop-menu install {PATH}/data/k6gte-k1usnsst.desktop")
+    menu = os.system(f"xdg-desktop-menu install {PATH}/data/k6gte-k1usnsst.desktop")
+    if icon or menu:
+        return
+    try:
+        stamp.write_text(PATH, encoding="utf-8")
+    except IOError as exception:
+        logging.warning("install_desktop_integration: %s", exception)
+
+
+def run():
+    """
+    Main Entry
+    """
+    install_desktop_integration()
     timer.start(1000)
+    if startup_trace.enabled:
+        QtCore.QTimer.singleShot(0, startup_ready)
     sys.exit(app.exec())
 
 
@@ -0,0 +1,208 @@
+"""
+ADIF log file support.
+"""
+
+import re
+import time
+
+from .database import BANDS, band_for, move_to_band
+from .export import Writer
+
+CHUNK = 65536
+TAG = re.compile(r"<([^:<>]+)(?::(\d+)[^>]*)?>")
+
+
+class AdifWriter(Writer):
+    """
+    Writes contacts to an ADIF file.
+    """
+
+    def __init__(self, filename: str, myexchange: str) -> None:
+        super().__init__(filename)
+        self.myexchange = myexchange
+
+    def header(self, file_descriptor) -> None:
+        print("<ADIF_VER:5>2.2.0", end="\r\n", file=file_descriptor)
+        print("<EOH>", end="\r\n", file=file_descriptor)
+
+    def contact(self, file_descriptor, contact: tuple) -> None:
+        mode = "CW"
+        (
+            _,
+            hiscall,
+            hisname,
+            sandpdx,
+            the_date_and_time,
+            frequency,
+            band,
+            grid,
+            opname,
+        ) = contact[:9]
+        loggeddate = the_date_and_time[:10]
+        loggedtime = the_date_and_time[11:13] + the_date_and_time[14:16]
+        print(
+            f"<QSO_DATE:{len(''.join(loggeddate.split('-')))}:d>"
+            f"{''.join(loggeddate.split('-'))}",
+            end="\r\n",
+            file=file_descriptor,
+        )
+        print(
+            f"<TIME_ON:{len(loggedtime)}>{loggedtime}",
+            end="\r\n",
+            file=file_descriptor,
+        )
+        print(f"<CALL:{len(hiscall)}>{hiscall}", end="\r\n", file=file_descriptor)
+        print(f"<MODE:{len(mode)}>{mode}", end="\r\n", file=file_descriptor)
+        print(
+            f"<BAND:{len(band + 'M')}>{band + 'M'}",
+            end="\r\n",
+            file=file_descriptor,
+        )
+        freq = str(int(frequency) / 1000000)
+        print(f"<FREQ:{len(freq)}>{freq}", end="\r\n", file=file_descriptor)
+        print("<RST_SENT:3>599", end="\r\n", file=file_descriptor)
+        print("<RST_RCVD:3>599", end="\r\n", file=file_descriptor)
+        print(
+            f"<STX_STRING:{len(self.myexchange)}>{self.myexchange}",
+            end="\r\n",
+            file=file_descriptor,
+        )
+        hisexchange = f"{hisname} {sandpdx}"
+        print(
+            f"<SRX_STRING:{len(hisexchange)}>{hisexchange}",
+            end="\r\n",
+            file=file_descriptor,
+        )
+        state = sandpdx
+        if state:
+            print(f"<STATE:{len(state)}>{state}", end="\r\n", file=file_descriptor)
+        if len(grid) > 1:
+            print(
+                f"<GRIDSQUARE:{len(grid)}>{grid}",
+                end="\r\n",
+                file=file_descriptor,
+            )
+        if len(opname) > 1:
+            print(
+                f"<NAME:{len(opname)}>{opname}",
+                end="\r\n",
+                file=file_descriptor,
+            )
+        comment = "K1USN SST"
+        print(
+            f"<COMMENT:{len(comment)}>{comment}",
+            end="\r\n",
+            file=file_descriptor,
+        )
+        contest = "K1USN-SST"
+        print(
+            f"<CONTEST_ID:{len(contest)}>{contest}",
+            end="\r\n",
+            file=file_descriptor,
+        )
+        print("<EOR>", end="\r\n", file=file_descriptor)
+
+
+def read_adif(file_descriptor, chunk_size: int = CHUNK):
+    """
+    Yields each record of an ADIF file as a dict of upper case field name to
+    value, skipping the header. The file is read a chunk at a time, so any
+    size of log can be read in a little memory.
+    """
+    buffer = ""
+    position = 0
+    record = {}
+    search = TAG.search
+    while True:
+        match = search(buffer, position)
+        if match:
+            end = match.end()
+            position = end + int(match.group(2) or 0)
+            if position <= len(buffer):
+                name = match.group(1).strip().upper()
+                if name == "EOH":
+                    record = {}
+                elif name == "EOR":
+                    if record:
+                        yield record
+                    record = {}
+                else:
+                    record[name] = buffer[end:position]
+                continue
+            keep = match.start()
+        else:
+            # There may be the start of a tag at the end of the buffer.
+            keep = buffer.rfind("<", position)
+        chunk = file_descriptor.read(chunk_size)
+        if not chunk:
+            return
+        buffer = (buffer[keep:] if keep != -1 else "") + chunk
+        position = 0
+
+
+def contact_from_adif(record: dict):
+    """
+    Maps an ADIF record to a row for the contacts table, (callsign, name,
+    sandpdx, date_time, frequency, band, grid, opname), or None if it has no
+    call, time, state or band we know. SRX_STRING is the exchange, NAME and
+    STATE stand in for it. DX has to be said, there's no telling a DX contact
+    from a record that's just missing its exchange.
+    """
+    try:
+        call = record["CALL"].strip().upper()
+        date = record["QSO_DATE"].strip()
+        time_on = record["TIME_ON"].strip().ljust(6, "0")
+        date_time = (
+            f"{date[:4]}-{date[4:6]}-{date[6:8]} "
+            f"{time_on[:2]}:{time_on[2:4]}:{time_on[4:6]}"
+        )
+        frequency = int(float(record.get("FREQ") or 0) * 1000000)
+    except (KeyError, ValueError):
+        return None
+    if not call or len(date) != 8:
+        return None
+    band = record.get("BAND", "").strip().upper().rstrip("M") or band_for(frequency)
+    if band not in BANDS:
+        return None
+    if not frequency:
+        # Somewhere in band, the way the logger does when there's no rig.
+        frequency = move_to_band(0, band)
+    received = record.get("SRX_STRING", "").upper().split()
+    opname = record.get("NAME", "").strip()
+    name = received[0] if received else (opname.split() or [""])[0].upper()
+    sandpdx = received[-1] if len(received) > 1 else record.get("STATE", "").upper()
+    if not sandpdx.strip():
+        return None
+    return (
+        call,
+        name,
+        sandpdx.strip(),
+        date_time,
+        str(frequency),
+        band,
+        record.get("GRIDSQUARE", "").strip().upper(),
+        opname,
+    )
+
+
+def import_adif(database, filename: str, batch: int = 5000) -> tuple:
+    """
+    Streams an ADIF file into database, a DataBase. Returns (records read,
+    contacts added, records skipped, seconds taken).
+    Raises IOError and sqlite3.Error.
+    """
+    started = time.perf_counter()
+    skipped = 0
+
+    def rows(file_descriptor):
+        nonlocal skipped
+        for record in read_adif(file_descriptor):
+            row = contact_from_adif(record)
+            if row is None:
+                skipped += 1
+            else:
+                yield row
+
+    with open(filename, "rt", encoding="utf-8", errors="replace") as file_descriptor:
+        read, added = database.import_contacts(rows(file_descriptor), batch)
+    return read + skipped, added, skipped, time.perf_counter() - started
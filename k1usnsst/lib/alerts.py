@@ -0,0 +1,81 @@
+"""
+Operator alerts shown in the dupe indicator.
+
+Only the indicator label is restyled, and the flash is run by a
+QVariantAnimation on the event loop, so raising an alert never re-polishes
+the rest of the window or re-enters the event loop.
+"""
+
+from PyQt5 import QtCore, QtGui  # pylint: disable=no-name-in-module
+
+BACKGROUND = QtGui.QColor(42, 42, 42)
+
+DUPE = "dupe"
+NEW_MULT = "new mult"
+LOOKUP_ERROR = "lookup error"
+ERROR = "error"
+INFO = "info"
+
+# kind: (default text, text colour, flash colour or None for no flash)
+KINDS = {
+    DUPE: (" DUP!!!", QtGui.QColor(230, 97, 0), QtGui.QColor(245, 121, 0)),
+    NEW_MULT: (" NEW MULT", QtGui.QColor(138, 226, 52), QtGui.QColor(78, 154, 6)),
+    LOOKUP_ERROR: ("", QtGui.QColor(239, 41, 41), QtGui.QColor(164, 0, 0)),
+    ERROR: (" Error!", QtGui.QColor(239, 41, 41), QtGui.QColor(164, 0, 0)),
+    INFO: ("", QtGui.QColor(230, 97, 0), None),
+}
+
+
+class Alerts(QtCore.QObject):
+    """
+    Raises alerts on a QLabel. Pass the label at instantiation.
+    """
+
+    def __init__(self, label, duration: int = 600) -> None:
+        super().__init__(label)
+        self.label = label
+        self.kind = None
+        self.foreground = KINDS[INFO][1]
+        self.animation = QtCore.QVariantAnimation(self)
+        self.animation.setDuration(duration)
+        self.animation.setEasingCurve(QtCore.QEasingCurve.OutQuad)
+        self.animation.valueChanged.connect(self._paint)
+
+    def _paint(self, background) -> None:
+        """Restyle just the label."""
+        self.label.setStyleSheet(
+            f"background-color: {background.name()}; color: {self.foreground.name()};"
+        )
+
+    def show(self, kind: str, text: str = None) -> None:
+        """
+        Raise an alert. text replaces the kind's default text.
+        Raising the alert that's already showing does nothing, so it can be
+        called on every keystroke.
+        """
+        default_text, foreground, flash = KINDS[kind]
+        text = default_text if text is None else text
+        if kind == self.kind and text == self.label.text():
+            return
+        self.kind = kind
+        self.foreground = foreground
+        self.label.setText(text)
+        self.animation.stop()
+        if flash is None:
+            self._paint(BACKGROUND)
+            return
+        self.animation.setStartValue(flash)
+        self.animation.setEndValue(BACKGROUND)
+        self.animation.start()
+
+    def clear(self, kind: str = None) -> None:
+        """
+        Clear the alert, or only an alert of the given kind.
+        """
+        if kind is not None and kind != self.kind:
+            return
+        self.kind = None
+        self.animation.stop()
+        self.label.setText("")
+        self.foreground = KINDS[INFO][1]
+        self._paint(BACKGROUND)
@@ -0,0 +1,67 @@
+"""
+Cabrillo 3.0 log file support, in the K1USN SST format.
+
+QSO: 14042 CW 2024-05-13 0005 K6GTE         MIKE       CA  K1USN         TOM        MA
+"""
+
+from .export import Score, Writer
+
+
+class CabrilloWriter(Writer):
+    """
+    Writes contacts to a Cabrillo file for submitting to K1USN.
+    The claimed score is filled in once every contact has been seen.
+    """
+
+    def __init__(self, filename: str, mycall: str, myexchange: str) -> None:
+        super().__init__(filename)
+        self.mycall = mycall.upper()
+        myexchange = myexchange.upper().split() + ["", ""]
+        self.myname, self.mystate = myexchange[:2]
+        self.score = Score()
+        self.claimed_score = 0
+
+    def header(self, file_descriptor) -> None:
+        for tag, value in (
+            ("START-OF-LOG", "3.0"),
+            ("CREATED-BY", "K1USN SST Logger"),
+            ("CONTEST", "K1USN-SST"),
+            ("CALLSIGN", self.mycall),
+            ("OPERATORS", self.mycall),
+            ("NAME", self.myname),
+            ("CATEGORY-OPERATOR", "SINGLE-OP"),
+            ("CATEGORY-BAND", "ALL"),
+            ("CATEGORY-MODE", "CW"),
+        ):
+            print(f"{tag}: {value}", end="\r\n", file=file_descriptor)
+        print("CLAIMED-SCORE: ", end="", file=file_descriptor)
+        self.claimed_score = file_descriptor.tell()
+        print(" " * 10, end="\r\n", file=file_descriptor)
+
+    def contact(self, file_descriptor, contact: tuple) -> None:
+        self.score.add(contact)
+        _, hiscall, hisname, sandpdx, the_date_and_time, frequency = contact[:6]
+        loggeddate = the_date_and_time[:10]
+        loggedtime = the_date_and_time[11:13] + the_date_and_time[14:16]
+        print(
+            f"QSO: {int(frequency) // 1000:>5} CW {loggeddate} {loggedtime} "
+            f"{self.mycall:<13} {self.myname:<10} {self.mystate:<3} "
+            f"{hiscall:<13} {hisname:<10} {sandpdx}",
+            end="\r\n",
+            file=file_descriptor,
+        )
+
+    def footer(self, file_descriptor) -> None:
+        print("END-OF-LOG:", end="\r\n", file=file_descriptor)
+        file_descriptor.seek(self.claimed_score)
+        print(f"{self.score.totals()[2]:<10}", end="", file=file_descriptor)
+
+
+def read_cabrillo(file_descriptor):
+    """
+    Yields (tag, value) for each line of a Cabrillo log, the tag upper case.
+    """
+    for line in file_descriptor:
+        tag, separator, value = line.partition(":")
+        if separator:
+            yield tag.strip().upper(), value.strip()
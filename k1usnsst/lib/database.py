@@ -0,0 +1,1151 @@
+"""
+Database access for the contacts table.
+
+When group sync is on, every local insert, edit and delete is also recorded
+in the changelog table under this station's name and the next sequence
+number, in the same transaction. Peers replay each other's changelogs, see
+groupsync.py, and contacts remember which station and row they came from.
+
+Local writes are acknowledged once they're appended to the pending journal,
+SST.db.pending, and synced to disk, and are committed together a moment
+later in one transaction. Each journal entry has a sequence number, and the
+last one committed is stored in the same transaction, so after a crash the
+entries that never made it are replayed exactly once when the log is next
+opened. Commits are synchronous=FULL, so the journal is only emptied once
+what it held is on disk in the database. An entry that can't be applied is
+moved to SST.db.rejected rather than holding up the ones behind it.
+
+Contacts are grouped into sessions by their UTC time, see session_for. Reads,
+dupe checks and scoring only look at the active session, searches look at
+the whole log.
+"""
+
+import itertools
+import logging
+import os
+import re
+import sqlite3
+import threading
+from datetime import datetime, timedelta, timezone
+from json import dumps, loads
+
+FIELDS = (
+    "callsign",
+    "name",
+    "sandpdx",
+    "date_time",
+    "frequency",
+    "band",
+    "grid",
+    "opname",
+)
+
+
+BANDS = ("160", "80", "60", "40", "30", "20", "17", "15", "12", "10", "6", "2")
+BAND_EDGES = (
+    (1800000, 2000000, "160"),
+    (3500000, 4000000, "80"),
+    (5330000, 5406000, "60"),
+    (7000000, 7300000, "40"),
+    (10100000, 10150000, "30"),
+    (14000000, 14350000, "20"),
+    (18068000, 18168000, "17"),
+    (21000000, 21450000, "15"),
+    (24890000, 24990000, "12"),
+    (28000000, 29700000, "10"),
+    (50000000, 54000000, "6"),
+    (144000000, 148000000, "2"),
+)
+DATE = re.compile(r"^\d{4}(-\d{2}){0,2}$")
+
+# Raised by a journal entry that can never be applied, as opposed to the
+# database being locked or the disk full, which are worth retrying.
+BAD_ENTRY = (
+    sqlite3.IntegrityError,
+    sqlite3.InterfaceError,
+    sqlite3.ProgrammingError,
+    sqlite3.DataError,
+    IndexError,
+    KeyError,
+    TypeError,
+    ValueError,
+)
+# Seconds before a group commit the database refused is tried again.
+RETRY = 1.0
+
+
+# SST runs Mondays 0000z and Fridays 2000z, for an hour. (weekday, hour)
+SCHEDULE = ((0, 0), (4, 20))
+SESSION_LENGTH = timedelta(hours=1)
+SESSION_GRACE = timedelta(minutes=30)
+
+
+def session_for(date_time: str) -> str:
+    """
+    Returns the session a contact logged at date_time, UTC, belongs to.
+    Within half an hour of a scheduled SST it's the start of that SST,
+    "2024-05-13 00:00", otherwise it's the day, "2024-05-14".
+    """
+    try:
+        when = datetime.fromisoformat(date_time[:16])
+    except ValueError:
+        return date_time[:10]
+    for weekday, hour in SCHEDULE:
+        last = when.replace(hour=hour, minute=0) - timedelta(
+            days=(when.weekday() - weekday) % 7
+        )
+        for start in (last, last + timedelta(weeks=1)):
+            if start - SESSION_GRACE <= when < start + SESSION_LENGTH + SESSION_GRACE:
+                return start.strftime("%Y-%m-%d %H:%M")
+    return when.strftime("%Y-%m-%d")
+
+
+def band_for(frequency: int) -> str:
+    """
+    Returns the band a frequency in hertz is in, or "0" if it's out of band.
+    """
+    for low, high, band in BAND_EDGES:
+        if low <= frequency <= high:
+            return band
+    return "0"
+
+
+def move_to_band(frequency: int, band: str) -> int:
+    """
+    Returns frequency, in hertz, moved into band. It keeps its distance
+    above the band edge if that fits, otherwise it's 30 kHz in, the way the
+    logger does without a rig. A frequency already in band stays put, and
+    one for a band we don't know the edges of is returned as it is.
+    """
+    edges = {name: (low, high) for low, high, name in BAND_EDGES}
+    if band not in edges or band_for(frequency) == band:
+        return frequency
+    low, high = edges[band]
+    old = edges.get(band_for(frequency))
+    if old and low + frequency - old[0] <= high:
+        return low + frequency - old[0]
+    return low + 30000
+
+
+def parse_frequency(text: str) -> int:
+    """
+    Returns the frequency typed in text in hertz. Numbers under a thousand
+    are taken as MHz, under a million as kHz, so 14.030, 14030 and 14030000
+    are all the same. Raises ValueError for anything that isn't a frequency.
+    """
+    value = float(text.strip().replace(",", "."))
+    if not 0 < value < 1e10:
+        raise ValueError(f"not a frequency: {text!r}")
+    if value < 1000:
+        value *= 1000000
+    elif value < 1000000:
+        value *= 1000
+    return int(round(value))
+
+
+def prefix_range(prefix: str) -> tuple:
+    """
+    Returns (low, high) so that low <= value < high matches values starting
+    with prefix, which sqlite can answer from an index.
+    """
+    return prefix, prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+
+def parse_filter(text: str) -> tuple:
+    """
+    Turns log filter text into a where clause and its parameters.
+    Terms are anded together:
+        K6      callsign starting with K6
+        CA      a two letter term also matches that state or province
+        call:K6 state:CA st:CA band:20 20m date:2024-05-12 2024-05
+    """
+    clauses = []
+    params = []
+    for term in text.upper().split():
+        key, _, value = term.rpartition(":")
+        if not value:
+            continue
+        if key in ("STATE", "ST"):
+            clauses.append("sandpdx = ?")
+            params.append(value)
+        elif key == "BAND" or (not key and value[:-1] in BANDS and value[-1] == "M"):
+            clauses.append("band = ?")
+            params.append(value.rstrip("M"))
+        elif key == "DATE" or (not key and DATE.match(value)):
+            clauses.append("date_time >= ? and date_time < ?")
+            params.extend(prefix_range(value))
+        elif not key and len(value) == 2 and value.isalpha():
+            clauses.append("((callsign >= ? and callsign < ?) or sandpdx = ?)")
+            params.extend(prefix_range(value) + (value,))
+        else:
+            clauses.append("callsign >= ? and callsign < ?")
+            params.extend(prefix_range(value))
+    return " and ".join(clauses), params
+
+
+def contact_line(contact: tuple) -> str:
+    """
+    Formats a row from the contacts table for the log window.
+    """
+    logid, hiscall, hisname, sandpdx, the_date_and_time, _, band, _, _ = contact[:9]
+    return (
+        f"{str(logid).rjust(3,'0')} {hiscall.ljust(11)} "
+        f"{hisname.ljust(12)} {sandpdx} {the_date_and_time} {str(band).rjust(3)}"
+    )
+
+
+class DataBase:
+    """
+    Reads and writes contacts in the sqlite log.
+    """
+
+    def __init__(self, database: str, group_window: float = 0.25) -> None:
+        self.database = database
+        self.station = ""
+        self.listeners = []
+        self.committed = []
+        self.group_window = group_window
+        self.journal = f"{database}.pending"
+        self.rejected = f"{database}.rejected"
+        self.journal_seq = 0
+        self.pending = []
+        self.lock = threading.Lock()
+        self.commit_lock = threading.Lock()
+        self.commit_timer = None
+        self.journal_file = None
+        self.session = ""
+
+    def create_db(self) -> None:
+        """create a database and table if it does not exist"""
+        try:
+            with sqlite3.connect(self.database) as conn:
+                cursor = conn.cursor()
+                cursor.execute("PRAGMA journal_mode=WAL")
+                cursor.fetchone()
+                sql_table = (
+                    " CREATE TABLE IF NOT EXISTS contacts (id INTEGER PRIMARY KEY, "
+                    "callsign text NOT NULL, name text NOT NULL, sandpdx text NOT NULL, "
+                    "date_time text NOT NULL, frequency text NOT NULL, band text NOT NULL, "
+                    "grid text NOT NULL, opname text NOT NULL, "
+                    "station text NOT NULL DEFAULT '', origin_id integer, "
+                    "session text NOT NULL DEFAULT ''); "
+                )
+                cursor.execute(sql_table)
+                cursor.execute("PRAGMA table_info(contacts)")
+                columns = [row[1] for row in cursor.fetchall()]
+                if "station" not in columns:
+                    cursor.execute(
+                        "ALTER TABLE contacts ADD COLUMN station text NOT NULL DEFAULT ''"
+                    )
+                if "origin_id" not in columns:
+                    cursor.execute("ALTER TABLE contacts ADD COLUMN origin_id integer")
+                if "session" not in columns:
+                    cursor.execute(
+                        "ALTER TABLE contacts ADD COLUMN session text NOT NULL DEFAULT ''"
+                    )
+                conn.create_function("session_for", 1, session_for)
+                cursor.execute(
+                    "update contacts set session = session_for(date_time) "
+                    "where session = ''"
+                )
+                cursor.execute(
+                    "CREATE INDEX IF NOT EXISTS contacts_session_band "
+                    "ON contacts(session, band, sandpdx)"
+                )
+                cursor.execute(
+                    "CREATE INDEX IF NOT EXISTS contacts_session_date_time "
+                    "ON contacts(session, date_time)"
+                )
+                cursor.execute(
+                    "CREATE INDEX IF NOT EXISTS contacts_callsign_band_date_time "
+                    "ON contacts(callsign, band, date_time)"
+                )
+                cursor.execute(
+                    "CREATE UNIQUE INDEX IF NOT EXISTS contacts_origin "
+                    "ON contacts(station, origin_id)"
+                )
+                cursor.execute(
+                    "CREATE TABLE IF NOT EXISTS changelog (station text NOT NULL, "
+                    "seq integer NOT NULL, op text NOT NULL, "
+                    "target_station text NOT NULL, target_id integer NOT NULL, "
+                    "fields text NOT NULL, PRIMARY KEY (station, seq))"
+                )
+                cursor.execute(
+                    "CREATE INDEX IF NOT EXISTS changelog_target "
+                    "ON changelog(target_station, target_id)"
+                )
+                # The log filter searches every session, newest first.
+                for columns in ("band, date_time", "sandpdx, date_time", "date_time"):
+                    name = columns.replace(", ", "_")
+                    cursor.execute(
+                        f"CREATE INDEX IF NOT EXISTS contacts_{name} "
+                        f"ON contacts({columns})"
+                    )
+                for name in ("callsign", "band", "sandpdx"):
+                    # Superseded by the indexes above.
+                    cursor.execute(f"DROP INDEX IF EXISTS contacts_{name}")
+                cursor.execute(
+                    "CREATE TABLE IF NOT EXISTS journal_state "
+                    "(id INTEGER PRIMARY KEY CHECK (id = 1), last_seq integer NOT NULL)"
+                )
+                cursor.execute(
+                    "CREATE TABLE IF NOT EXISTS lookup_queue "
+                    "(callsign text PRIMARY KEY, queued text NOT NULL)"
+                )
+        except sqlite3.Error as exception:
+            logging.critical("%s", exception)
+            return
+        self.recover()
+        self.session = self.detect_session()
+
+    def recover(self) -> None:
+        """
+        Commits journal entries left behind by a crash.
+        """
+        entries = []
+        try:
+            with open(self.journal, "rt", encoding="utf-8") as file_descriptor:
+                for line in file_descriptor:
+                    try:
+                        entries.append(loads(line))
+                    except ValueError:
+                        # The write that was cut off by the crash, never acknowledged.
+                        break
+        except FileNotFoundError:
+            pass
+        except IOError as exception:
+            logging.critical("recover: %s", exception)
+            return
+        if not entries:
+            try:
+                with sqlite3.connect(self.database) as conn:
+                    last_seq = self._last_committed(conn.cursor())
+            except sqlite3.Error as exception:
+                logging.critical("%s", exception)
+                return
+            with self.lock:
+                self.journal_seq = max(self.journal_seq, last_seq)
+            return
+        with self.commit_lock:
+            done, _ = self._commit_entries(entries)
+        with self.lock:
+            self.journal_seq = max(self.journal_seq, entries[-1]["seq"])
+            if done == len(entries):
+                self._truncate_journal()
+            else:
+                # The database can't be written, pick up where this left off.
+                self.pending = entries[done:]
+                self._arm_timer(RETRY)
+
+    def _last_committed(self, cursor) -> int:
+        """Sequence number of the last journal entry committed."""
+        cursor.execute("select last_seq from journal_state where id = 1")
+        row = cursor.fetchone()
+        return row[0] if row else 0
+
+    def _truncate_journal(self) -> None:
+        """Empty the journal. Call holding self.lock, with nothing pending."""
+        if self.journal_file:
+            self.journal_file.close()
+            self.journal_file = None
+        try:
+            with open(self.journal, "wt", encoding="utf-8"):
+                pass
+        except IOError as exception:
+            logging.critical("%s", exception)
+
+    def _submit(self, operation: str, args: list) -> None:
+        """
+        Journal a local write and schedule the group commit. Returns once the
+        entry is on disk. Raises IOError if it couldn't be journaled, in
+        which case nothing was written.
+        """
+        with self.lock:
+            entry = {"seq": self.journal_seq + 1, "op": operation, "args": args}
+            self._append_journal(dumps(entry) + "\n")
+            self.journal_seq += 1
+            self.pending.append(entry)
+            self._arm_timer(self.group_window)
+
+    def _append_journal(self, line: str) -> None:
+        """Append a line to the journal and sync it. Call holding self.lock."""
+        created = False
+        try:
+            if self.journal_file is None:
+                created = not os.path.exists(self.journal)
+                self.journal_file = open(  # pylint: disable=consider-using-with
+                    self.journal, "at", encoding="utf-8"
+                )
+            offset = self.journal_file.tell()
+        except IOError as exception:
+            logging.critical("%s", exception)
+            raise
+        try:
+            self.journal_file.write(line)
+            self.journal_file.flush()
+            os.fsync(self.journal_file.fileno())
+        except IOError as exception:
+            logging.critical("%s", exception)
+            try:
+                # Don't leave half a line for the next entry to follow.
+                self.journal_file.truncate(offset)
+            except IOError:
+                pass
+            self.journal_file.close()
+            self.journal_file = None
+            raise
+        if created:
+            self._sync_directory()
+
+    def _sync_directory(self) -> None:
+        """Make sure a newly created journal survives a power cut."""
+        try:
+            directory = os.open(
+                os.path.dirname(os.path.abspath(self.journal)), os.O_RDONLY
+            )
+        except OSError:
+            # Windows can't open a directory, and doesn't need to.
+            return
+        try:
+            os.fsync(directory)
+        except OSError as exception:
+            logging.warning("%s", exception)
+        finally:
+            os.close(directory)
+
+    def _arm_timer(self, delay: float) -> None:
+        """Schedule a group commit unless one is. Call holding self.lock."""
+        if self.commit_timer is None:
+            self.commit_timer = threading.Timer(delay, self.flush)
+            self.commit_timer.daemon = True
+            self.commit_timer.start()
+
+    def flush(self) -> None:
+        """
+        Commits everything pending in one transaction. If the database can't
+        be written the entries stay pending and it's tried again shortly.
+        """
+        with self.commit_lock:
+            with self.lock:
+                self.commit_timer = None
+                entries = list(self.pending)
+            if not entries:
+                return
+            done, committed = self._commit_entries(entries)
+            with self.lock:
+                del self.pending[:done]
+                if not self.pending:
+                    self._truncate_journal()
+                elif done < len(entries):
+                    self._arm_timer(RETRY)
+                else:
+                    self._arm_timer(self.group_window)
+        # Each callback gets the journal entries just committed.
+        if committed:
+            for callback in self.committed:
+                callback(committed)
+
+    def close(self) -> None:
+        """Commit anything pending and stop the group commit timer."""
+        self.flush()
+        with self.lock:
+            if self.commit_timer:
+                # Anything still pending is replayed from the journal next time.
+                self.commit_timer.cancel()
+                self.commit_timer = None
+
+    def _commit_entries(self, entries: list) -> tuple:
+        """
+        Commits entries in one transaction. If one of them can't be applied
+        they're committed one at a time instead, and the bad ones set aside.
+        Returns (how many of entries were dealt with, the entries committed).
+        Fewer than all were dealt with if the database couldn't be written.
+        """
+        try:
+            if self._commit(entries) is None:
+                return 0, []
+            return len(entries), entries
+        except BAD_ENTRY:
+            pass
+        committed = []
+        for done, entry in enumerate(entries):
+            try:
+                last_seq = self._commit([entry])
+            except BAD_ENTRY as exception:
+                self._reject(entry, exception)
+                last_seq = self._commit([{"seq": entry["seq"], "op": "", "args": []}])
+            else:
+                committed.append(entry)
+            if last_seq is None:
+                return done, committed
+        return len(entries), committed
+
+    def _reject(self, entry: dict, exception: Exception) -> None:
+        """Moves a journal entry that can't be applied aside."""
+        logging.critical(
+            "journal entry %s can't be applied, moved to %s: %s %r",
+            entry["seq"],
+            self.rejected,
+            entry,
+            exception,
+        )
+        try:
+            with open(self.rejected, "at", encoding="utf-8") as file_descriptor:
+                file_descriptor.write(dumps(entry) + "\n")
+        except IOError as error:
+            logging.critical("%s", error)
+
+    def _commit(self, entries: list) -> int:
+        """
+        Applies journal entries not yet committed, in one transaction.
+        Returns the last sequence number committed, or None if the database
+        couldn't be written. Raises one of BAD_ENTRY if an entry is at fault.
+        """
+        ops = []
+        try:
+            with sqlite3.connect(self.database) as conn:
+                cursor = conn.cursor()
+                cursor.execute("PRAGMA synchronous=FULL")
+                last_seq = self._last_committed(cursor)
+                for entry in entries:
+                    if entry["seq"] <= last_seq:
+                        continue
+                    ops.extend(self._apply_local(cursor, entry["op"], entry["args"]))
+                    last_seq = entry["seq"]
+                cursor.execute(
+                    "insert or replace into journal_state (id, last_seq) values (1, ?)",
+                    (last_seq,),
+                )
+                conn.commit()
+        except BAD_ENTRY:
+            raise
+        except sqlite3.Error as exception:
+            logging.critical("%s", exception)
+            return None
+        self._notify(ops)
+        return last_seq
+
+    def _apply_local(self, cursor, operation: str, args: list) -> list:
+        """
+        Performs one local write. Returns the changes to share with the group.
+        """
+        ops = []
+        if operation == "insert":
+            sql = (
+                "INSERT INTO contacts(callsign, name, sandpdx, date_time, "
+                "frequency, band, grid, opname, session) VALUES(?,?,?,?,?,?,?,?,?)"
+            )
+            logging.info("%s\n%s", sql, args)
+            cursor.execute(sql, list(args) + [session_for(args[3])])
+            if self.station:
+                target, _ = self._target(cursor, cursor.lastrowid)
+                ops.append(self._record(cursor, "insert", *target))
+        elif operation == "update":
+            record_id, date_time = args[0], args[4]
+            sql = (
+                "update contacts set callsign = ?, name = ?, sandpdx = ?, "
+                "date_time = ?, band = ?, frequency = ?, grid = ?, opname = ?, "
+                "session = ? where id = ?"
+            )
+            cursor.execute(sql, list(args[1:9]) + [session_for(date_time), record_id])
+            ops.extend(self._record_changes(cursor, [record_id]))
+        elif operation == "reband":
+            band, record_ids = args[0], args[1:]
+            cursor.execute(
+                "select id, frequency from contacts where id in "
+                f"({', '.join('?' * len(record_ids))})",
+                record_ids,
+            )
+            moves = []
+            for record_id, frequency in cursor.fetchall():
+                try:
+                    frequency = int(float(frequency))
+                except ValueError:
+                    frequency = 0
+                moves.append((band, str(move_to_band(frequency, band)), record_id))
+            cursor.executemany(
+                "update contacts set band = ?, frequency = ? where id = ?", moves
+            )
+            ops.extend(self._record_changes(cursor, record_ids))
+        elif operation == "delete":
+            # One or more record ids.
+            for record_id in args:
+                if self.station:
+                    target, claimed = self._target(cursor, record_id)
+                    if target and not claimed:
+                        ops.append(self._record(cursor, "delete", *target))
+            cursor.executemany(
+                "delete from contacts where id = ?",
+                [(record_id,) for record_id in args],
+            )
+        elif operation == "lookup":
+            callsign, grid, opname = args
+            cursor.execute(
+                "select id from contacts where callsign = ? and grid = '' "
+                "and opname = ''",
+                (callsign,),
+            )
+            record_ids = [row[0] for row in cursor.fetchall()]
+            cursor.executemany(
+                "update contacts set grid = ?, opname = ? where id = ?",
+                [(grid, opname, record_id) for record_id in record_ids],
+            )
+            ops.extend(self._record_changes(cursor, record_ids))
+        return ops
+
+    def _record_changes(self, cursor, record_ids: list) -> list:
+        """Changelog entries for rows edited in place."""
+        ops = []
+        if not self.station:
+            return ops
+        for record_id in record_ids:
+            target, claimed = self._target(cursor, record_id)
+            if target:
+                operation = "insert" if claimed else "update"
+                ops.append(self._record(cursor, operation, *target))
+        return ops
+
+    def _notify(self, ops: list) -> None:
+        """Tell listeners about committed local changes."""
+        for op in ops:
+            for listener in self.listeners:
+                listener(op)
+
+    def _record(
+        self, cursor, operation: str, target_station: str, target_id: int
+    ) -> dict:
+        """
+        Appends a local change to the changelog. Returns the change.
+        """
+        fields = {}
+        if operation != "delete":
+            cursor.execute(
+                f"select {', '.join(FIELDS)} from contacts "
+                "where station = ? and origin_id = ?",
+                (target_station, target_id),
+            )
+            fields = dict(zip(FIELDS, cursor.fetchone()))
+        cursor.execute(
+            "select coalesce(max(seq), 0) + 1 from changelog where station = ?",
+            (self.station,),
+        )
+        op = {
+            "station": self.station,
+            "seq": cursor.fetchone()[0],
+            "op": operation,
+            "target_station": target_station,
+            "target_id": target_id,
+            "fields": fields,
+        }
+        cursor.execute(
+            "insert into changelog "
+            "(station, seq, op, target_station, target_id, fields) "
+            "values (?, ?, ?, ?, ?, ?)",
+            (
+                op["station"],
+                op["seq"],
+                operation,
+                target_station,
+                target_id,
+                dumps(fields),
+            ),
+        )
+        return op
+
+    def _target(self, cursor, record_id: int) -> tuple:
+        """
+        Returns the (station, origin_id) a row is known by across the group,
+        claiming rows logged before sync was switched on for this station.
+        The second item is True if the row was claimed, so peers need the
+        whole row rather than just the change.
+        """
+        cursor.execute(
+            "select station, origin_id from contacts where id = ?", (record_id,)
+        )
+        row = cursor.fetchone()
+        if row is None:
+            return None, False
+        if row[0]:
+            return row, False
+        cursor.execute(
+            "update contacts set station = ?, origin_id = id where id = ?",
+            (self.station, record_id),
+        )
+        return (self.station, record_id), True
+
+    def adopt_local_contacts(self) -> None:
+        """
+        Records contacts logged before sync was switched on, or imported, as
+        this station's, so peers pick them up.
+        """
+        ops = []
+        try:
+            with sqlite3.connect(self.database) as conn:
+                cursor = conn.cursor()
+                cursor.execute("select id from contacts where station = ''")
+                for (record_id,) in cursor.fetchall():
+                    target, _ = self._target(cursor, record_id)
+                    ops.append(self._record(cursor, "insert", *target))
+                conn.commit()
+        except sqlite3.Error as exception:
+            logging.critical("%s", exception)
+            return
+        if ops:
+            # An import can adopt thousands, so rather than a datagram each
+            # the new heads are announced once and peers catch up over tcp.
+            for listener in self.listeners:
+                listener(None)
+
+    def heads(self) -> dict:
+        """
+        Returns the highest sequence number held for each station.
+        """
+        try:
+            with sqlite3.connect(self.database) as conn:
+                cursor = conn.cursor()
+                cursor.execute("select station, max(seq) from changelog group by station")
+                return dict(cursor.fetchall())
+        except sqlite3.Error as exception:
+            logging.critical("%s", exception)
+        return {}
+
+    def changes_since(self, heads: dict) -> list:
+        """
+        Returns every change newer than heads, oldest first per station.
+        """
+        try:
+            with sqlite3.connect(self.database) as conn:
+                cursor = conn.cursor()
+                cursor.execute("select distinct station from changelog")
+                changes = []
+                for (station,) in cursor.fetchall():
+                    cursor.execute(
+                        "select seq, op, target_station, target_id, fields "
+                        "from changelog where station = ? and seq > ? order by seq",
+                        (station, heads.get(station, 0)),
+                    )
+                    for seq, operation, target_station, target_id, fields in (
+                        cursor.fetchall()
+                    ):
+                        changes.append(
+                            {
+                                "station": station,
+                                "seq": seq,
+                                "op": operation,
+                                "target_station": target_station,
+                                "target_id": target_id,
+                                "fields": loads(fields),
+                            }
+                        )
+                return changes
+        except sqlite3.Error as exception:
+            logging.critical("%s", exception)
+        return []
+
+    def apply_change(self, op: dict) -> bool:
+        """
+        Applies a change from another station.
+        Returns False if it isn't the next one expected from that station.
+        Each station's changes arrive in order, but one station's edit of a
+        contact can arrive before the insert of it from the station that
+        logged it. An edit of a contact we don't have yet is only recorded,
+        and applied on top of the insert when that arrives. Inserts never
+        overwrite, and a deleted contact stays deleted.
+        """
+        try:
+            with sqlite3.connect(self.database) as conn:
+                cursor = conn.cursor()
+                cursor.execute(
+                    "select coalesce(max(seq), 0) from changelog where station = ?",
+                    (op["station"],),
+                )
+                if op["seq"] != cursor.fetchone()[0] + 1:
+                    return False
+                target = (op["target_station"], op["target_id"])
+                cursor.execute(
+                    "select count(*) from changelog where target_station = ? "
+                    "and target_id = ? and op = 'delete'",
+                    target,
+                )
+                deleted = cursor.fetchone()[0]
+                cursor.execute(
+                    "select id from contacts where station = ? and origin_id = ?",
+                    target,
+                )
+                row = cursor.fetchone()
+                fields = op["fields"]
+                session = (session_for(fields["date_time"]),) if fields else ()
+                if op["op"] == "delete":
+                    cursor.execute(
+                        "delete from contacts where station = ? and origin_id = ?",
+                        target,
+                    )
+                elif row and op["op"] == "update":
+                    cursor.execute(
+                        f"update contacts set {' = ?, '.join(FIELDS)} = ?, session = ? "
+                        "where id = ?",
+                        tuple(fields[field] for field in FIELDS) + session + (row[0],),
+                    )
+                elif not row and not deleted and op["op"] == "insert":
+                    cursor.execute(
+                        "select fields from changelog where target_station = ? "
+                        "and target_id = ? and op = 'update' order by rowid desc",
+                        target,
+                    )
+                    edited = cursor.fetchone()
+                    # Edited elsewhere before it got here, the edit wins.
+                    current = loads(edited[0]) if edited else fields
+                    cursor.execute(
+                        f"insert into contacts ({', '.join(FIELDS)}, station, origin_id, "
+                        f"session) values ({', '.join('?' * (len(FIELDS) + 3))})",
+                        tuple(current[field] for field in FIELDS)
+                        + target
+                        + (session_for(current["date_time"]),),
+                    )
+                cursor.execute(
+                    "insert into changelog "
+                    "(station, seq, op, target_station, target_id, fields) "
+                    "values (?, ?, ?, ?, ?, ?)",
+                    (op["station"], op["seq"], op["op"]) + target + (dumps(fields),),
+                )
+                conn.commit()
+                return True
+        except (sqlite3.Error, KeyError) as exception:
+            logging.critical("%s", exception)
+        return False
+
+    def dup_check(self, acall: str) -> list:
+        """
+        Returns (callsign, name, sandpdx, band) for each time acall was worked
+        in the active session.
+        """
+        try:
+            with sqlite3.connect(self.database) as conn:
+                cursor = conn.cursor()
+                cursor.execute(
+                    "select callsign, name, sandpdx, band from contacts "
+                    "where session = ? and callsign like ? order by band",
+                    (self.session, acall),
+                )
+                log = cursor.fetchall()
+        except sqlite3.Error as exception:
+            logging.critical("%s", exception)
+            log = []
+        with self.lock:
+            for entry in self.pending:
+                args = entry["args"]
+                if (
+                    entry["op"] == "insert"
+                    and args[0].upper() == acall.upper()
+                    and session_for(args[3]) == self.session
+                ):
+                    log.append((args[0], args[1], args[2], args[5]))
+        return log
+
+    def log_contact(self, contact: tuple) -> None:
+        """
+        Logs a contact, stamped with the current UTC time.
+        contact is (callsign, name, sandpdx, frequency, band, grid, opname).
+        Returns the session it was logged in.
+        """
+        now = datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+        self._submit("insert", list(contact[:3]) + [now] + list(contact[3:]))
+        return session_for(now)
+
+    def change_contact(
+        self,
+        record_id: int,
+        callsign: str,
+        name: str,
+        sandpdx: str,
+        date_time: str,
+        band: str,
+        frequency: str,
+        grid: str,
+        opname: str,
+    ) -> None:
+        """
+        Updates a contact.
+        """
+        self._submit(
+            "update",
+            [
+                record_id,
+                callsign,
+                name,
+                sandpdx,
+                date_time,
+                band,
+                frequency,
+                grid,
+                opname,
+            ],
+        )
+
+    def change_band(self, record_ids: list, band: str) -> None:
+        """
+        Moves several contacts to band, and their frequencies into it,
+        in one transaction.
+        """
+        self._submit("reband", [band] + list(record_ids))
+
+    def delete_contacts(self, record_ids: list) -> None:
+        """
+        Deletes several contacts, in one transaction.
+        """
+        self._submit("delete", list(record_ids))
+
+    def import_contacts(self, rows, batch: int = 5000) -> tuple:
+        """
+        Adds contacts from another log. rows are (callsign, name, sandpdx,
+        date_time, frequency, band, grid, opname) and can be a generator.
+        Rows with the same call, band and minute as a contact already in the
+        log, or earlier in rows, are skipped. The rows are read batch at a
+        time but go in as one transaction, bypassing the journal: a crash or
+        error part way leaves none of them in the log, and the import can
+        simply be run again. Returns (rows read, contacts added).
+        Raises sqlite3.Error.
+        """
+        self.flush()
+        sql = (
+            "insert into contacts (callsign, name, sandpdx, date_time, frequency, "
+            "band, grid, opname, session) select ?, ?, ?, ?, ?, ?, ?, ?, ? "
+            "where not exists (select 1 from contacts where callsign = ? "
+            "and band = ? and date_time >= ? and date_time < ?)"
+        )
+        read = added = 0
+        rows = iter(rows)
+        with sqlite3.connect(self.database) as conn:
+            conn.execute("PRAGMA synchronous=FULL")
+            while True:
+                chunk = [
+                    tuple(row)
+                    + (session_for(row[3]), row[0], row[5])
+                    + prefix_range(row[3][:16])
+                    for row in itertools.islice(rows, batch)
+                ]
+                if not chunk:
+                    break
+                before = conn.total_changes
+                conn.executemany(sql, chunk)
+                added += conn.total_changes - before
+                read += len(chunk)
+            # Leaving the with block commits everything, or rolls it all back.
+        if self.station and added:
+            self.adopt_local_contacts()
+        return read, added
+
+    def get_contacts(self, record_ids: list) -> list:
+        """
+        Returns the contacts with these ids, in any session.
+        """
+        if not record_ids:
+            return []
+        try:
+            with sqlite3.connect(self.database) as conn:
+                cursor = conn.cursor()
+                cursor.execute(
+                    "select * from contacts where id in "
+                    f"({', '.join('?' * len(record_ids))})",
+                    list(record_ids),
+                )
+                return cursor.fetchall()
+        except sqlite3.Error as exception:
+            logging.critical("%s", exception)
+        return []
+
+    def fill_lookup(self, callsign: str, grid: str, opname: str) -> None:
+        """
+        Fills in the grid and name of contacts with callsign that were
+        logged without a lookup.
+        """
+        self._submit("lookup", [callsign, grid, opname])
+
+    def queue_lookup(self, callsign: str) -> None:
+        """
+        Remembers that callsign still needs looking up.
+        """
+        now = datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+        try:
+            with sqlite3.connect(self.database) as conn:
+                conn.execute(
+                    "insert or ignore into lookup_queue (callsign, queued) "
+                    "values (?, ?)",
+                    (callsign, now),
+                )
+        except sqlite3.Error as exception:
+            logging.critical("%s", exception)
+
+    def queued_lookups(self, limit: int = 1) -> list:
+        """
+        Returns up to limit callsigns waiting for a lookup, oldest first.
+        """
+        try:
+            with sqlite3.connect(self.database) as conn:
+                cursor = conn.cursor()
+                cursor.execute(
+                    "select callsign from lookup_queue order by queued, rowid limit ?",
+                    (limit,),
+                )
+                return [row[0] for row in cursor.fetchall()]
+        except sqlite3.Error as exception:
+            logging.critical("%s", exception)
+            return []
+
+    def dequeue_lookup(self, callsign: str) -> None:
+        """
+        Takes callsign off the lookup queue.
+        """
+        try:
+            with sqlite3.connect(self.database) as conn:
+                conn.execute("delete from lookup_queue where callsign = ?", (callsign,))
+        except sqlite3.Error as exception:
+            logging.critical("%s", exception)
+
+    def sessions(self) -> list:
+        """
+        Returns (session, contacts) for every session in the log, newest first.
+        """
+        try:
+            with sqlite3.connect(self.database) as conn:
+                cursor = conn.cursor()
+                cursor.execute(
+                    "select session, count(*) from contacts "
+                    "group by session order by session desc"
+                )
+                return cursor.fetchall()
+        except sqlite3.Error as exception:
+            logging.critical("%s", exception)
+        return []
+
+    def detect_session(self) -> str:
+        """
+        The session to open with. The SST underway if there is one,
+        otherwise the newest session in the log.
+        """
+        now = session_for(datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M"))
+        if " " in now:
+            return now
+        sessions = self.sessions()
+        return sessions[0][0] if sessions else now
+
+    def archive_session(self, session: str) -> tuple:
+        """
+        Moves a session's contacts to their own database next to this one,
+        SST-2024-05-13-0000.db for example. Group sync peers keep their copies.
+        Returns (archive file name, contacts moved).
+        """
+        self.flush()
+        filename = os.path.join(
+            os.path.dirname(self.database),
+            f"SST-{session.replace(' ', '-').replace(':', '')}.db",
+        )
+        archive = DataBase(filename)
+        archive.create_db()
+        columns = ", ".join(FIELDS + ("station", "origin_id", "session"))
+        try:
+            with sqlite3.connect(self.database) as conn:
+                cursor = conn.cursor()
+                cursor.execute("attach database ? as archive", (filename,))
+                cursor.execute(
+                    f"insert or ignore into archive.contacts ({columns}) "
+                    f"select {columns} from contacts where session = ? order by id",
+                    (session,),
+                )
+                cursor.execute("delete from contacts where session = ?", (session,))
+                moved = cursor.rowcount
+                conn.commit()
+                cursor.execute("detach database archive")
+        except sqlite3.Error as exception:
+            logging.critical("%s", exception)
+            return filename, 0
+        logging.info("archived %s contacts to %s", moved, filename)
+        return filename, moved
+
+    def fetch_all_contacts_desc(self) -> list:
+        """
+        Returns every contact in the active session, newest first.
+        """
+        try:
+            with sqlite3.connect(self.database) as conn:
+                cursor = conn.cursor()
+                cursor.execute(
+                    "select * from contacts where session = ? order by date_time desc",
+                    (self.session,),
+                )
+                return cursor.fetchall()
+        except sqlite3.Error as exception:
+            logging.critical("%s", exception)
+        return []
+
+    def search(self, text: str, limit: int = 500) -> list:
+        """
+        Returns up to limit contacts in any session matching filter text,
+        newest first. See parse_filter for the syntax.
+        """
+        where, params = parse_filter(text)
+        if not where:
+            return self.fetch_all_contacts_desc()
+        try:
+            with sqlite3.connect(self.database) as conn:
+                cursor = conn.cursor()
+                cursor.execute(
+                    f"select * from contacts where {where} "
+                    "order by date_time desc limit ?",
+                    params + [limit],
+                )
+                return cursor.fetchall()
+        except sqlite3.Error as exception:
+            logging.critical("%s", exception)
+        return []
+
+    def recent_contacts(self, since: str) -> list:
+        """
+        Returns (date_time, band) for contacts logged at or after since,
+        in any session, oldest first.
+        """
+        # A contact's session starts at most SESSION_LENGTH + SESSION_GRACE
+        # before it, which lets sqlite use contacts_session_date_time.
+        earliest = datetime.fromisoformat(since[:19]) - SESSION_LENGTH - SESSION_GRACE
+        try:
+            with sqlite3.connect(self.database) as conn:
+                cursor = conn.cursor()
+                cursor.execute(
+                    "select date_time, band from contacts "
+                    "where session >= ? and date_time >= ? order by date_time",
+                    (earliest.strftime("%Y-%m-%d"), since),
+                )
+                return cursor.fetchall()
+        except sqlite3.Error as exception:
+            logging.critical("%s", exception)
+        return []
+
+    def stream_contacts(self):
+        """
+        Yields every contact in the active session, oldest first, without
+        reading the whole session into memory.
+        Raises sqlite3.Error so the caller can tell an empty log from a failure.
+        """
+        with sqlite3.connect(self.database) as conn:
+            yield from conn.execute(
+                "select * from contacts where session = ? order by date_time ASC",
+                (self.session,),
+            )
+
+    def get_worked(self) -> list:
+        """
+        Returns (band, state, province or DX, contacts) for everything worked
+        in the active session, which is all the score needs.
+        """
+        try:
+            with sqlite3.connect(self.database) as conn:
+                cursor = conn.cursor()
+                cursor.execute(
+                    "select band, sandpdx, count(*) from contacts "
+                    "where session = ? group by band, sandpdx",
+                    (self.session,),
+                )
+                return cursor.fetchall()
+        except sqlite3.Error as exception:
+            logging.critical("%s", exception)
+        return []
@@ -0,0 +1,123 @@
+"""
+Log export.
+
+export() reads the contacts once and hands each one to every writer, so
+adding a format doesn't add another pass over the log. Each writer works on
+a temporary file, and they're only moved over the real files once all of
+them have finished, so a failed export never leaves a half written file.
+"""
+
+import os
+from contextlib import ExitStack
+
+
+class Writer:
+    """
+    One output file. Subclasses override header, contact and footer.
+    """
+
+    encoding = "ascii"
+
+    def __init__(self, filename: str) -> None:
+        self.filename = filename
+
+    def header(self, file_descriptor) -> None:
+        """Called before the first contact."""
+
+    def contact(self, file_descriptor, contact: tuple) -> None:
+        """Called with each row from the contacts table, oldest first."""
+
+    def footer(self, file_descriptor) -> None:
+        """Called after the last contact."""
+
+
+def export(contacts, writers: list) -> int:
+    """
+    Streams contacts through writers in one pass.
+    Returns the number of contacts written.
+    """
+    temporary = [f"{writer.filename}.tmp" for writer in writers]
+    count = 0
+    try:
+        with ExitStack() as stack:
+            outputs = [
+                (writer, stack.enter_context(open(name, "w", encoding=writer.encoding)))
+                for writer, name in zip(writers, temporary)
+            ]
+            for writer, file_descriptor in outputs:
+                writer.header(file_descriptor)
+            for contact in contacts:
+                for writer, file_descriptor in outputs:
+                    writer.contact(file_descriptor, contact)
+                count += 1
+            for writer, file_descriptor in outputs:
+                writer.footer(file_descriptor)
+    except BaseException:
+        for name in temporary:
+            try:
+                os.remove(name)
+            except FileNotFoundError:
+                pass
+        raise
+    for writer, name in zip(writers, temporary):
+        os.replace(name, writer.filename)
+    return count
+
+
+class Score:
+    """
+    Tallies the SST score as contacts go by. A mult is each state or
+    province once per band, and every DX contact.
+    """
+
+    def __init__(self) -> None:
+        self.bands = {}
+
+    def add(self, contact: tuple) -> None:
+        """Count a row from the contacts table."""
+        sandpdx, band = contact[3], contact[6]
+        tally = self.bands.setdefault(band, [0, set(), 0])
+        tally[0] += 1
+        if sandpdx == "DX":
+            tally[2] += 1
+        else:
+            tally[1].add(sandpdx)
+
+    def band_scores(self) -> list:
+        """Returns (band, QSOs, states and provinces, DX) for each band."""
+        return [
+            (band, qso, len(sandp), d_x) for band, (qso, sandp, d_x) in self.bands.items()
+        ]
+
+    def totals(self) -> tuple:
+        """Returns (QSOs, mults, score)."""
+        total_qso = sum(qso for _, qso, _, _ in self.band_scores())
+        total_mults = sum(sandp + d_x for _, _, sandp, d_x in self.band_scores())
+        return total_qso, total_mults, total_qso * total_mults
+
+
+class StatisticsWriter(Writer):
+    """
+    The band by band breakdown and score, SST_Statistics.txt.
+    """
+
+    def __init__(self, filename: str) -> None:
+        super().__init__(filename)
+        self.score = Score()
+
+    def contact(self, file_descriptor, contact: tuple) -> None:
+        self.score.add(contact)
+
+    def footer(self, file_descriptor) -> None:
+        print("", file=file_descriptor)
+        for band, qso, sandp, d_x in self.score.band_scores():
+            print(
+                f"band:{band} QSOs:{qso} state and "
+                f"province:{sandp} dx:{d_x} mult:{sandp+d_x}",
+                end="\r\n",
+                file=file_descriptor,
+            )
+        total_qso, total_mults, total_score = self.score.totals()
+        print(f"Total QSO: {total_qso}", end="\r\n", file=file_descriptor)
+        print(f"Total Mults: {total_mults}", end="\r\n", file=file_descriptor)
+        print(f"Total Score: {total_score}", end="\r\n", file=file_descriptor)
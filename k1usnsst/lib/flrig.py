@@ -0,0 +1,91 @@
+"""
+FLRIG client.
+
+Keeps one HTTP connection open to flrig and reads the VFO, mode and PTT in a
+single system.multicall round trip per poll. Whether flrig is reachable is
+tracked from the polls themselves, so nothing has to scan the process table.
+"""
+
+import logging
+from http.client import HTTPException
+from xmlrpc.client import Error, Fault, MultiCall, ServerProxy, Transport
+
+
+class KeepAliveTransport(Transport):
+    """
+    An xmlrpc transport that keeps its HTTP/1.1 connection open between
+    calls, as Transport does, and gives up on a silent server after timeout
+    seconds instead of hanging the window.
+    """
+
+    def __init__(self, timeout: float) -> None:
+        super().__init__()
+        self.timeout = timeout
+
+    def make_connection(self, host):
+        connection = super().make_connection(host)
+        connection.timeout = self.timeout
+        return connection
+
+
+class FlrigClient:
+    """
+    Polls flrig. on_state is called with True or False whenever flrig
+    comes online or goes offline.
+    """
+
+    def __init__(self, host: str, port, timeout: float = 0.5, on_state=None) -> None:
+        self.url = f"http://{host}:{port}"
+        self.transport = KeepAliveTransport(timeout)
+        self.server = ServerProxy(self.url, transport=self.transport)
+        self.on_state = on_state
+        self.online = None
+        self.multicall = True
+        self.frequency = ""
+        self.mode = ""
+        self.ptt = 0
+
+    def _set_online(self, online: bool) -> None:
+        """Move to the online or offline state."""
+        if online == self.online:
+            return
+        self.online = online
+        logging.info("flrig %s: %s", self.url, "online" if online else "offline")
+        if self.on_state:
+            self.on_state(online)
+
+    def _read(self) -> tuple:
+        """One round trip if flrig takes multicalls, three if not."""
+        if self.multicall:
+            try:
+                multi = MultiCall(self.server)
+                multi.rig.get_vfo()
+                multi.rig.get_mode()
+                multi.rig.get_ptt()
+                return tuple(multi())
+            except Fault as exception:
+                logging.info("flrig: no multicall, %s", exception)
+                self.multicall = False
+        return (
+            self.server.rig.get_vfo(),
+            self.server.rig.get_mode(),
+            self.server.rig.get_ptt(),
+        )
+
+    def poll(self) -> tuple:
+        """
+        Returns (frequency, mode, ptt), or None if flrig can't be reached.
+        """
+        try:
+            self.frequency, self.mode, self.ptt = self._read()
+        except (OSError, Error, HTTPException, ValueError) as exception:
+            logging.debug("flrig: %s", exception)
+            self.transport.close()
+            self._set_online(False)
+            return None
+        self._set_online(True)
+        return self.frequency, self.mode, self.ptt
+
+    def close(self) -> None:
+        """Drop the connection."""
+        self.transport.close()
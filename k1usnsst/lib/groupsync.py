@@ -0,0 +1,265 @@
+"""
+Multi-operator group sync.
+
+Stations running the logger on the same LAN share one view of the log. Each
+station numbers its own changes, see the changelog in database.py. Changes
+are announced over UDP multicast as they happen, along with a heartbeat
+listing the newest change held from every station. A station that finds
+itself behind connects to the announcer over TCP and asks for everything
+newer than what it has, so only deltas ever cross the wire.
+
+Announcement, one json datagram:
+    {"group": "...", "station": "...", "tcp": 40123, "heads": {...}, "op": {...}}
+Catch up, one json line each way and then one line per change:
+    {"heads": {...}}
+"""
+
+import logging
+import socket
+import struct
+import threading
+from json import dumps, loads
+
+HEARTBEAT = 5.0
+
+
+def valid_announcement(message) -> bool:
+    """True if message has the shape of an announcement, see above."""
+    if not isinstance(message, dict):
+        return False
+    heads = message.get("heads", {})
+    op = message.get("op")
+    return (
+        isinstance(message.get("tcp"), int)
+        and isinstance(heads, dict)
+        and all(isinstance(seq, int) for seq in heads.values())
+        and (op is None or valid_change(op))
+    )
+
+
+def valid_change(op) -> bool:
+    """True if op has the shape of a changelog entry from database.py."""
+    return (
+        isinstance(op, dict)
+        and isinstance(op.get("station"), str)
+        and isinstance(op.get("seq"), int)
+        and op.get("op") in ("insert", "update", "delete")
+        and isinstance(op.get("target_station"), str)
+        and isinstance(op.get("target_id"), int)
+        and isinstance(op.get("fields"), dict)
+    )
+
+
+class GroupSync:
+    """
+    Replicates contacts between stations. Call start() once the database
+    exists, stop() on the way out. on_change is called, from a worker
+    thread, whenever changes from other stations have been applied.
+    """
+
+    def __init__(
+        self,
+        database,
+        station: str,
+        group: str = "239.255.73.73",
+        port: int = 7373,
+        interface: str = "0.0.0.0",
+        on_change=None,
+    ) -> None:
+        self.database = database
+        self.station = station
+        self.group = group
+        self.port = port
+        self.interface = interface
+        self.on_change = on_change
+        self.running = False
+        self.apply_lock = threading.Lock()
+        self.catching_up = set()
+        self.udp = None
+        self.sender = None
+        self.tcp = None
+        self.wakeup = threading.Event()
+
+    def start(self) -> None:
+        """Open the sockets and start the worker threads."""
+        self.database.station = self.station
+        self.database.listeners.append(self.announce)
+        self.database.adopt_local_contacts()
+
+        self.udp = socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_UDP)
+        self.udp.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        if hasattr(socket, "SO_REUSEPORT"):
+            self.udp.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+        self.udp.bind(("", self.port))
+        membership = struct.pack(
+            "4s4s", socket.inet_aton(self.group), socket.inet_aton(self.interface)
+        )
+        self.udp.setsockopt(socket.IPPROTO_IP, socket.IP_ADD_MEMBERSHIP, membership)
+
+        self.sender = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sender.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_TTL, 1)
+        self.sender.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_LOOP, 1)
+        self.sender.setsockopt(
+            socket.IPPROTO_IP,
+            socket.IP_MULTICAST_IF,
+            socket.inet_aton(self.interface),
+        )
+
+        self.tcp = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.tcp.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.tcp.bind(("", 0))
+        self.tcp.listen(8)
+
+        self.running = True
+        for target in (self._listen, self._serve, self._heartbeat):
+            threading.Thread(target=target, daemon=True).start()
+        logging.info(
+            "GroupSync: %s on %s:%s, catch up on tcp %s",
+            self.station,
+            self.group,
+            self.port,
+            self.tcp.getsockname()[1],
+        )
+
+    def stop(self) -> None:
+        """Close everything down."""
+        self.running = False
+        self.wakeup.set()
+        if self.announce in self.database.listeners:
+            self.database.listeners.remove(self.announce)
+        if self.database.station == self.station:
+            # Local writes stop going into the changelog.
+            self.database.station = ""
+        for sock in (self.udp, self.sender, self.tcp):
+            if sock is None:
+                continue
+            try:
+                sock.close()
+            except OSError:
+                pass
+
+    def announce(self, op: dict = None) -> None:
+        """
+        Multicast our heads, with a change attached if there's a new one.
+        """
+        if not self.running:
+            return
+        message = {
+            "group": self.group,
+            "station": self.station,
+            "tcp": self.tcp.getsockname()[1],
+            "heads": self.database.heads(),
+        }
+        if op:
+            message["op"] = op
+        try:
+            self.sender.sendto(
+                dumps(message).encode("utf-8"), (self.group, self.port)
+            )
+        except OSError as exception:
+            logging.warning("GroupSync: announce: %s", exception)
+
+    def _heartbeat(self) -> None:
+        """Announce periodically, so late joiners and lost datagrams recover."""
+        while self.running:
+            self.announce()
+            self.wakeup.wait(HEARTBEAT)
+
+    def _listen(self) -> None:
+        """Handle announcements from other stations."""
+        while self.running:
+            try:
+                data, address = self.udp.recvfrom(65535)
+                message = loads(data.decode("utf-8"))
+            except OSError:
+                continue
+            except ValueError as exception:
+                logging.warning("GroupSync: bad announcement: %s", exception)
+                continue
+            if not valid_announcement(message):
+                logging.warning("GroupSync: bad announcement from %s", address[0])
+                continue
+            if message.get("group") != self.group:
+                continue
+            if message.get("station") == self.station:
+                continue
+            try:
+                self._handle(message, address[0])
+            except Exception as exception:  # pylint: disable=broad-except
+                # One bad peer mustn't stop sync for the rest of the session.
+                logging.exception("GroupSync: handling %s: %s", address[0], exception)
+
+    def _handle(self, message: dict, host: str) -> None:
+        """Apply an announced change, or catch up if we're behind."""
+        applied = False
+        op = message.get("op")
+        if op:
+            with self.apply_lock:
+                applied = self.database.apply_change(op)
+        if applied and self.on_change:
+            self.on_change()
+        ours = self.database.heads()
+        behind = any(
+            seq > ours.get(station, 0)
+            for station, seq in message.get("heads", {}).items()
+        )
+        if behind:
+            self._catch_up(host, message["tcp"])
+
+    def _catch_up(self, host: str, port: int) -> None:
+        """Fetch the changes we're missing, off the listening thread."""
+        if (host, port) in self.catching_up:
+            return
+        self.catching_up.add((host, port))
+        threading.Thread(
+            target=self._fetch, args=(host, port), daemon=True
+        ).start()
+
+    def _fetch(self, host: str, port: int) -> None:
+        """Ask a peer for everything newer than our heads and apply it."""
+        applied = 0
+        try:
+            with socket.create_connection((host, port), timeout=5) as conn:
+                request = {"heads": self.database.heads()}
+                conn.sendall(dumps(request).encode("utf-8") + b"\n")
+                with conn.makefile("r", encoding="utf-8") as reader:
+                    for line in reader:
+                        op = loads(line)
+                        if not valid_change(op):
+                            raise ValueError(f"bad change {line.strip()[:80]}")
+                        with self.apply_lock:
+                            if self.database.apply_change(op):
+                                applied += 1
+        except (OSError, ValueError) as exception:
+            logging.warning("GroupSync: catch up from %s:%s: %s", host, port, exception)
+        finally:
+            self.catching_up.discard((host, port))
+        logging.info("GroupSync: %s changes from %s:%s", applied, host, port)
+        if applied and self.on_change:
+            self.on_change()
+
+    def _serve(self) -> None:
+        """Answer catch up requests."""
+        while self.running:
+            try:
+                conn, _ = self.tcp.accept()
+            except OSError:
+                continue
+            threading.Thread(target=self._send_changes, args=(conn,), daemon=True).start()
+
+    def _send_changes(self, conn) -> None:
+        """Stream the changes a peer asked for."""
+        with conn:
+            try:
+                conn.settimeout(5)
+                with conn.makefile("rw", encoding="utf-8") as stream:
+                    request = loads(stream.readline())
+                    if not isinstance(request, dict) or not isinstance(
+                        request.get("heads", {}), dict
+                    ):
+                        raise ValueError("bad catch up request")
+                    for op in self.database.changes_since(request.get("heads", {})):
+                        stream.write(dumps(op) + "\n")
+                    stream.flush()
+            except (OSError, ValueError) as exception:
+                logging.warning("GroupSync: serving changes: %s", exception)
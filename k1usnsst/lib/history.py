@@ -0,0 +1,220 @@
+"""
+Callsign history, the exchange each call sent last time.
+
+The history lives in a sorted file of fixed width records that is memory
+mapped rather than read, and searched by bisection, so opening it costs the
+same however many calls it holds and a lookup only touches the few pages the
+search lands on. Contacts made since the file was last written go to a small
+append only delta file alongside it, which is folded into the sorted file on
+the way out once it has grown past COMPACT_AT lines.
+
+The sorted file is a 16 byte header, MAGIC, the record count and the width of
+the callsign and exchange fields, then the records, space padded.
+"""
+
+import logging
+import mmap
+import os
+import struct
+from json import loads
+
+MAGIC = b"K1HS"
+HEADER = struct.Struct("<4sIII")
+COMPACT_AT = 500
+
+
+class CallHistory:
+    """
+    Behaves like a read mostly dict of callsign to exchange. path is the
+    sorted file, path + ".delta" holds newer entries.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.delta_path = path + ".delta"
+        self.recent = {}
+        self.file = None
+        self.map = None
+        self.count = 0
+        self.call_width = 0
+        self.width = 0
+        self.delta = None
+        self._open()
+
+    def _open(self) -> None:
+        """Map the sorted file and read the delta."""
+        try:
+            self.file = open(self.path, "rb")
+        except FileNotFoundError:
+            self.file = None
+        if self.file:
+            header = self.file.read(HEADER.size)
+            magic, count, call_width, exchange_width = (
+                HEADER.unpack(header) if len(header) == HEADER.size else (b"", 0, 0, 0)
+            )
+            if magic != MAGIC:
+                logging.critical("CallHistory: %s is not a history file", self.path)
+            elif count:
+                self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+                self.count = count
+                self.call_width = call_width
+                self.width = call_width + exchange_width
+        try:
+            with open(self.delta_path, "rt", encoding="utf-8") as file_descriptor:
+                for line in file_descriptor:
+                    call, _, exchange = line.rstrip("\n").partition("\t")
+                    if call:
+                        self.recent[call] = exchange
+        except FileNotFoundError:
+            pass
+        self.delta = open(self.delta_path, "at", encoding="utf-8")
+
+    def _record(self, index: int) -> bytes:
+        """The index'th record of the sorted file."""
+        start = HEADER.size + index * self.width
+        return self.map[start : start + self.width]
+
+    def _find(self, call: str):
+        """Bisect the sorted file for call. Returns its exchange or None."""
+        if not self.map:
+            return None
+        key = call.encode("utf-8")
+        if len(key) > self.call_width:
+            return None
+        key = key.ljust(self.call_width)
+        low, high = 0, self.count
+        while low < high:
+            middle = (low + high) // 2
+            start = HEADER.size + middle * self.width
+            found = self.map[start : start + self.call_width]
+            if found < key:
+                low = middle + 1
+            elif found > key:
+                high = middle
+            else:
+                return self._record(middle)[self.call_width :].decode("utf-8").rstrip()
+        return None
+
+    def get(self, call: str, default=None):
+        """The exchange call sent last time, or default."""
+        exchange = self.recent.get(call)
+        if exchange is None:
+            exchange = self._find(call)
+        return default if exchange is None else exchange
+
+    def __contains__(self, call: str) -> bool:
+        return self.get(call) is not None
+
+    def __getitem__(self, call: str) -> str:
+        exchange = self.get(call)
+        if exchange is None:
+            raise KeyError(call)
+        return exchange
+
+    def __setitem__(self, call: str, exchange: str) -> None:
+        """Remember an exchange, straight away, in the delta file."""
+        if self.recent.get(call) == exchange:
+            return
+        self.recent[call] = exchange
+        try:
+            self.delta.write(f"{call}\t{exchange}\n")
+            self.delta.flush()
+        except (OSError, ValueError) as exception:
+            logging.critical("CallHistory: %s", exception)
+
+    def __len__(self) -> int:
+        return self.count + sum(1 for call in self.recent if self._find(call) is None)
+
+    def items(self):
+        """Every (call, exchange), sorted by call."""
+        recent = sorted(self.recent.items())
+        position = 0
+        for index in range(self.count):
+            record = self._record(index)
+            call = record[: self.call_width].decode("utf-8").rstrip()
+            while position < len(recent) and recent[position][0] < call:
+                yield recent[position]
+                position += 1
+            if position < len(recent) and recent[position][0] == call:
+                yield recent[position]
+                position += 1
+            else:
+                yield call, record[self.call_width :].decode("utf-8").rstrip()
+        yield from recent[position:]
+
+    def compact(self) -> None:
+        """Fold the delta into the sorted file."""
+        if not self.recent:
+            return
+        self.delta.close()
+        call_width = max(
+            [self.call_width] + [len(call.encode("utf-8")) for call in self.recent]
+        )
+        exchange_width = max(
+            [self.width - self.call_width]
+            + [len(exchange.encode("utf-8")) for exchange in self.recent.values()]
+        )
+        write(self.path + ".tmp", self.items(), call_width, exchange_width)
+        self._close_map()
+        os.replace(self.path + ".tmp", self.path)
+        os.remove(self.delta_path)
+        self.recent = {}
+        self._open()
+
+    def _close_map(self) -> None:
+        """Unmap and close the sorted file."""
+        if self.map:
+            self.map.close()
+            self.map = None
+        if self.file:
+            self.file.close()
+            self.file = None
+        self.count = 0
+
+    def close(self) -> None:
+        """Compact if the delta has grown, then close everything."""
+        try:
+            if len(self.recent) >= COMPACT_AT:
+                self.compact()
+        except OSError as exception:
+            logging.critical("CallHistory: compact: %s", exception)
+        if self.delta:
+            self.delta.close()
+        self._close_map()
+
+
+def write(path: str, items, call_width: int, exchange_width: int) -> None:
+    """
+    Writes (call, exchange) pairs, sorted by call, as a history file. The
+    pairs are streamed, so the widths have to be known up front.
+    """
+    count = 0
+    with open(path, "wb") as file_descriptor:
+        file_descriptor.write(HEADER.pack(MAGIC, 0, call_width, exchange_width))
+        for call, exchange in items:
+            file_descriptor.write(
+                call.encode("utf-8").ljust(call_width)
+                + exchange.encode("utf-8").ljust(exchange_width)
+            )
+            count += 1
+        file_descriptor.seek(0)
+        file_descriptor.write(HEADER.pack(MAGIC, count, call_width, exchange_width))
+
+
+def import_json(path: str, json_path: str) -> None:
+    """
+    Builds a history file from a pastcontacts.json, the old format or any
+    big list of calls and exchanges in the same shape.
+    """
+    with open(json_path, "rt", encoding="utf-8") as file_descriptor:
+        pastcontacts = loads(file_descriptor.read())
+    write(
+        path + ".tmp",
+        sorted(pastcontacts.items()),
+        max((len(call.encode("utf-8")) for call in pastcontacts), default=0),
+        max(
+            (len(exchange.encode("utf-8")) for exchange in pastcontacts.values()),
+            default=0,
+        ),
+    )
+    os.replace(path + ".tmp", path)
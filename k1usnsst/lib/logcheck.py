@@ -0,0 +1,319 @@
+"""
+Cross checks the logs of many stations after an SST.
+
+Each log, ADIF or Cabrillo, is read into QSO tuples
+
+    (station, number, call, band, minute, sent, received)
+
+minute being minutes since the epoch, UTC, and sent and received the
+"NAME ST" exchanges. Every QSO is then looked for in the other station's
+log, on the same band within tolerance minutes, and given one of
+
+    ok                  confirmed by the other log
+    busted exchange     confirmed, but the exchange copied isn't what was sent
+    busted call         the call is one character off a station whose log
+                        has this QSO
+    not in log          the other station sent a log and this QSO isn't in it
+    unverified          the other station didn't send a log
+
+The QSOs are split by band and then into windows of span minutes, and the
+windows are checked in a pool of processes. A window only needs the QSOs on
+its band within tolerance of it, which are indexed by call and time bucket,
+so each process gets a small slice of the logs and each lookup touches a
+handful of QSOs.
+
+    python -m k1usnsst.lib.logcheck logs/*.adi logs/*.log --report check.txt
+"""
+
+import argparse
+import calendar
+import logging
+import os
+import time
+from bisect import bisect_left
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+from .adif import read_adif
+from .cabrillo import read_cabrillo
+from .database import band_for
+
+OK = "ok"
+BUSTED_EXCHANGE = "busted exchange"
+BUSTED_CALL = "busted call"
+NOT_IN_LOG = "not in log"
+UNVERIFIED = "unverified"
+STATUSES = (OK, BUSTED_EXCHANGE, BUSTED_CALL, NOT_IN_LOG, UNVERIFIED)
+
+
+def minute_of(date: str, time_on: str) -> int:
+    """Minutes since the epoch of a 20240513 or 2024-05-13 date and 0005 time."""
+    when = datetime.strptime(date.replace("-", "") + time_on[:4], "%Y%m%d%H%M")
+    return calendar.timegm(when.timetuple()) // 60
+
+
+def exchange(text: str) -> str:
+    """An exchange tidied for comparing."""
+    return " ".join(text.upper().split())
+
+
+def read_log(path: str) -> tuple:
+    """
+    Reads one station's log. Cabrillo if it starts with START-OF-LOG,
+    otherwise ADIF. Returns (station, QSOs, lines skipped).
+    """
+    with open(path, "rt", encoding="utf-8", errors="replace") as file_descriptor:
+        cabrillo = file_descriptor.read(64).lstrip().upper().startswith("START-OF-LOG")
+        file_descriptor.seek(0)
+        if cabrillo:
+            return _read_cabrillo(path, file_descriptor)
+        return _read_adif(path, file_descriptor)
+
+
+def _default_station(path: str) -> str:
+    """Logs that don't say whose they are are named after their file."""
+    return os.path.splitext(os.path.basename(path))[0].upper()
+
+
+def _read_cabrillo(path: str, file_descriptor) -> tuple:
+    station = ""
+    qsos = []
+    skipped = 0
+    for tag, value in read_cabrillo(file_descriptor):
+        if tag == "CALLSIGN":
+            station = value.upper()
+        elif tag == "QSO":
+            fields = value.upper().split()
+            try:
+                frequency, _, date, time_on, mycall, myname, mystate = fields[:7]
+                call, name, state = fields[7:10]
+                station = station or mycall
+                qsos.append(
+                    (
+                        station,
+                        len(qsos),
+                        call,
+                        band_for(int(float(frequency) * 1000)),
+                        minute_of(date, time_on),
+                        f"{myname} {mystate}",
+                        f"{name} {state}",
+                    )
+                )
+            except ValueError:
+                skipped += 1
+    station = station or _default_station(path)
+    return station, [(station,) + qso[1:] for qso in qsos], skipped
+
+
+def _read_adif(path: str, file_descriptor) -> tuple:
+    station = ""
+    qsos = []
+    skipped = 0
+    for record in read_adif(file_descriptor):
+        station = station or record.get(
+            "STATION_CALLSIGN", record.get("OPERATOR", "")
+        ).upper()
+        try:
+            band = record.get("BAND", "").upper().rstrip("M")
+            if not band:
+                band = band_for(int(float(record["FREQ"]) * 1000000))
+            qsos.append(
+                (
+                    station,
+                    len(qsos),
+                    record["CALL"].upper(),
+                    band,
+                    minute_of(record["QSO_DATE"], record["TIME_ON"]),
+                    exchange(record.get("STX_STRING", "")),
+                    exchange(record.get("SRX_STRING", "")),
+                )
+            )
+        except (KeyError, ValueError):
+            skipped += 1
+    station = station or _default_station(path)
+    return station, [(station,) + qso[1:] for qso in qsos], skipped
+
+
+def one_edit(first: str, second: str) -> bool:
+    """True if the calls differ by one letter changed, added or dropped."""
+    if first == second or abs(len(first) - len(second)) > 1:
+        return False
+    if len(first) == len(second):
+        return sum(a != b for a, b in zip(first, second)) == 1
+    shorter, longer = sorted((first, second), key=len)
+    for index, (a, b) in enumerate(zip(shorter, longer)):
+        if a != b:
+            return shorter[index:] == longer[index + 1 :]
+    return True
+
+
+def partitions(qsos: list, tolerance: int, span: int):
+    """
+    Splits QSOs by band and into windows of span minutes. Yields (own,
+    context) for each window, context being every QSO on the band within
+    tolerance of the window.
+    """
+    bands = {}
+    for qso in qsos:
+        bands.setdefault(qso[3], []).append(qso)
+    for band_qsos in bands.values():
+        band_qsos.sort(key=lambda qso: qso[4])
+        minutes = [qso[4] for qso in band_qsos]
+        start = minutes[0]
+        while start <= minutes[-1]:
+            end = start + span
+            own = band_qsos[bisect_left(minutes, start) : bisect_left(minutes, end)]
+            if own:
+                first = bisect_left(minutes, start - tolerance)
+                last = bisect_left(minutes, end + tolerance + 1)
+                yield own, band_qsos[first:last]
+            start += span
+
+
+def check_window(own: list, context: list, stations: frozenset, tolerance: int) -> list:
+    """
+    Judges the QSOs in own against the others in context, all on one band.
+    Returns (QSO, status, detail) for each.
+    """
+    width = max(tolerance, 1)
+    by_call = {}
+    by_station = {}
+    for qso in context:
+        by_call.setdefault((qso[2], qso[4] // width), []).append(qso)
+        by_station.setdefault((qso[0], qso[4] // width), []).append(qso)
+
+    def near(index: dict, key: str, minute: int):
+        """QSOs in index under key within tolerance of minute."""
+        bucket = minute // width
+        for nearby in (bucket - 1, bucket, bucket + 1):
+            for qso in index.get((key, nearby), ()):
+                if abs(qso[4] - minute) <= tolerance:
+                    yield qso
+
+    results = []
+    for qso in own:
+        station, _, call, _, minute, _, received = qso
+        worked_us = [
+            other for other in near(by_call, station, minute) if other[0] != station
+        ]
+        if call in stations:
+            matches = [other for other in worked_us if other[0] == call]
+            if matches:
+                match = min(matches, key=lambda other: abs(other[4] - minute))
+                if match[5] == received:
+                    results.append((qso, OK, ""))
+                else:
+                    results.append((qso, BUSTED_EXCHANGE, f"sent {match[5]}"))
+                continue
+        busted = [
+            other
+            for other in worked_us
+            if other[0] != call and one_edit(other[0], call)
+        ]
+        if busted:
+            results.append((qso, BUSTED_CALL, f"was {busted[0][0]}"))
+        elif call not in stations:
+            results.append((qso, UNVERIFIED, ""))
+        elif any(
+            one_edit(other[2], station) for other in near(by_station, call, minute)
+        ):
+            # They busted our call, that's their QSO lost, not ours.
+            results.append((qso, OK, "they busted our call"))
+        else:
+            results.append((qso, NOT_IN_LOG, ""))
+    return results
+
+
+def _check_window(job: tuple) -> list:
+    """check_window for the process pool."""
+    return check_window(*job)
+
+
+def check(logs: list, tolerance: int = 3, span: int = 15, jobs: int = None) -> list:
+    """
+    Cross checks logs, (station, QSOs) pairs, in jobs processes, one for
+    each core by default, or in this one if jobs is 1. Returns (QSO, status,
+    detail) for every QSO.
+    """
+    stations = frozenset(station for station, _ in logs)
+    qsos = [qso for _, station_qsos in logs for qso in station_qsos]
+    work = [
+        (own, context, stations, tolerance)
+        for own, context in partitions(qsos, tolerance, span)
+    ]
+    if jobs == 1:
+        return [result for job in work for result in _check_window(job)]
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        return [
+            result
+            for window in pool.map(_check_window, work, chunksize=4)
+            for result in window
+        ]
+
+
+def summarize(results: list) -> dict:
+    """Returns station -> {status: count}."""
+    summary = {}
+    for qso, status, _ in results:
+        counts = summary.setdefault(qso[0], dict.fromkeys(STATUSES, 0))
+        counts[status] += 1
+    return summary
+
+
+def write_report(filename: str, results: list) -> None:
+    """Writes every QSO that isn't ok, by station and time."""
+    flagged = sorted(
+        (result for result in results if result[1] != OK),
+        key=lambda result: (result[0][0], result[0][4]),
+    )
+    with open(filename, "w", encoding="utf-8") as file_descriptor:
+        for (station, _, call, band, minute, _, received), status, detail in flagged:
+            when = time.strftime("%Y-%m-%d %H%M", time.gmtime(minute * 60))
+            print(
+                f"{station:<13} {when} {band:>3} {call:<13} {received:<16} "
+                f"{status:<16} {detail}".rstrip(),
+                file=file_descriptor,
+            )
+
+
+def main():
+    """Check the logs named on the command line."""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument(
+        "logs", nargs="+", help="ADIF or Cabrillo logs, one per station"
+    )
+    parser.add_argument(
+        "--tolerance", type=int, default=3, help="minutes two logs' clocks may differ"
+    )
+    parser.add_argument("--span", type=int, default=15, help="minutes per work unit")
+    parser.add_argument("--jobs", type=int, default=None, help="processes, default all")
+    parser.add_argument("--report", help="write the QSOs that didn't check out here")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    logs = []
+    for path in args.logs:
+        station, qsos, skipped = read_log(path)
+        if skipped:
+            logging.warning("%s: skipped %s unreadable QSOs", path, skipped)
+        logs.append((station, qsos))
+    read = time.perf_counter()
+    results = check(logs, args.tolerance, args.span, args.jobs)
+    checked = time.perf_counter()
+
+    print(f"{'station':<13}" + "".join(f"{status:>17}" for status in STATUSES))
+    for station, counts in sorted(summarize(results).items()):
+        print(
+            f"{station:<13}"
+            + "".join(f"{counts[status]:>17}" for status in STATUSES)
+        )
+    print(
+        f"{len(results)} QSOs from {len(logs)} logs, read in {read - started:.2f}s, "
+        f"checked in {checked - read:.2f}s"
+    )
+    if args.report:
+        write_report(args.report, results)
+
+
+if __name__ == "__main__":
+    main()
@@ -9,16 +9,19 @@ import logging
 import xmltodict
 import requests
 
+from .metrics import timed
+
 
 class HamDBlookup:
     """
     Class manages HamDB lookups.
     """
 
-    def __init__(self) -> None:
-        self.url = "https://api.hamdb.org/"
+    def __init__(self, url: str = "https://api.hamdb.org/") -> None:
+        self.url = url
         self.error = False
 
+    @timed("lookup.hamdb")
     def lookup(self, call: str) -> tuple:
         """
         Lookup a call on QRZ
@@ -98,9 +101,17 @@ class HamDBlookup:
 class QRZlookup:
     """
     Class manages QRZ lookups. Pass in a username and password at instantiation.
+    Pass login=False to leave getting a session to the caller, and set renew
+    to be told, instead of logging in again mid lookup, when the key expires.
     """
 
-    def __init__(self, username: str, password: str) -> None:
+    def __init__(
+        self,
+        username: str,
+        password: str,
+        url: str = "https://xmldata.qrz.com/xml/134/",
+        login: bool = True,
+    ) -> None:
         self.session = False
         self.expiration = False
         self.error = (
@@ -108,11 +119,15 @@ class QRZlookup:
         )
         self.username = username
         self.password = password
-        self.qrzurl = "https://xmldata.qrz.com/xml/134/"
+        self.qrzurl = url
         self.message = False
         self.lastresult = False
-        self.getsession()
+        self.count = None
+        self.renew = None
+        if login:
+            self.getsession()
 
+    @timed("lookup.qrz.session")
     def getsession(self) -> None:
         """
         Get QRZ session key.
@@ -142,7 +157,6 @@ class QRZlookup:
         logging.info("QRZlookup-getsession:")
         self.error = False
         self.message = False
-        self.session = False
         try:
             payload = {"username": self.username, "password": self.password}
             query_result = requests.get(self.qrzurl, params=payload, timeout=10.0)
@@ -151,8 +165,9 @@ class QRZlookup:
             if root:
                 session = root.get("Session")
             logging.info("\n\n%s\n\n", root)
-            if session.get("Key"):
-                self.session = session.get("Key")
+            self.session = session.get("Key") or False
+            if session.get("Count"):
+                self.count = int(session.get("Count"))
             if session.get("SubExp"):
                 self.expiration = session.get("SubExp")
             if session.get("Error"):
@@ -170,6 +185,7 @@ class QRZlookup:
             self.session = False
             self.error = f"{exception}"
 
+    @timed("lookup.qrz")
     def lookup(self, call: str) -> tuple:
         """
         Lookup a call on QRZ
@@ -190,7 +206,11 @@ class QRZlookup:
             root = baseroot.get("QRZDatabase")
             logging.info("\n\n%s\n\n", root)
             session = root.get("Session")
-            if not session.get("Key"):  # key expired get a new one
+            if not session.get("Key") and self.renew:
+                logging.info("no key, renewing in the background.")
+                self.session = False
+                self.renew()
+            elif not session.get("Key"):  # key expired get a new one
                 logging.info("no key, getting new one.")
                 self.getsession()
                 if self.session:
@@ -275,6 +295,8 @@ class QRZlookup:
             session = root.get("Session")
             callsign = root.get("Callsign")
             logging.info("\n\n%s\n\n", root)
+            if session.get("Count"):
+                self.count = int(session.get("Count"))
             if session.get("Error"):
                 error_text = session.get("Error")
                 self.error = error_text
@@ -295,26 +317,34 @@ class QRZlookup:
 
 
 class HamQTH:
-    """HamQTH lookup"""
+    """HamQTH lookup, login and renew as for QRZlookup."""
 
-    def __init__(self, username: str, password: str) -> None:
+    def __init__(
+        self,
+        username: str,
+        password: str,
+        url: str = "https://www.hamqth.com/xml.php",
+        login: bool = True,
+    ) -> None:
         """initialize HamQTH lookup"""
         self.username = username
         self.password = password
-        self.url = "https://www.hamqth.com/xml.php"
+        self.url = url
         self.session = False
         self.error = False
-        self.getsession()
+        self.renew = None
+        if login:
+            self.getsession()
 
+    @timed("lookup.hamqth.session")
     def getsession(self) -> None:
         """get a session key"""
         logging.info("Getting session")
         self.error = False
-        self.session = False
         payload = {"u": self.username, "p": self.password}
         try:
             query_result = requests.get(self.url, params=payload, timeout=10.0)
-        except requests.exceptions.Timeout:
+        except requests.exceptions.RequestException:
             self.error = True
             return
         logging.info("resultcode: %s", query_result.status_code)
@@ -322,12 +352,12 @@ class HamQTH:
         root = baseroot.get("HamQTH")
         session = root.get("session")
         if session:
-            if session.get("session_id"):
-                self.session = session.get("session_id")
+            self.session = session.get("session_id") or False
             if session.get("error"):
                 self.error = session.get("error")
         logging.info("session: %s", self.session)
 
+    @timed("lookup.hamqth")
     def lookup(self, call: str) -> tuple:
         """
         Lookup a call on HamQTH
@@ -351,7 +381,13 @@ class HamQTH:
                         if session.get("error") == "Callsign not found":
                             error_text = session.get("error")
                             return grid, name, nickname, error_text
-                        if session.get("error") == "Session does not exist or expired":
+                        if (
+                            session.get("error") == "Session does not exist or expired"
+                            and self.renew
+                        ):
+                            self.session = False
+                            self.renew()
+                        elif session.get("error") == "Session does not exist or expired":
                             self.getsession()
                             query_result = requests.get(
                                 self.url, params=payload, timeout=10.0
@@ -0,0 +1,236 @@
+"""
+The front end to a callsign lookup provider.
+
+Everything that wants a lookup asks the broker, which hands back a Future.
+Asking for a call that's already on its way, or was looked up a few minutes
+ago, gets the same answer without another request. Requests go out one at a
+time from the broker's thread, interactive ones ahead of bulk ones, no faster
+than a token bucket allows, and bulk ones stop short of the provider's daily
+limit so there are always lookups left for the operator.
+
+One broker per provider, each with its own limits.
+"""
+
+import heapq
+import itertools
+import logging
+import threading
+import time
+from concurrent.futures import Future
+from datetime import datetime, timezone
+
+INTERACTIVE = 0
+BULK = 1
+
+
+class QuotaExceeded(Exception):
+    """The daily lookup limit has been reached, for this kind of lookup."""
+
+
+class TokenBucket:
+    """
+    Allows rate requests a second on average, in bursts of up to burst.
+    """
+
+    def __init__(self, rate: float, burst: int) -> None:
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+
+    def wait_time(self) -> float:
+        """Seconds until a request may go, 0 if one may go now."""
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def take(self) -> None:
+        """Spend a token."""
+        self.tokens -= 1
+
+
+class Quota:
+    """
+    Lookups left today, UTC, out of limit, None for no limit. Bulk lookups
+    leave reserve, a fraction of the limit, for interactive ones.
+    """
+
+    def __init__(self, limit: int = None, reserve: float = 0.1) -> None:
+        self.limit = limit
+        self.reserve = int((limit or 0) * reserve)
+        self.used = 0
+        self.day = self._today()
+
+    @staticmethod
+    def _today() -> str:
+        return datetime.now(timezone.utc).strftime("%Y-%m-%d")
+
+    def _roll(self) -> None:
+        """A new day, a new allowance."""
+        today = self._today()
+        if today != self.day:
+            self.day = today
+            self.used = 0
+
+    def remaining(self):
+        """Lookups left today, or None for no limit."""
+        self._roll()
+        return None if self.limit is None else max(self.limit - self.used, 0)
+
+    def allows(self, priority: int) -> bool:
+        """True if a lookup of this priority may go."""
+        remaining = self.remaining()
+        if remaining is None:
+            return True
+        return remaining > (self.reserve if priority == BULK else 0)
+
+    def spend(self, count: int = None) -> None:
+        """
+        One lookup done. count is the provider's own tally for the day, when
+        it sends one, which wins over ours.
+        """
+        self._roll()
+        self.used = count if count is not None else self.used + 1
+
+
+class LookupBroker:
+    """
+    Lookups through provider, a QRZlookup, HamQTH or HamDBlookup. rate and
+    burst set the token bucket, daily_limit and reserve the quota, and
+    results are reused for ttl seconds.
+    """
+
+    def __init__(
+        self,
+        provider,
+        rate: float = 1.0,
+        burst: int = 5,
+        daily_limit: int = None,
+        reserve: float = 0.1,
+        ttl: float = 600.0,
+    ) -> None:
+        self.provider = provider
+        self.bucket = TokenBucket(rate, burst)
+        self.quota = Quota(daily_limit, reserve)
+        self.ttl = ttl
+        self.queue = []
+        self.order = itertools.count()
+        self.in_flight = {}
+        self.results = {}
+        self.condition = threading.Condition()
+        self.stopped = False
+        self.thread = None
+
+    def start(self) -> None:
+        """Start the broker's thread."""
+        self.thread = threading.Thread(target=self.run, name="lookup-broker", daemon=True)
+        self.thread.start()
+
+    def lookup(self, call: str, priority: int = INTERACTIVE) -> Future:
+        """
+        Returns a Future for (grid, name, nickname, error), as the provider's
+        lookup returns. A lookup that can't go because of the quota has a
+        QuotaExceeded as its error.
+        """
+        with self.condition:
+            cached = self.results.get(call)
+            if cached and time.monotonic() - cached[0] < self.ttl:
+                future = Future()
+                future.set_result(cached[1])
+                return future
+            entry = self.in_flight.get(call)
+            if entry:
+                future, queued_priority = entry
+                if priority < queued_priority:
+                    # Jump the queue, the stale lower priority entry is skipped.
+                    self.in_flight[call] = (future, priority)
+                    heapq.heappush(self.queue, (priority, next(self.order), call))
+                    self.condition.notify()
+                return future
+            future = Future()
+            self.in_flight[call] = (future, priority)
+            heapq.heappush(self.queue, (priority, next(self.order), call))
+            self.condition.notify()
+            return future
+
+    def _next(self):
+        """
+        Waits for a request that may go now. Returns (call, future, priority)
+        or None once stopped.
+        """
+        with self.condition:
+            while not self.stopped:
+                if not self.queue:
+                    self.condition.wait()
+                    continue
+                priority, _, call = self.queue[0]
+                entry = self.in_flight.get(call)
+                if entry is None or entry[1] != priority:
+                    heapq.heappop(self.queue)
+                    continue
+                if not self.quota.allows(priority):
+                    heapq.heappop(self.queue)
+                    del self.in_flight[call]
+                    entry[0].set_result(
+                        (False, False, False, QuotaExceeded("Daily lookup limit reached"))
+                    )
+                    continue
+                delay = self.bucket.wait_time()
+                if delay:
+                    # Something more urgent may turn up in the meantime.
+                    self.condition.wait(delay)
+                    continue
+                heapq.heappop(self.queue)
+                self.bucket.take()
+                return call, entry[0], priority
+        return None
+
+    def run(self) -> None:
+        """Sends requests as the limits allow."""
+        while True:
+            request = self._next()
+            if request is None:
+                return
+            call, future, _ = request
+            try:
+                result = self.provider.lookup(call)
+            except Exception as exception:  # pylint: disable=broad-except
+                logging.info("LookupBroker: %s %s", call, exception)
+                result = (False, False, False, exception)
+            with self.condition:
+                self.quota.spend(getattr(self.provider, "count", None))
+                self.in_flight.pop(call, None)
+                if not isinstance(result[3], Exception) and getattr(
+                    self.provider, "session", True
+                ):
+                    self._remember(call, result)
+                if not future.done():
+                    future.set_result(result)
+
+    def _remember(self, call: str, result: tuple) -> None:
+        """Keep a result for ttl seconds. Call holding self.condition."""
+        now = time.monotonic()
+        if len(self.results) > 1000:
+            self.results = {
+                old_call: cached
+                for old_call, cached in self.results.items()
+                if now - cached[0] < self.ttl
+            }
+        self.results[call] = (now, result)
+
+    def stop(self) -> None:
+        """
+        Stop the thread. Lookups still queued finish with a
+        ConnectionAbortedError as their error.
+        """
+        with self.condition:
+            self.stopped = True
+            self.condition.notify()
+            for future, _ in self.in_flight.values():
+                if not future.done():
+                    future.set_result(
+                        (False, False, False, ConnectionAbortedError("Lookups stopped"))
+                    )
+        if self.thread:
+            self.thread.join(timeout=1)
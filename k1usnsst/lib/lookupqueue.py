@@ -0,0 +1,86 @@
+"""
+Lookups put off until the lookup service can be reached.
+
+Contacts logged while offline, or without a session key, are logged straight
+away without a lookup and their calls are put in the lookup_queue table, so
+the queue survives a restart. A thread works through it once the service is
+back, one call every interval seconds so a long queue doesn't hammer it,
+and fills in the grid and name of the contacts it finds. Its lookups go
+through the broker as bulk ones, so they wait behind the operator's and
+leave some of the daily quota for them.
+"""
+
+import logging
+import threading
+
+from .lookupbroker import BULK, QuotaExceeded
+
+IDLE = 60.0
+
+
+class LookupQueue:
+    """
+    Drains db's lookup queue through broker, a LookupBroker, while monitor,
+    a ReachabilityMonitor, says the service is online.
+    """
+
+    def __init__(self, db, broker, monitor, interval: float = 2.0) -> None:
+        self.db = db
+        self.broker = broker
+        self.lookup = broker.provider
+        self.monitor = monitor
+        self.interval = interval
+        self.wake_event = threading.Event()
+        self.stopped = threading.Event()
+        self.thread = None
+
+    def start(self) -> None:
+        """Start draining."""
+        self.thread = threading.Thread(target=self.run, name="lookup-queue", daemon=True)
+        self.thread.start()
+
+    def wake(self) -> None:
+        """Something changed, look at the queue now."""
+        self.wake_event.set()
+
+    def run(self) -> None:
+        """Drains whenever woken, or every IDLE seconds."""
+        while not self.stopped.is_set():
+            self.drain()
+            self.wake_event.wait(IDLE)
+            self.wake_event.clear()
+
+    def drain(self) -> None:
+        """Looks up queued calls until the queue is empty or the service isn't usable."""
+        while not self.stopped.is_set() and self.monitor.online and self.lookup.session:
+            calls = self.db.queued_lookups(1)
+            if not calls:
+                return
+            call = calls[0]
+            grid, name, _, error = self.broker.lookup(call, BULK).result()
+            if isinstance(error, QuotaExceeded):
+                logging.info("LookupQueue: %s", error)
+                return
+            if isinstance(error, Exception):
+                logging.info("LookupQueue: %s %s", call, error)
+                self.monitor.failed()
+                return
+            if not self.lookup.session:
+                # The key expired, call stays queued until there's a new one.
+                return
+            if grid or name:
+                try:
+                    self.db.fill_lookup(call, grid or "", name or "")
+                except IOError:
+                    # Couldn't be journaled, call stays queued.
+                    return
+            self.db.dequeue_lookup(call)
+            if self.stopped.wait(self.interval):
+                return
+
+    def stop(self) -> None:
+        """Stop draining."""
+        self.stopped.set()
+        self.wake_event.set()
+        if self.thread:
+            self.thread.join(timeout=1)
@@ -0,0 +1,135 @@
+"""
+Lookup session keys, kept fresh in the background.
+
+QRZ and HamQTH hand out a session key at login that lasts a while. Logging
+in takes a round trip, up to 10 seconds when the network is down, so it's
+done on a thread of its own, never on the way to a lookup. Keys are cached
+on disk, so a restart within a key's lifetime needs no login at all, and
+refreshed before they run out. When a lookup finds its key has expired
+anyway, the lookup gives up and a new key is fetched out of band.
+"""
+
+import logging
+import os
+import threading
+import time
+from json import dumps, loads
+
+QRZ_LIFETIME = 24 * 3600
+HAMQTH_LIFETIME = 3600
+REFRESH_AT = 0.8
+RETRY = 30
+RETRY_LIMIT = 600
+
+
+class SessionKeeper:
+    """
+    Keeps lookup, a QRZlookup or HamQTH made with login=False, logged in.
+    name identifies the account in the cache file, filename. on_change is
+    called, from the keeper's thread, whenever the key changes.
+    """
+
+    def __init__(
+        self, lookup, name: str, lifetime: float, filename: str, on_change=None
+    ) -> None:
+        self.lookup = lookup
+        self.name = name
+        self.lifetime = lifetime
+        self.filename = filename
+        self.on_change = on_change
+        self.issued = 0.0
+        self.retry = RETRY
+        self.wake = threading.Event()
+        self.stopped = threading.Event()
+        self.thread = None
+        lookup.renew = self.renew
+
+    def _read_cache(self) -> dict:
+        """Every cached key, by account."""
+        try:
+            with open(self.filename, "rt", encoding="utf-8") as file_descriptor:
+                return loads(file_descriptor.read())
+        except FileNotFoundError:
+            return {}
+        except (IOError, ValueError) as exception:
+            logging.info("SessionKeeper: %s", exception)
+            return {}
+
+    def _write_cache(self) -> None:
+        """Saves this account's key, readable only by the user."""
+        cache = self._read_cache()
+        if self.lookup.session:
+            cache[self.name] = {"key": self.lookup.session, "issued": self.issued}
+        else:
+            cache.pop(self.name, None)
+        try:
+            descriptor = os.open(
+                self.filename + ".tmp", os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600
+            )
+            with os.fdopen(descriptor, "wt", encoding="utf-8") as file_descriptor:
+                file_descriptor.write(dumps(cache))
+            os.replace(self.filename + ".tmp", self.filename)
+        except IOError as exception:
+            logging.info("SessionKeeper: %s", exception)
+
+    def start(self) -> None:
+        """Use a cached key if there's a fresh one, and start the thread."""
+        cached = self._read_cache().get(self.name, {})
+        if cached.get("key") and time.time() - cached.get("issued", 0) < self.lifetime:
+            self.lookup.session = cached["key"]
+            self.issued = cached["issued"]
+            logging.info("SessionKeeper: %s using cached key", self.name)
+        self.thread = threading.Thread(
+            target=self.run, name=f"session-{self.name}", daemon=True
+        )
+        self.thread.start()
+
+    def due(self) -> float:
+        """Seconds until the key should be refreshed."""
+        if not self.lookup.session:
+            return 0.0
+        return self.issued + self.lifetime * REFRESH_AT - time.time()
+
+    def run(self) -> None:
+        """Logs in whenever a key is due or renew() asks for one."""
+        while not self.stopped.is_set():
+            self.wake.wait(max(self.due(), 0.0))
+            self.wake.clear()
+            if self.stopped.is_set():
+                return
+            if self.due() > 0:
+                continue
+            if self.login():
+                self.retry = RETRY
+            else:
+                self.wake.wait(self.retry)
+                self.retry = min(self.retry * 2, RETRY_LIMIT)
+
+    def login(self) -> bool:
+        """One login. True if it got a key."""
+        before = self.lookup.session
+        success = False
+        try:
+            self.lookup.getsession()
+            success = bool(self.lookup.session) and not self.lookup.error
+        except Exception as exception:  # pylint: disable=broad-except
+            logging.info("SessionKeeper: %s: %s", self.name, exception)
+        if success:
+            self.issued = time.time()
+            self._write_cache()
+        if self.on_change and (success or before != self.lookup.session):
+            self.on_change()
+        return success
+
+    def renew(self) -> None:
+        """The key stopped working. Get a new one now, in the background."""
+        self.issued = 0.0
+        self.retry = RETRY
+        self.wake.set()
+
+    def stop(self) -> None:
+        """Stop the thread."""
+        self.stopped.set()
+        self.wake.set()
+        if self.thread:
+            self.thread.join(timeout=1)
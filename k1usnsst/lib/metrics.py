@@ -0,0 +1,161 @@
+"""
+Latency instrumentation.
+
+Switched on by setting K1USNSST_METRICS or creating a file called 'metrics'
+in the working directory, the same way './debug' turns on logging. When off,
+timed() costs one attribute check per call.
+
+Samples come in from the lookup and rig threads as well as the GUI thread,
+so the registry is only touched holding its lock.
+"""
+
+import bisect
+import functools
+import os
+import threading
+from json import dumps
+from pathlib import Path
+from time import perf_counter
+
+# Histogram bucket upper bounds, in milliseconds.
+BUCKETS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+
+class Histogram:
+    """
+    Latency histogram with fixed log spaced buckets.
+    """
+
+    def __init__(self) -> None:
+        self.buckets = [0] * (len(BUCKETS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.minimum = None
+        self.maximum = 0.0
+
+    def observe(self, elapsed: float) -> None:
+        """Record one sample in milliseconds."""
+        self.buckets[bisect.bisect_left(BUCKETS, elapsed)] += 1
+        self.count += 1
+        self.total += elapsed
+        if self.minimum is None or elapsed < self.minimum:
+            self.minimum = elapsed
+        if elapsed > self.maximum:
+            self.maximum = elapsed
+
+    def percentile(self, percent: float) -> float:
+        """
+        Upper bound of the bucket holding the percentile.
+        Samples past the last bucket report the maximum seen.
+        """
+        if not self.count:
+            return 0.0
+        wanted = percent / 100 * self.count
+        seen = 0
+        for index, bucket_count in enumerate(self.buckets):
+            seen += bucket_count
+            if seen >= wanted:
+                if index < len(BUCKETS):
+                    return min(BUCKETS[index], self.maximum)
+                break
+        return self.maximum
+
+    def as_dict(self) -> dict:
+        """Summary suitable for json."""
+        return {
+            "count": self.count,
+            "mean": self.total / self.count if self.count else 0.0,
+            "min": self.minimum or 0.0,
+            "max": self.maximum,
+            "p50": self.percentile(50),
+            "p95": self.percentile(95),
+            "p99": self.percentile(99),
+            "buckets": {
+                str(bound): count
+                for bound, count in zip(BUCKETS + ("inf",), self.buckets)
+                if count
+            },
+        }
+
+
+class Metrics:
+    """
+    Registry of latency histograms and counters.
+    """
+
+    def __init__(self) -> None:
+        self.enabled = bool(os.environ.get("K1USNSST_METRICS")) or Path(
+            "./metrics"
+        ).exists()
+        self.histograms = {}
+        self.counters = {}
+        self.lock = threading.Lock()
+
+    def observe(self, name: str, elapsed: float) -> None:
+        """Record a latency, in milliseconds, against name."""
+        with self.lock:
+            histogram = self.histograms.get(name)
+            if histogram is None:
+                histogram = self.histograms[name] = Histogram()
+            histogram.observe(elapsed)
+
+    def incr(self, name: str, amount: int = 1) -> None:
+        """Bump a counter."""
+        if self.enabled:
+            with self.lock:
+                self.counters[name] = self.counters.get(name, 0) + amount
+
+    def snapshot(self) -> dict:
+        """Everything recorded so far."""
+        with self.lock:
+            return {
+                "latency_ms": {
+                    name: histogram.as_dict()
+                    for name, histogram in sorted(self.histograms.items())
+                },
+                "counters": dict(sorted(self.counters.items())),
+            }
+
+    def summary(self) -> str:
+        """A few lines of text for a tooltip."""
+        lines = []
+        with self.lock:
+            for name, histogram in sorted(self.histograms.items()):
+                lines.append(
+                    f"{name}: n={histogram.count} p50={histogram.percentile(50):g}ms "
+                    f"p95={histogram.percentile(95):g}ms max={histogram.maximum:.1f}ms"
+                )
+            for name, count in sorted(self.counters.items()):
+                lines.append(f"{name}: {count}")
+        return "\n".join(lines) or "No metrics yet."
+
+    def dump(self, filename: str) -> None:
+        """Write the snapshot to a json file."""
+        if not self.enabled:
+            return
+        with open(filename, "wt", encoding="utf-8") as file_descriptor:
+            file_descriptor.write(dumps(self.snapshot(), indent=2))
+
+
+metrics = Metrics()
+
+
+def timed(name: str):
+    """
+    Decorator recording how long each call takes under name.
+    """
+
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if not metrics.enabled:
+                return function(*args, **kwargs)
+            started = perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                metrics.observe(name, (perf_counter() - started) * 1000)
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,47 @@
+"""
+Multipliers worked so far, for spotting a new one while the exchange is typed
+and keeping the score without going back to the log.
+"""
+
+from collections import Counter
+
+
+class Multipliers:
+    """
+    The contacts worked on each band in the active session, counted by state
+    or province. Every DX contact is a multiplier of its own, so DX is always
+    new.
+    """
+
+    def __init__(self) -> None:
+        self.worked = Counter()
+
+    def load(self, worked: list) -> None:
+        """Start over from (band, sandpdx, contacts) rows."""
+        self.worked = Counter()
+        for band, sandpdx, contacts in worked:
+            self.add(band, sandpdx, contacts)
+
+    def add(self, band: str, sandpdx: str, contacts: int = 1) -> None:
+        """Count a contact."""
+        self.worked[(str(band), sandpdx)] += contacts
+
+    def remove(self, band: str, sandpdx: str, contacts: int = 1) -> None:
+        """Stop counting a contact, one deleted or edited say."""
+        key = (str(band), sandpdx)
+        self.worked[key] -= contacts
+        if self.worked[key] <= 0:
+            del self.worked[key]
+
+    def is_new(self, band: str, sandpdx: str) -> bool:
+        """True if sandpdx would be a new multiplier on band."""
+        return sandpdx == "DX" or (str(band), sandpdx) not in self.worked
+
+    def score(self) -> tuple:
+        """Returns (QSOs, multipliers, score)."""
+        qsos = sum(self.worked.values())
+        mults = sum(
+            contacts if sandpdx == "DX" else 1
+            for (_, sandpdx), contacts in self.worked.items()
+        )
+        return qsos, mults, qsos * mults
@@ -0,0 +1,42 @@
+"""
+Adaptive rig polling.
+
+Polls come quickly right after the VFO moves, so band changes show up while
+the operator is tuning, and back off exponentially while it sits still.
+While the rig control daemon can't be reached they back off further still.
+Any rig client fits, the scheduler only hears how each poll went.
+"""
+
+
+class PollScheduler:
+    """
+    Picks the delay, in milliseconds, before the next rig poll.
+    """
+
+    def __init__(
+        self,
+        fast: int = 150,
+        idle: int = 4000,
+        offline: int = 15000,
+        growth: float = 1.5,
+    ) -> None:
+        self.fast = fast
+        self.idle = idle
+        self.offline_limit = offline
+        self.growth = growth
+        self.interval = fast
+
+    def changed(self) -> int:
+        """The frequency moved. Poll again soon."""
+        self.interval = self.fast
+        return self.interval
+
+    def unchanged(self) -> int:
+        """Nothing moved. Slow down, up to the idle interval."""
+        self.interval = min(int(self.interval * self.growth), self.idle)
+        return self.interval
+
+    def offline(self) -> int:
+        """The daemon didn't answer. Slow down harder, up to the offline interval."""
+        self.interval = min(max(self.interval, 1000) * 2, self.offline_limit)
+        return self.interval
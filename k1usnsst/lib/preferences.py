@@ -0,0 +1,118 @@
+"""
+The settings store.
+
+Settings are read from ~/.k1usnsst.json once, kept in memory, and written
+back whenever they change. Each setting has the type of its default, and
+parts of the program can watch the settings they depend on, so that when the
+settings dialog is closed only what actually changed gets rebuilt.
+"""
+
+import logging
+import os
+from json import dumps, loads
+
+DEFAULTS = {
+    "mycallsign": "",
+    "myexchange": "",
+    "qrzusername": "w1aw",
+    "qrzpassword": "secret",
+    "qrzurl": "https://xmldata.qrz.com/xml/134",
+    "useqrz": 0,
+    "qrzdailylimit": 0,
+    "userigcontrol": 0,
+    "rigcontrolip": "localhost",
+    "rigcontrolport": "12345",
+    "usehamdb": 0,
+    "cwtype": 0,
+    "cwip": "localhost",
+    "cwport": 6789,
+    "usegroupsync": 0,
+    "syncstation": "",
+    "syncgroup": "239.255.73.73",
+    "syncport": 7373,
+    "syncinterface": "0.0.0.0",
+}
+
+
+class Preferences:
+    """
+    The settings, read from and saved to filename. Reads like a dict.
+    """
+
+    def __init__(self, filename: str) -> None:
+        self.filename = filename
+        self.values = dict(DEFAULTS)
+        self.watchers = []
+
+    def load(self) -> None:
+        """
+        Reads the settings file. Settings it's missing, from older versions,
+        get their defaults and the file is written back with them.
+        """
+        try:
+            with open(self.filename, "rt", encoding="utf-8") as file_descriptor:
+                stored = loads(file_descriptor.read())
+        except FileNotFoundError:
+            stored = {}
+        except (IOError, ValueError) as exception:
+            logging.critical("Preferences: %s", exception)
+            return
+        for key, value in stored.items():
+            self.values[key] = self._coerce(key, value)
+        if set(DEFAULTS) - set(stored):
+            self.save()
+
+    def save(self) -> None:
+        """
+        Writes the settings file.
+        Written to a temporary file first so a crash can't leave it half written.
+        """
+        try:
+            with open(self.filename + ".tmp", "wt", encoding="utf-8") as file_descriptor:
+                file_descriptor.write(dumps(self.values))
+            os.replace(self.filename + ".tmp", self.filename)
+        except IOError as exception:
+            logging.critical("Preferences: %s", exception)
+
+    def _coerce(self, key: str, value):
+        """value as the type of key's default."""
+        if key not in DEFAULTS or value is None:
+            return value
+        try:
+            return type(DEFAULTS[key])(value)
+        except (TypeError, ValueError):
+            logging.critical("Preferences: bad %s %r", key, value)
+            return self.values.get(key, DEFAULTS[key])
+
+    def __getitem__(self, key: str):
+        return self.values[key]
+
+    def get(self, key: str, default=None):
+        """A setting, or default if there isn't one."""
+        return self.values.get(key, default)
+
+    def __setitem__(self, key: str, value) -> None:
+        self.update({key: value})
+
+    def update(self, changes: dict) -> set:
+        """
+        Sets several settings at once, saves them and tells the watchers of
+        any that changed, each watcher once. Returns the keys that changed.
+        """
+        changed = set()
+        for key, value in changes.items():
+            value = self._coerce(key, value)
+            if self.values.get(key) != value:
+                self.values[key] = value
+                changed.add(key)
+        if not changed:
+            return changed
+        self.save()
+        for keys, callback in self.watchers:
+            if keys & changed:
+                callback()
+        return changed
+
+    def watch(self, keys, callback) -> None:
+        """Calls callback whenever any of keys changes."""
+        self.watchers.append((set(keys), callback))
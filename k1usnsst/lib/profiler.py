@@ -0,0 +1,105 @@
+"""
+On demand profiling.
+
+Ctrl+Shift+P in the main window starts and stops cProfile. Setting
+K1USNSST_PROFILE starts it at launch. Each stop writes a .pstats file, for
+snakeviz or python -m pstats, and a short text report of where the time went
+in the logger's own code.
+"""
+
+import cProfile
+import logging
+import os
+import pstats
+from datetime import datetime
+
+
+class Profiler:
+    """
+    Wraps cProfile so it can be toggled while the logger runs.
+    """
+
+    def __init__(self, output_dir: str) -> None:
+        self.output_dir = output_dir
+        self.package_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        self.profile = None
+
+    @property
+    def running(self) -> bool:
+        """True while profiling."""
+        return self.profile is not None
+
+    def start(self) -> None:
+        """Start profiling."""
+        if self.running:
+            return
+        logging.info("Profiler: start")
+        self.profile = cProfile.Profile()
+        self.profile.enable()
+
+    def stop(self) -> str:
+        """
+        Stop profiling and write the results.
+        Returns the name of the .pstats file, or "" if nothing was running.
+        """
+        if not self.running:
+            return ""
+        self.profile.disable()
+        stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+        filename = os.path.join(self.output_dir, f"SST-profile-{stamp}.pstats")
+        self.profile.dump_stats(filename)
+        try:
+            self.write_report(filename[: -len(".pstats")] + ".txt")
+        except IOError as exception:
+            logging.warning("Profiler: %s", exception)
+        self.profile = None
+        logging.info("Profiler: saved %s", filename)
+        return filename
+
+    def toggle(self) -> str:
+        """Start if stopped, stop if started. Returns what stop() returns."""
+        if self.running:
+            return self.stop()
+        self.start()
+        return ""
+
+    def owner(self, filename: str, function: str) -> str:
+        """
+        Names a function by where it lives in the logger, MainWindow methods
+        under the main module and everything else by its lib/ module.
+        Returns "" for code outside the package.
+        """
+        if not filename.startswith(self.package_dir):
+            return ""
+        module = os.path.relpath(filename, self.package_dir)
+        if module == "__main__.py":
+            return f"__main__:{function}"
+        return f"{module}:{function}"
+
+    def write_report(self, filename: str, limit: int = 40) -> None:
+        """
+        Writes the logger's own functions, most cumulative time first.
+        """
+        stats = pstats.Stats(self.profile)
+        total = stats.total_tt or 1
+        rows = []
+        for (path, _, function), (_, calls, own, cumulative, _) in stats.stats.items():
+            name = self.owner(path, function)
+            if name:
+                rows.append((cumulative, own, calls, name))
+        rows.sort(reverse=True)
+        with open(filename, "wt", encoding="utf-8") as file_descriptor:
+            print(
+                f"Total profiled time {total:.3f}s. Functions in k1usnsst:",
+                file=file_descriptor,
+            )
+            print(
+                f"{'cumulative':>11}{'%':>7}{'own':>10}{'calls':>9}  function",
+                file=file_descriptor,
+            )
+            for cumulative, own, calls, name in rows[:limit]:
+                print(
+                    f"{cumulative:>10.3f}s{cumulative / total * 100:>6.1f}%"
+                    f"{own:>9.3f}s{calls:>9}  {name}",
+                    file=file_descriptor,
+                )
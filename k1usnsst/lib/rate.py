@@ -0,0 +1,91 @@
+"""
+QSO rate meter.
+
+The times and bands of recent contacts are kept in a fixed size ring buffer.
+Two tails follow the start of the last 10 and last 60 minutes, and the counts
+inside each window are kept up to date as contacts are added and as the
+tails move past old ones, so neither adding a contact nor reading the rates
+ever looks at the whole buffer.
+"""
+
+from datetime import datetime, timezone
+
+SHORT = 600
+LONG = 3600
+
+
+def timestamp(date_time: str) -> float:
+    """Seconds since the epoch for a date_time from the contacts table, UTC."""
+    return (
+        datetime.strptime(date_time[:19], "%Y-%m-%d %H:%M:%S")
+        .replace(tzinfo=timezone.utc)
+        .timestamp()
+    )
+
+
+class RateMeter:
+    """
+    Tracks QSO rates. size is the most contacts the last hour can hold.
+    """
+
+    def __init__(self, size: int = 512) -> None:
+        self.size = size
+        self.times = [0.0] * size
+        self.bands = [""] * size
+        self.head = 0
+        self.short_tail = 0
+        self.long_tail = 0
+        self.short_count = 0
+        self.long_count = 0
+        self.band_counts = {}
+        self.last = None
+
+    def _expire_long(self) -> None:
+        """Move the hour's tail past its oldest contact."""
+        band = self.bands[self.long_tail]
+        self.band_counts[band] -= 1
+        if not self.band_counts[band]:
+            del self.band_counts[band]
+        self.long_tail = (self.long_tail + 1) % self.size
+        self.long_count -= 1
+
+    def _expire_short(self) -> None:
+        """Move the 10 minutes' tail past its oldest contact."""
+        self.short_tail = (self.short_tail + 1) % self.size
+        self.short_count -= 1
+
+    def add(self, when: float, band: str) -> None:
+        """Count a contact made at when, seconds since the epoch."""
+        if self.long_count == self.size:
+            if self.short_count == self.long_count:
+                self._expire_short()
+            self._expire_long()
+        self.times[self.head] = when
+        self.bands[self.head] = band
+        self.head = (self.head + 1) % self.size
+        self.short_count += 1
+        self.long_count += 1
+        self.band_counts[band] = self.band_counts.get(band, 0) + 1
+        self.last = when if self.last is None else max(self.last, when)
+        self.advance(when)
+
+    def advance(self, now: float) -> None:
+        """Drop contacts that have aged out of the windows."""
+        while self.short_count and self.times[self.short_tail] <= now - SHORT:
+            self._expire_short()
+        while self.long_count and self.times[self.long_tail] <= now - LONG:
+            self._expire_long()
+
+    def rates(self, now: float) -> tuple:
+        """
+        Returns (QSOs per hour over the last 10 minutes, QSOs in the last
+        60 minutes, seconds since the last QSO or None).
+        """
+        self.advance(now)
+        since = None if self.last is None else max(0.0, now - self.last)
+        return self.short_count * LONG // SHORT, self.long_count, since
+
+    def band_rates(self, now: float) -> dict:
+        """Returns QSOs in the last 60 minutes for each band."""
+        self.advance(now)
+        return dict(self.band_counts)
@@ -0,0 +1,85 @@
+"""
+Reachability monitor.
+
+Checks now and then, from a thread of its own, whether a server can be
+reached, by opening and closing a TCP connection to it. That costs one round
+trip, and tells us more than pinging some other host would. Anything that
+needs the network can look at online instead of waiting out a timeout.
+"""
+
+import logging
+import socket
+import threading
+
+
+class ReachabilityMonitor:
+    """
+    Watches (host, port). online is None until the first check, then True
+    or False. on_change is called, from the monitor's thread, with the new
+    state when it changes.
+    """
+
+    def __init__(
+        self,
+        host: str,
+        port: int,
+        interval: float = 60.0,
+        offline_interval: float = 10.0,
+        timeout: float = 2.0,
+        on_change=None,
+    ) -> None:
+        self.address = (host, int(port))
+        self.interval = interval
+        self.offline_interval = offline_interval
+        self.timeout = timeout
+        self.on_change = on_change
+        self.online = None
+        self.wake = threading.Event()
+        self.stopped = threading.Event()
+        self.thread = None
+
+    def check(self) -> bool:
+        """One check. True if the server took the connection."""
+        try:
+            with socket.create_connection(self.address, timeout=self.timeout):
+                return True
+        except OSError as exception:
+            logging.debug("ReachabilityMonitor: %s %s", self.address, exception)
+            return False
+
+    def _set_online(self, online: bool) -> None:
+        """Move to the online or offline state."""
+        if online == self.online:
+            return
+        self.online = online
+        logging.info(
+            "ReachabilityMonitor: %s %s", self.address, "online" if online else "offline"
+        )
+        if self.on_change:
+            self.on_change(online)
+
+    def start(self) -> None:
+        """Start checking."""
+        self.thread = threading.Thread(
+            target=self.run, name="reachability", daemon=True
+        )
+        self.thread.start()
+
+    def run(self) -> None:
+        """Checks, then waits, less long while offline."""
+        while not self.stopped.is_set():
+            self._set_online(self.check())
+            self.wake.wait(self.interval if self.online else self.offline_interval)
+            self.wake.clear()
+
+    def failed(self) -> None:
+        """A request to the server just failed. Go offline and check again now."""
+        self._set_online(False)
+        self.wake.set()
+
+    def stop(self) -> None:
+        """Stop checking."""
+        self.stopped.set()
+        self.wake.set()
+        if self.thread:
+            self.thread.join(timeout=self.timeout + 1)
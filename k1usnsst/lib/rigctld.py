@@ -0,0 +1,83 @@
+"""
+rigctld client.
+
+Keeps one TCP connection open to rigctld for polling the VFO and sending
+CW. Whether rigctld is reachable is tracked from the commands themselves,
+the same way as the flrig client.
+"""
+
+import logging
+import socket
+
+
+class RigctldClient:
+    """
+    Talks to rigctld. on_state is called with True or False whenever
+    rigctld comes online or goes offline.
+    """
+
+    def __init__(self, host: str, port, timeout: float = 0.5, on_state=None) -> None:
+        self.address = (host, int(port))
+        self.timeout = timeout
+        self.on_state = on_state
+        self.online = None
+        self.sock = None
+        self.reader = None
+        self.frequency = ""
+
+    def _set_online(self, online: bool) -> None:
+        """Move to the online or offline state."""
+        if online == self.online:
+            return
+        self.online = online
+        logging.info("rigctld %s: %s", self.address, "online" if online else "offline")
+        if self.on_state:
+            self.on_state(online)
+
+    def _command(self, command: str) -> str:
+        """Sends one command and returns the first line of the reply."""
+        if self.sock is None:
+            self.sock = socket.create_connection(self.address, timeout=self.timeout)
+            self.reader = self.sock.makefile("rb")
+        self.sock.sendall(f"{command}\n".encode("utf-8"))
+        reply = self.reader.readline()
+        if not reply:
+            raise ConnectionResetError("rigctld closed the connection")
+        return reply.decode("utf-8").strip()
+
+    def _failed(self, exception: Exception) -> None:
+        """Drop the connection and go offline."""
+        logging.debug("rigctld: %s", exception)
+        self.close()
+        self._set_online(False)
+
+    def poll(self) -> tuple:
+        """
+        Returns (frequency,), or None if rigctld can't be reached.
+        """
+        try:
+            self.frequency = self._command("f")
+        except OSError as exception:
+            self._failed(exception)
+            return None
+        self._set_online(True)
+        return (self.frequency,)
+
+    def send_morse(self, texttosend: str) -> None:
+        """Has the rig send CW."""
+        try:
+            self._command(f"b{texttosend}")
+        except OSError as exception:
+            self._failed(exception)
+
+    def close(self) -> None:
+        """Drop the connection."""
+        if self.reader:
+            self.reader.close()
+            self.reader = None
+        if self.sock:
+            try:
+                self.sock.close()
+            except OSError:
+                pass
+            self.sock = None
@@ -0,0 +1,45 @@
+"""
+Startup phase timing.
+
+Set K1USNSST_STARTUP_TRACE to a filename and the logger records how long each
+startup phase took, writes them there as json, and quits as soon as the
+callsign field has focus. benchmarks/startup.py drives this.
+"""
+
+import os
+from json import dumps
+from time import perf_counter
+
+
+class StartupTrace:
+    """
+    Collects phase timings. mark() charges the time since the previous mark
+    to the named phase. Does nothing unless tracing is switched on.
+    """
+
+    def __init__(self, start: float) -> None:
+        self.path = os.environ.get("K1USNSST_STARTUP_TRACE", "")
+        self.enabled = bool(self.path)
+        self.start = start
+        self.last = start
+        self.phases = {}
+
+    def mark(self, phase: str) -> None:
+        """Close out a phase."""
+        if not self.enabled:
+            return
+        now = perf_counter()
+        self.phases[phase] = self.phases.get(phase, 0.0) + (now - self.last) * 1000
+        self.last = now
+
+    def dump(self, **extra) -> None:
+        """Write the phases, in milliseconds, to the trace file."""
+        if not self.enabled:
+            return
+        result = {
+            "phases": self.phases,
+            "total": (self.last - self.start) * 1000,
+        }
+        result.update(extra)
+        with open(self.path, "wt", encoding="utf-8") as file_descriptor:
+            file_descriptor.write(dumps(result))
@@ -0,0 +1,58 @@
+"""
+Loads Qt Designer forms.
+
+The .ui files in data/ are compiled into python modules by compile_ui.sh at
+build time, each recording the hash of the .ui it was compiled from. If a
+compiled module is missing, say when running from a fresh checkout, or its
+hash doesn't match the .ui file because compile_ui.sh wasn't run again after
+the form changed, we fall back to parsing the .ui file at runtime with uic.
+File times aren't compared, unpacking a wheel can leave them in any order.
+"""
+
+import hashlib
+import importlib
+import logging
+import os
+
+
+def load_ui(widget, name: str) -> None:
+    """
+    Builds the form called 'name' (main, dialog, settings) onto widget.
+    Child widgets become attributes of widget, just as uic.loadUi does.
+    """
+    working_path = os.path.dirname(os.path.dirname(__file__))
+    form_file = f"{working_path}/data/{name}.ui"
+    try:
+        module = importlib.import_module(f".{name}_ui", __package__)
+    except ImportError:
+        module = None
+    if module is not None and _stale(module, form_file):
+        logging.info("load_ui: compiled form for %s is out of date", name)
+        module = None
+    if module is not None:
+        ui_class = next(
+            getattr(module, attr) for attr in dir(module) if attr.startswith("Ui_")
+        )
+        form = ui_class()
+        form.setupUi(widget)
+        for attr, value in vars(form).items():
+            setattr(widget, attr, value)
+        return
+    logging.info("load_ui: no compiled form for %s, parsing .ui", name)
+    from PyQt5 import uic  # pylint: disable=import-outside-toplevel
+
+    uic.loadUi(form_file, widget)
+
+
+def _stale(module, form_file: str) -> bool:
+    """True if the .ui file was changed after module was compiled from it."""
+    compiled_from = getattr(module, "UI_SHA256", None)
+    if compiled_from is None:
+        # Compiled before forms were hashed, there's no telling.
+        return False
+    try:
+        with open(form_file, "rb") as file_descriptor:
+            return hashlib.sha256(file_descriptor.read()).hexdigest() != compiled_from
+    except OSError:
+        # No .ui shipped, a frozen build say, so the compiled form is all there is.
+        return False
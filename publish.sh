@@ -1,5 +1,6 @@
 #!/bin/bash
 pip uninstall -y k1usnsst
 rm dist/*
+./compile_ui.sh
 python3 -m build
 python3 -m twine upload dist/*
@@ -1,6 +1,7 @@
 #!/bin/bash
 pip uninstall -y k1usnsst
 rm dist/*
+./compile_ui.sh
 python3 -m build
 pip install -e .
 
@@ -0,0 +1,8 @@
+"""
+Local stand-ins for everything the logger talks to over the network: rigctld,
+flrig, cwdaemon, the k1elsendstring XML-RPC keyer and the QRZ, HamDB and
+HamQTH XML APIs. Each can be slowed down, made to fail and, for the lookups,
+made to expire sessions. Not shipped with the package.
+
+    python -m simulator --latency 20 --jitter 10 --failures 0.01
+"""
@@ -0,0 +1,169 @@
+"""
+Run the simulators.
+
+Latencies and jitter are given in milliseconds, session lifetimes in seconds.
+Per service flags override the global ones.
+
+    python -m simulator --latency 20 --jitter 10 --failures 0.01
+    python -m simulator --only rigctld lookup --lookup-latency 400 --session-lifetime 60
+"""
+
+import argparse
+import random
+import threading
+import time
+
+from .faults import Faults
+from .keyer import CwdaemonServer, KeyerServer
+from .lookup import LookupServer
+from .rig import FlrigServer, RigctldServer, RigState
+
+PORTS = {
+    "rigctld": 4532,
+    "flrig": 12345,
+    "cwdaemon": 6789,
+    "keyer": 8000,
+    "lookup": 8080,
+}
+
+
+class Simulators:
+    """
+    The running servers, by service name, and the rig they share.
+    Ports of 0 pick a free port, see port().
+    """
+
+    def __init__(
+        self,
+        services=None,
+        host: str = "127.0.0.1",
+        ports: dict = None,
+        faults: dict = None,
+        password: str = None,
+        missing: tuple = (),
+    ) -> None:
+        self.rig = RigState()
+        self.servers = {}
+        self.threads = []
+        ports = {**PORTS, **(ports or {})}
+        faults = faults or {}
+        for name in services or PORTS:
+            address = (host, ports[name])
+            fault = faults.get(name) or Faults()
+            if name == "rigctld":
+                server = RigctldServer(address, self.rig, fault)
+            elif name == "flrig":
+                server = FlrigServer(address, self.rig, fault)
+            elif name == "cwdaemon":
+                server = CwdaemonServer(address, fault)
+            elif name == "keyer":
+                server = KeyerServer(address, fault)
+            else:
+                server = LookupServer(address, fault, password, missing)
+            self.servers[name] = server
+
+    def port(self, name: str) -> int:
+        """The port a service is listening on."""
+        return self.servers[name].server_address[1]
+
+    def start(self) -> "Simulators":
+        """Serve every service from a daemon thread."""
+        for name, server in self.servers.items():
+            thread = threading.Thread(
+                target=server.serve_forever, name=f"simulator-{name}", daemon=True
+            )
+            thread.start()
+            self.threads.append(thread)
+        return self
+
+    def stop(self) -> None:
+        """Shut every service down."""
+        for server in self.servers.values():
+            server.shutdown()
+            server.server_close()
+        for thread in self.threads:
+            thread.join()
+        self.threads = []
+
+
+def start(services=None, **kwargs) -> Simulators:
+    """Starts the simulators, all of them unless services names some."""
+    return Simulators(services, **kwargs).start()
+
+
+def wander(rig: RigState, step: int, stop: threading.Event) -> None:
+    """Moves the VFO now and then, like an operator tuning the band."""
+    rng = random.Random()
+    while not stop.wait(rng.uniform(0.5, 5.0)):
+        rig.tune(rig.frequency + rng.choice((-1, 1)) * step)
+
+
+def main():
+    """Run the simulators until interrupted."""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--only", nargs="+", choices=list(PORTS), help="services to run")
+    parser.add_argument("--latency", type=float, default=0.0, help="ms")
+    parser.add_argument("--jitter", type=float, default=0.0, help="ms")
+    parser.add_argument("--failures", type=float, default=0.0, help="0 to 1")
+    parser.add_argument(
+        "--session-lifetime", type=float, help="s a lookup session key lasts"
+    )
+    parser.add_argument("--password", help="lookup password, any is taken if unset")
+    parser.add_argument(
+        "--missing", nargs="+", default=[], help="callsigns lookups won't find"
+    )
+    parser.add_argument(
+        "--tune", type=int, default=0, help="wander the VFO by this many Hz"
+    )
+    parser.add_argument("--seed", type=int)
+    for name, port in PORTS.items():
+        parser.add_argument(f"--{name}-port", type=int, default=port)
+        parser.add_argument(f"--{name}-latency", type=float, help="ms")
+        parser.add_argument(f"--{name}-jitter", type=float, help="ms")
+        parser.add_argument(f"--{name}-failures", type=float)
+    args = parser.parse_args()
+
+    def setting(name, option):
+        value = getattr(args, f"{name}_{option}")
+        return getattr(args, option) if value is None else value
+
+    services = args.only or list(PORTS)
+    simulators = start(
+        services,
+        host=args.host,
+        ports={name: getattr(args, f"{name}_port") for name in services},
+        faults={
+            name: Faults(
+                setting(name, "latency") / 1000,
+                setting(name, "jitter") / 1000,
+                setting(name, "failures"),
+                args.session_lifetime,
+                args.seed,
+            )
+            for name in services
+        },
+        password=args.password,
+        missing=args.missing,
+    )
+    for name in services:
+        print(f"{name:<9} {args.host}:{simulators.port(name)}")
+
+    stop = threading.Event()
+    if args.tune:
+        threading.Thread(
+            target=wander, args=(simulators.rig, args.tune, stop), daemon=True
+        ).start()
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        pass
+    stop.set()
+    simulators.stop()
+    for name, server in simulators.servers.items():
+        print(f"{name:<9} {server.faults.requests} requests, {server.faults.failed} failed")
+
+
+if __name__ == "__main__":
+    main()
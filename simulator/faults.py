@@ -0,0 +1,72 @@
+"""
+Fault injection shared by the simulated endpoints.
+"""
+
+import random
+import time
+from xmlrpc.server import SimpleXMLRPCRequestHandler
+
+
+class Faults:
+    """
+    How an endpoint misbehaves. latency and jitter are in seconds, each
+    request is delayed by latency plus or minus up to jitter. failures is the
+    chance, 0 to 1, that a request fails. session_lifetime, in seconds, is
+    how long a lookup session key stays good, None for forever.
+    """
+
+    def __init__(
+        self,
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        failures: float = 0.0,
+        session_lifetime: float = None,
+        seed: int = None,
+    ) -> None:
+        self.latency = latency
+        self.jitter = jitter
+        self.failures = failures
+        self.session_lifetime = session_lifetime
+        self.rng = random.Random(seed)
+        self.requests = 0
+        self.failed = 0
+
+    def delay(self) -> None:
+        """Sleep for this request's latency."""
+        self.requests += 1
+        delay = self.latency + self.rng.uniform(-self.jitter, self.jitter)
+        if delay > 0:
+            time.sleep(delay)
+
+    def fail(self) -> bool:
+        """True if this request should fail."""
+        if self.failures and self.rng.random() < self.failures:
+            self.failed += 1
+            return True
+        return False
+
+    def expired(self, issued: float) -> bool:
+        """True if a session key issued at issued has expired."""
+        if self.session_lifetime is None:
+            return False
+        return time.monotonic() - issued > self.session_lifetime
+
+
+class FaultyXMLRPCHandler(SimpleXMLRPCRequestHandler):
+    """
+    Keeps HTTP/1.1 connections open, like flrig does, and applies the
+    server's faults to each request. A failed request drops the connection
+    without answering.
+    """
+
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):  # pylint: disable=invalid-name
+        self.server.faults.delay()
+        if self.server.faults.fail():
+            self.close_connection = True
+            return
+        super().do_POST()
+
+    def log_message(self, format, *args):  # pylint: disable=redefined-builtin
+        pass
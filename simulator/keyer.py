@@ -0,0 +1,52 @@
+"""
+Simulated CW keyers: cwdaemon over UDP and a k1elsendstring XML-RPC keyer.
+Both just remember what they were asked to send.
+"""
+
+import socketserver
+from socketserver import ThreadingMixIn
+from xmlrpc.server import SimpleXMLRPCServer
+
+from .faults import Faults, FaultyXMLRPCHandler
+
+
+class CwdaemonHandler(socketserver.BaseRequestHandler):
+    """Keeps each datagram. A failed one is dropped."""
+
+    def handle(self):
+        self.server.faults.delay()
+        if self.server.faults.fail():
+            return
+        self.server.sent.append(self.request[0].decode("utf-8", "replace"))
+
+
+class CwdaemonServer(socketserver.ThreadingUDPServer):
+    """A cwdaemon on address, (host, port)."""
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, address: tuple, faults: Faults = None) -> None:
+        super().__init__(address, CwdaemonHandler)
+        self.faults = faults or Faults()
+        self.sent = []
+
+
+class KeyerServer(ThreadingMixIn, SimpleXMLRPCServer):
+    """A winkeyer XML-RPC server on address, answering k1elsendstring."""
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, address: tuple, faults: Faults = None) -> None:
+        super().__init__(
+            address, requestHandler=FaultyXMLRPCHandler, logRequests=False
+        )
+        self.faults = faults or Faults()
+        self.sent = []
+        self.register_function(self.k1elsendstring)
+
+    def k1elsendstring(self, text: str) -> int:
+        """Send text."""
+        self.sent.append(text)
+        return 0
@@ -0,0 +1,198 @@
+"""
+Simulated callsign lookup services. One HTTP server answers the QRZ XML API
+under /qrz/, HamDB under /hamdb/ and HamQTH under /hamqth. Every callsign
+is found, with a name and grid made up from the call, unless it's listed as
+missing.
+
+    QRZlookup(user, password, url="http://127.0.0.1:8080/qrz/")
+    HamDBlookup(url="http://127.0.0.1:8080/hamdb/")
+    HamQTH(user, password, url="http://127.0.0.1:8080/hamqth")
+"""
+
+import secrets
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+from xml.sax.saxutils import escape
+
+from .faults import Faults
+
+NAMES = "BOB MIKE JIM JOHN BILL DAVE TOM STEVE JOE RICK MARY SUE ANN KEN PAUL ED".split()
+
+
+def record(call: str) -> dict:
+    """A made up but repeatable entry for call."""
+    crc = zlib.crc32(call.upper().encode("utf-8"))
+    field = "ABCDEFGHIJKLMNOPQR"
+    subsquare = "abcdefghijklmnopqrstuvwx"
+    return {
+        "call": call.upper(),
+        "fname": NAMES[crc % len(NAMES)].title(),
+        "name": "Operator",
+        "nickname": NAMES[crc % len(NAMES)].title(),
+        "grid": (
+            f"{field[crc % 18]}{field[(crc >> 5) % 18]}"
+            f"{(crc >> 10) % 10}{(crc >> 14) % 10}"
+            f"{subsquare[(crc >> 18) % 24]}{subsquare[(crc >> 23) % 24]}"
+        ),
+        "state": "CA",
+        "country": "United States",
+    }
+
+
+def xml(tag: str, fields: dict) -> str:
+    """<tag><key>value</key>...</tag>"""
+    inner = "".join(f"<{key}>{escape(str(value))}</{key}>" for key, value in fields.items())
+    return f"<{tag}>{inner}</{tag}>"
+
+
+class LookupHandler(BaseHTTPRequestHandler):
+    """Routes a GET to the service it's for."""
+
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):  # pylint: disable=invalid-name
+        server = self.server
+        server.faults.delay()
+        if server.faults.fail():
+            self.reply(503, "<error>Service Unavailable</error>")
+            return
+        url = urlsplit(self.path)
+        query = {key: values[0] for key, values in parse_qs(url.query).items()}
+        if url.path.startswith("/qrz"):
+            self.reply(200, server.qrz(query))
+        elif url.path.startswith("/hamdb/"):
+            self.reply(200, server.hamdb(url.path.split("/")[2]))
+        elif url.path.startswith("/hamqth"):
+            self.reply(200, server.hamqth(query))
+        else:
+            self.reply(404, "<error>Not Found</error>")
+
+    def reply(self, status: int, body: str) -> None:
+        """Send an XML answer."""
+        data = f'<?xml version="1.0" encoding="utf-8"?>\n{body}'.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "text/xml; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):  # pylint: disable=redefined-builtin
+        pass
+
+
+class LookupServer(ThreadingHTTPServer):
+    """
+    The lookup services on address, (host, port). Logins are accepted with
+    any username and password, unless password is set.
+    """
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(
+        self,
+        address: tuple,
+        faults: Faults = None,
+        password: str = None,
+        missing: tuple = (),
+    ) -> None:
+        super().__init__(address, LookupHandler)
+        self.faults = faults or Faults()
+        self.password = password
+        self.missing = {call.upper() for call in missing}
+        self.sessions = {}
+        self.lock = threading.Lock()
+        self.lookups = 0
+        self.logins = 0
+
+    def login(self, password: str) -> str:
+        """Returns a new session key, or "" if the password is wrong."""
+        if self.password is not None and password != self.password:
+            return ""
+        key = secrets.token_hex(16)
+        with self.lock:
+            self.sessions[key] = time.monotonic()
+            self.logins += 1
+        return key
+
+    def valid(self, key: str) -> bool:
+        """True if key is a live session."""
+        with self.lock:
+            issued = self.sessions.get(key)
+            if issued is None:
+                return False
+            if self.faults.expired(issued):
+                del self.sessions[key]
+                return False
+            self.lookups += 1
+            return True
+
+    def qrz(self, query: dict) -> str:
+        """The QRZ XML API, version 1.34."""
+        session = {"GMTime": time.strftime("%a %b %d %H:%M:%S %Y", time.gmtime())}
+        callsign = ""
+        if "username" in query:
+            key = self.login(query.get("password", ""))
+            if key:
+                session.update(Key=key, Count=self.lookups, SubExp="non-subscriber")
+            else:
+                session["Error"] = "Username/password incorrect"
+        elif self.valid(query.get("s", "")):
+            session["Key"] = query["s"]
+            call = query.get("callsign", "").upper()
+            if call in self.missing:
+                session["Error"] = f"Not found: {call}"
+            else:
+                callsign = xml("Callsign", record(call))
+        else:
+            session["Error"] = "Session Timeout"
+        return (
+            '<QRZDatabase version="1.34" xmlns="http://xmldata.qrz.com">'
+            f"{callsign}{xml('Session', session)}</QRZDatabase>"
+        )
+
+    def hamdb(self, call: str) -> str:
+        """The HamDB XML API, no login."""
+        call = call.upper()
+        with self.lock:
+            self.lookups += 1
+        if call in self.missing:
+            found, status = {"call": call}, "NOT_FOUND"
+        else:
+            found, status = record(call), "OK"
+        return (
+            '<hamdb version="1.0">'
+            f"{xml('callsign', found)}{xml('messages', {'status': status})}</hamdb>"
+        )
+
+    def hamqth(self, query: dict) -> str:
+        """The HamQTH XML API."""
+        body = ""
+        if "u" in query:
+            key = self.login(query.get("p", ""))
+            session = {"session_id": key} if key else {
+                "error": "Wrong user name or password"
+            }
+            body = xml("session", session)
+        elif not self.valid(query.get("id", "")):
+            body = xml("session", {"error": "Session does not exist or expired"})
+        else:
+            call = query.get("callsign", "").upper()
+            if call in self.missing:
+                body = xml("session", {"error": "Callsign not found"})
+            else:
+                found = record(call)
+                body = xml(
+                    "search",
+                    {
+                        "callsign": call.lower(),
+                        "nick": found["nickname"],
+                        "adr_name": f"{found['fname']} {found['name']}",
+                        "grid": found["grid"].lower(),
+                        "country": found["country"],
+                    },
+                )
+        return f'<HamQTH version="2.7" xmlns="https://www.hamqth.com">{body}</HamQTH>'
@@ -0,0 +1,118 @@
+"""
+Simulated rig control daemons, rigctld and flrig, sharing one rig.
+"""
+
+import socketserver
+import threading
+from socketserver import ThreadingMixIn
+from xmlrpc.server import SimpleXMLRPCServer
+
+from .faults import Faults, FaultyXMLRPCHandler
+
+
+class RigState:
+    """The simulated radio."""
+
+    def __init__(self, frequency: int = 14030000, mode: str = "CW") -> None:
+        self.lock = threading.Lock()
+        self.frequency = frequency
+        self.mode = mode
+        self.ptt = 0
+        self.morse = []
+
+    def tune(self, frequency: int) -> None:
+        """Spin the VFO."""
+        with self.lock:
+            self.frequency = int(frequency)
+
+
+class RigctldHandler(socketserver.StreamRequestHandler):
+    """
+    Speaks enough of the rigctld protocol for the logger:
+    f, F <hz>, m, M <mode> <passband>, t, T <0|1>, b <text> and q.
+    A failed request drops the connection.
+    """
+
+    def handle(self):
+        rig = self.server.rig
+        faults = self.server.faults
+        for line in self.rfile:
+            command = line.decode("utf-8", "replace").strip()
+            if not command:
+                continue
+            faults.delay()
+            if faults.fail():
+                return
+            name, _, argument = command.partition(" ")
+            if name in ("q", "Q"):
+                return
+            with rig.lock:
+                if name == "f":
+                    reply = f"{rig.frequency}\n"
+                elif name == "F" and argument.isdigit():
+                    rig.frequency = int(argument)
+                    reply = "RPRT 0\n"
+                elif name == "m":
+                    reply = f"{rig.mode}\n500\n"
+                elif name == "M" and argument:
+                    rig.mode = argument.split()[0]
+                    reply = "RPRT 0\n"
+                elif name == "t":
+                    reply = f"{rig.ptt}\n"
+                elif name == "T" and argument in ("0", "1"):
+                    rig.ptt = int(argument)
+                    reply = "RPRT 0\n"
+                elif command.startswith("b"):
+                    rig.morse.append(command[1:].strip())
+                    reply = "RPRT 0\n"
+                else:
+                    reply = "RPRT -1\n"
+            self.wfile.write(reply.encode("utf-8"))
+
+
+class RigctldServer(socketserver.ThreadingTCPServer):
+    """A rigctld on address, (host, port)."""
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, address: tuple, rig: RigState, faults: Faults = None) -> None:
+        super().__init__(address, RigctldHandler)
+        self.rig = rig
+        self.faults = faults or Faults()
+
+
+class FlrigServer(ThreadingMixIn, SimpleXMLRPCServer):
+    """An flrig XML-RPC server on address, with system.multicall."""
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, address: tuple, rig: RigState, faults: Faults = None) -> None:
+        super().__init__(
+            address, requestHandler=FaultyXMLRPCHandler, logRequests=False
+        )
+        self.rig = rig
+        self.faults = faults or Faults()
+        self.register_multicall_functions()
+        for name, function in (
+            ("rig.get_vfo", lambda: str(self.rig.frequency)),
+            ("rig.set_vfo", lambda hertz: self.rig.tune(hertz) or 0),
+            ("rig.get_mode", lambda: self.rig.mode),
+            ("rig.set_mode", self._set_mode),
+            ("rig.get_ptt", lambda: self.rig.ptt),
+            ("rig.set_ptt", self._set_ptt),
+            ("rig.get_xcvr", lambda: "SIMULATOR"),
+            ("main.get_version", lambda: "1.4.7"),
+        ):
+            self.register_function(function, name)
+
+    def _set_mode(self, mode: str) -> int:
+        with self.rig.lock:
+            self.rig.mode = mode
+        return 0
+
+    def _set_ptt(self, ptt: int) -> int:
+        with self.rig.lock:
+            self.rig.ptt = int(ptt)
+        return 0